@@ -1,11 +1,14 @@
 from flask import Flask, request, jsonify
-from googleapiclient.discovery import build
-from oauth2client.service_account import ServiceAccountCredentials
 from dotenv import load_dotenv
 import os
 import pika
 import json
+import mysql.connector
 from flask_sqlalchemy import SQLAlchemy
+try:
+    from gcal import get_service as get_calendar_service, get_quota
+except ModuleNotFoundError:
+    from planning.gcal import get_service as get_calendar_service, get_quota
 
 # Load environment variables
 load_dotenv()
@@ -49,10 +52,9 @@ class Session(db.Model):
             'event_id': self.event_id
         }
 
-# Google Calendar service
+# Google Calendar service (gedeelde client: geen discovery fetch per request)
 def get_service():
-    credentials = ServiceAccountCredentials.from_json_keyfile_name(SERVICE_ACCOUNT_FILE, SCOPES)
-    return build('calendar', 'v3', credentials=credentials)
+    return get_calendar_service(SERVICE_ACCOUNT_FILE, SCOPES)
 
 # Send to RabbitMQ
 def send_to_rabbitmq(event_data):
@@ -71,12 +73,37 @@ def send_to_rabbitmq(event_data):
     channel.basic_publish(exchange='', routing_key='planning.event', body=message_body)
     connection.close()
 
+# Vraagt de synchronizer om een pull uit Google Calendar: een entry in
+# sync_outbox maakt de hoofdloop wakker, die dan met zijn syncToken enkel de
+# gewijzigde events ophaalt.
+def request_gcal_pull(resource_id, state):
+    conn = mysql.connector.connect(
+        host=os.getenv('LOCAL_DB_HOST', 'db'),
+        user=os.getenv('LOCAL_DB_USER', 'root'),
+        password=os.getenv('LOCAL_DB_PASSWORD', 'root'),
+        database=os.getenv('LOCAL_DB_NAME', 'planning')
+    )
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO sync_outbox (table_name, row_id, operation) VALUES ('gcal', %s, %s)",
+            ((resource_id or '')[:50], (state or 'pull')[:10])
+        )
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
 # Routes
 
 @app.route('/')
 def home():
     return "Planning API draait!"
 
+@app.route('/gcal/quota', methods=['GET'])
+def gcal_quota():
+    return jsonify(get_quota().usage()), 200
+
 @app.route('/events', methods=['POST'])
 def create_event():
     try:
@@ -94,7 +121,7 @@ def create_event():
         }
 
         calendar_id = os.getenv('GOOGLE_CALENDAR_ID')
-        created_event = service.events().insert(calendarId=calendar_id, body=event).execute()
+        created_event = get_quota().execute(service.events().insert(calendarId=calendar_id, body=event))
         send_to_rabbitmq(event_data)
 
         send_to_rabbitmq(created_event)
@@ -106,7 +133,7 @@ def create_event():
 def list_events():
     try:
         service = get_service()
-        events = service.events().list(calendarId=os.getenv('GOOGLE_CALENDAR_ID')).execute()
+        events = get_quota().execute(service.events().list(calendarId=os.getenv('GOOGLE_CALENDAR_ID')))
         return jsonify(events.get('items', [])), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -116,7 +143,7 @@ def list_events():
 def get_event(event_id):
     try:
         service = get_service()
-        event = service.events().get(calendarId=os.getenv('GOOGLE_CALENDAR_ID'), eventId=event_id).execute()
+        event = get_quota().execute(service.events().get(calendarId=os.getenv('GOOGLE_CALENDAR_ID'), eventId=event_id))
         return jsonify(event), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 404
@@ -127,7 +154,7 @@ def update_event(event_id):
         data = request.json
         service = get_service()
         calendar_id = os.getenv('GOOGLE_CALENDAR_ID')
-        event = service.events().get(calendarId=calendar_id, eventId=event_id).execute()
+        event = get_quota().execute(service.events().get(calendarId=calendar_id, eventId=event_id))
 
         for key in ['summary', 'start', 'end', 'colorId']:
             if key in data:
@@ -136,7 +163,7 @@ def update_event(event_id):
                 else:
                     event[key] = data[key]
 
-        updated = service.events().update(calendarId=calendar_id, eventId=event_id, body=event).execute()
+        updated = get_quota().execute(service.events().update(calendarId=calendar_id, eventId=event_id, body=event))
         send_to_rabbitmq(updated)
         return jsonify({"status": "Event geüpdatet", "event_id": updated['id']}), 200
     except Exception as e:
@@ -147,7 +174,7 @@ def update_event(event_id):
 def delete_event(event_id):
     try:
         service = get_service()
-        service.events().delete(calendarId=os.getenv('GOOGLE_CALENDAR_ID'), eventId=event_id).execute()
+        get_quota().execute(service.events().delete(calendarId=os.getenv('GOOGLE_CALENDAR_ID'), eventId=event_id))
 
         send_to_rabbitmq({
             "action": "delete",
@@ -166,29 +193,9 @@ def calendar_notify():
     print(f"[Headers] {dict(request.headers)}")
 
     try:
-        service = get_service()
-        calendar_id = os.getenv("GOOGLE_CALENDAR_ID")
-
-        if state in ["exists", "update"]:
-            events = service.events().list(
-                calendarId=calendar_id,
-                maxResults=1,
-                singleEvents=True,
-                orderBy="startTime"
-            ).execute()
-            items = events.get('items', [])
-            if items:
-                send_to_rabbitmq({
-                    "action": "webhook_update",
-                    "event": items[0]
-                })
-
-        elif state == "delete":
-            send_to_rabbitmq({
-                "action": "webhook_delete",
-                "resource_id": resource_id
-            })
-
+        # "sync" is enkel de bevestiging bij het registreren van het kanaal
+        if state in ["exists", "update", "delete"]:
+            request_gcal_pull(resource_id, state)
     except Exception as e:
         print(f"[Webhook Error] {str(e)}")
 
@@ -2,9 +2,7 @@ import pika
 import mysql.connector
 from mysql.connector import Error
 import os
-import sys
 import xml.etree.ElementTree as ET
-from datetime import datetime
 
 # === LOGGING & MONITORING ===
 RABBITMQ_HOST = 'rabbitmq'
@@ -13,41 +11,14 @@ RABBITMQ_USERNAME = os.environ.get('RABBITMQ_USER')
 RABBITMQ_PASSWORD = os.environ.get('RABBITMQ_PASSWORD')
 RABBITMQ_VHOST = os.environ.get('RABBITMQ_USER')
 
-def _get_channel():
-    creds = pika.PlainCredentials(RABBITMQ_USERNAME, RABBITMQ_PASSWORD)
-    params = pika.ConnectionParameters(
-        host=RABBITMQ_HOST,
-        port=RABBITMQ_PORT,
-        virtual_host=RABBITMQ_VHOST,
-        credentials=creds
-    )
-    conn = pika.BlockingConnection(params)
-    ch = conn.channel()
-    return conn, ch
+try:
+    from monitoring import send_monitoring_log as ship_monitoring_log
+except ModuleNotFoundError:
+    from planning.monitoring import send_monitoring_log as ship_monitoring_log
 
 def send_monitoring_log(message: str, level: str = "info", sender: str = "user-consumer"):
-    # Skip logging during unit tests
-    if os.getenv("UNITTEST_RUNNING") == "1" or "pytest" in sys.modules or "unittest" in sys.modules:
-        return
-
-    log = ET.Element("log")
-    ET.SubElement(log, "sender").text = sender
-    ET.SubElement(log, "timestamp").text = datetime.utcnow().isoformat() + "Z"
-    ET.SubElement(log, "level").text = level
-    ET.SubElement(log, "message").text = message
-    xml_bytes = ET.tostring(log, encoding="utf-8")
-
-    try:
-        conn, ch = _get_channel()
-        ch.basic_publish(
-            exchange="event",
-            routing_key="monitoring.log",
-            body=xml_bytes,
-            properties=pika.BasicProperties(content_type="application/xml")
-        )
-        conn.close()
-    except Exception as e:
-        print(f"🔴 Failed to send monitoring log: {e}")
+    # gebufferd en op de achtergrond verzonden over één blijvend kanaal
+    ship_monitoring_log(message, level=level, sender=sender)
 
 def log_info(message: str):
     print(message)
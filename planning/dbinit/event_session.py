@@ -14,11 +14,13 @@ def create_connection():
         print("Error connecting to MySQL:", e)
         return None
 
-def create_or_update_table(conn, table_name, columns, fks=None):
+def create_or_update_table(conn, table_name, columns, fks=None, primary_key=None):
     cursor = conn.cursor()
     cursor.execute(f"SHOW TABLES LIKE '{table_name}'")
     if not cursor.fetchone():
         cols_sql = ",\n  ".join(f"{c} {t}" for c,t in columns.items())
+        if primary_key:
+            cols_sql += f",\n  PRIMARY KEY ({primary_key})"
         fk_sql = ""
         if fks:
             for fk in fks:
@@ -36,6 +38,26 @@ def create_or_update_table(conn, table_name, columns, fks=None):
     conn.commit()
     cursor.close()
 
+def create_index_if_missing(conn, table_name, index_name, columns):
+    cursor = conn.cursor()
+    cursor.execute(f"SHOW INDEX FROM {table_name} WHERE Key_name = %s", (index_name,))
+    if not cursor.fetchall():
+        cursor.execute(f"CREATE INDEX {index_name} ON {table_name} ({columns})")
+        print(f"Index '{index_name}' created on '{table_name}'")
+    conn.commit()
+    cursor.close()
+
+# Kolommen die niet in de content hash meetellen (zelfde als hash_row in sync.py)
+HASH_IGNORED_COLUMNS = ("gcal_id", "synced", "synced_at", "updated_at", "row_hash")
+
+def row_hash_column(cols):
+    """
+    Stored generated column met een SHA-256 over de relevante kolommen, zodat de
+    synchronizer ongewijzigde rijen in MySQL zelf kan wegfilteren.
+    """
+    relevant = ", ".join(c for c in cols if c not in HASH_IGNORED_COLUMNS)
+    return f"CHAR(64) AS (SHA2(CAST(JSON_ARRAY({relevant}) AS CHAR), 256)) STORED"
+
 def create_event_table(conn):
     cols = {
         "event_id":             "VARCHAR(50) PRIMARY KEY",
@@ -53,9 +75,14 @@ def create_event_table(conn):
         "entrance_fee":         "DECIMAL(6,2)",
         "gcal_id":              "VARCHAR(255)",
         "synced":               "TINYINT(1) DEFAULT 0",
-        "synced_at":            "TIMESTAMP NULL"
+        "synced_at":            "TIMESTAMP NULL",
+        "updated_at":           "TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
     }
+    cols["row_hash"] = row_hash_column(cols)
     create_or_update_table(conn, "events", cols)
+    create_index_if_missing(conn, "events", "idx_events_updated_at", "updated_at")
+    # sync-venster van de synchronizer (enkel recente en toekomstige events)
+    create_index_if_missing(conn, "events", "idx_events_end_date", "end_date")
 
 def create_session_table(conn):
     cols = {
@@ -74,17 +101,22 @@ def create_session_table(conn):
         "speaker_bio":    "TEXT",
         "gcal_id":        "VARCHAR(255)",
         "synced":         "TINYINT(1) DEFAULT 0",
-        "synced_at":      "TIMESTAMP NULL"
+        "synced_at":      "TIMESTAMP NULL",
+        "updated_at":     "TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
     }
+    cols["row_hash"] = row_hash_column(cols)
     fks = [{"column":"event_id","ref_table":"events","ref_column":"event_id"}]
     create_or_update_table(conn, "sessions", cols, fks)
+    create_index_if_missing(conn, "sessions", "idx_sessions_updated_at", "updated_at")
+    create_index_if_missing(conn, "sessions", "idx_sessions_date", "date")
 
 def create_event_snapshot_table(conn):
     cols = {
         "event_id": "VARCHAR(50) PRIMARY KEY",
         "content_hash": "VARCHAR(64)",
         "gcal_id": "VARCHAR(255)",
-        "last_seen": "TIMESTAMP"
+        "last_seen": "TIMESTAMP",
+        "row_hash": "CHAR(64)"
     }
     create_or_update_table(conn, "event_snapshots", cols)
 
@@ -94,11 +126,82 @@ def create_session_snapshot_table(conn):
         "session_id": "VARCHAR(50) PRIMARY KEY",
         "content_hash": "VARCHAR(64)",
         "gcal_id": "VARCHAR(255)",
-        "last_seen": "TIMESTAMP"
+        "last_seen": "TIMESTAMP",
+        "row_hash": "CHAR(64)"
     }
     create_or_update_table(conn, "session_snapshots", cols)
 
 
+def create_sync_state_table(conn):
+    # Key/value opslag voor de synchronizer (o.a. watermarks per tabel)
+    cols = {
+        "name":       "VARCHAR(100) PRIMARY KEY",
+        "value":      "TEXT",
+        "updated_at": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+    }
+    create_or_update_table(conn, "sync_state", cols)
+
+def create_sync_failures_table(conn):
+    # Retry-wachtrij van de synchronizer: rijen die niet naar GCal geraakten
+    cols = {
+        "table_name":      "VARCHAR(50) NOT NULL",
+        "row_id":          "VARCHAR(50) NOT NULL",
+        "attempts":        "INT NOT NULL DEFAULT 0",
+        "next_attempt_at": "TIMESTAMP NULL",
+        "last_error":      "TEXT",
+        "updated_at":      "TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+    }
+    create_or_update_table(conn, "sync_failures", cols, primary_key="table_name, row_id")
+
+def create_sync_workers_table(conn):
+    # Heartbeats van de synchronizer-workers (multi-worker modus met shards)
+    cols = {
+        "worker_id":    "VARCHAR(100) PRIMARY KEY",
+        "heartbeat_at": "TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP",
+        "shards":       "VARCHAR(255)",
+        "outbox_head":  "BIGINT NULL"
+    }
+    create_or_update_table(conn, "sync_workers", cols)
+
+def create_sync_outbox_table(conn):
+    # Wijzigingen aan events/sessions, geschreven door triggers in dezelfde
+    # transactie als de wijziging zelf; de synchronizer leegt deze tabel.
+    cols = {
+        "id":         "BIGINT AUTO_INCREMENT PRIMARY KEY",
+        "table_name": "VARCHAR(50) NOT NULL",
+        "row_id":     "VARCHAR(50) NOT NULL",
+        "operation":  "VARCHAR(10) NOT NULL",
+        "created_at": "TIMESTAMP(3) DEFAULT CURRENT_TIMESTAMP(3)"
+    }
+    create_or_update_table(conn, "sync_outbox", cols)
+
+def create_trigger_if_missing(conn, trigger_name, sql):
+    cursor = conn.cursor()
+    cursor.execute("SHOW TRIGGERS WHERE `Trigger` = %s", (trigger_name,))
+    if not cursor.fetchall():
+        cursor.execute(sql)
+        print(f"Trigger '{trigger_name}' created")
+    conn.commit()
+    cursor.close()
+
+def create_outbox_triggers(conn, table_name, id_field):
+    create_trigger_if_missing(conn, f"{table_name}_outbox_insert", f"""
+        CREATE TRIGGER {table_name}_outbox_insert AFTER INSERT ON {table_name} FOR EACH ROW
+        INSERT INTO sync_outbox (table_name, row_id, operation) VALUES ('{table_name}', NEW.{id_field}, 'create')
+    """)
+    # Enkel bij inhoudelijke wijzigingen: de synchronizer zelf zet synced/gcal_id
+    # en mag zichzelf niet opnieuw wakker maken.
+    create_trigger_if_missing(conn, f"{table_name}_outbox_update", f"""
+        CREATE TRIGGER {table_name}_outbox_update AFTER UPDATE ON {table_name} FOR EACH ROW
+        INSERT INTO sync_outbox (table_name, row_id, operation)
+        SELECT '{table_name}', NEW.{id_field}, 'update' FROM DUAL
+        WHERE NOT (NEW.row_hash <=> OLD.row_hash)
+    """)
+    create_trigger_if_missing(conn, f"{table_name}_outbox_delete", f"""
+        CREATE TRIGGER {table_name}_outbox_delete AFTER DELETE ON {table_name} FOR EACH ROW
+        INSERT INTO sync_outbox (table_name, row_id, operation) VALUES ('{table_name}', OLD.{id_field}, 'delete')
+    """)
+
 
 def main():
     conn = create_connection()
@@ -108,6 +211,12 @@ def main():
     create_session_snapshot_table(conn) 
     create_event_table(conn)
     create_session_table(conn)
+    create_sync_state_table(conn)
+    create_sync_failures_table(conn)
+    create_sync_workers_table(conn)
+    create_sync_outbox_table(conn)
+    create_outbox_triggers(conn, "events", "event_id")
+    create_outbox_triggers(conn, "sessions", "session_id")
     conn.close()
     print("Database setup complete")
 
@@ -0,0 +1,3 @@
+from .client import SCOPES, build_service, discovery_document, get_credentials, get_service
+from .quota import (QuotaManager, SharedTokenBucket, TokenBucket, backoff_delay, get_quota,
+                    is_quota_error, retry_after)
@@ -0,0 +1,61 @@
+import os
+import threading
+import httplib2
+import google_auth_httplib2
+from google.oauth2 import service_account
+from googleapiclient.discovery import build_from_document
+
+# === GOOGLE CALENDAR CLIENT CONFIG ===
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+SERVICE_ACCOUNT_FILE = os.getenv('GOOGLE_APPLICATION_CREDENTIALS', '/app/service_account.json')
+# Meegeleverd discovery document: geen fetch bij Google bij het opstarten
+DISCOVERY_FILE = os.getenv(
+    "GCAL_DISCOVERY_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "discovery", "calendar.v3.json"))
+GCAL_HTTP_TIMEOUT = int(os.getenv("GCAL_HTTP_TIMEOUT", 30))
+
+_lock = threading.Lock()
+_document = None
+_credentials = {}
+_local = threading.local()
+
+def discovery_document():
+    """Het discovery document als tekst, één keer van schijf gelezen."""
+    global _document
+    if _document is None:
+        with open(DISCOVERY_FILE, encoding="utf-8") as f:
+            _document = f.read()
+    return _document
+
+def get_credentials(service_account_file=None, scopes=SCOPES):
+    """
+    Eén credentials-object per (bestand, scopes) voor het hele proces. Het
+    access token dat google-auth bij een refresh ophaalt zit in dat object,
+    dus alle threads en services hergebruiken het tot het verloopt.
+    """
+    key = (service_account_file or SERVICE_ACCOUNT_FILE, tuple(scopes))
+    with _lock:
+        if key not in _credentials:
+            _credentials[key] = service_account.Credentials.from_service_account_file(
+                key[0], scopes=list(scopes))
+        return _credentials[key]
+
+def build_service(credentials):
+    """
+    Nieuwe Calendar service uit het meegeleverde document. De httplib2.Http
+    houdt zijn connecties open (keep-alive), maar is niet thread-safe: gebruik
+    get_service() om er één per thread te krijgen.
+    """
+    http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http(timeout=GCAL_HTTP_TIMEOUT))
+    return build_from_document(discovery_document(), http=http)
+
+def get_service(service_account_file=None, scopes=SCOPES):
+    """Calendar service van de huidige thread; wordt per thread één keer opgebouwd."""
+    credentials = get_credentials(service_account_file, scopes)
+    services = getattr(_local, "services", None)
+    if services is None:
+        services = _local.services = {}
+    service = services.get(id(credentials))
+    if service is None:
+        service = services[id(credentials)] = build_service(credentials)
+    return service
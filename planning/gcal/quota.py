@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import random
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from googleapiclient.errors import HttpError
+
+try:
+    import fcntl
+except ImportError:  # geen flock (Windows): enkel binnen het proces
+    fcntl = None
+
+# === QUOTA CONFIG ===
+GCAL_RATE_PER_SECOND = float(os.getenv('GCAL_RATE_PER_SECOND', 10))
+GCAL_RATE_BURST      = int(os.getenv('GCAL_RATE_BURST', 50))
+# Bestand dat de bucket deelt tussen processen (zelfde host/volume); leeg = per proces.
+# synchronizer-db zet /var/lib/gcal/quota.json op het gcal-quota volume; app.py en
+# watch.py delen de quota enkel als ze dat volume mounten met dezelfde waarde.
+GCAL_QUOTA_FILE      = os.getenv("GCAL_QUOTA_FILE", "")
+# Hoe vaak een call na 403/429 opnieuw geprobeerd wordt, en de backoff daartussen
+GCAL_QUOTA_RETRIES   = int(os.getenv("GCAL_QUOTA_RETRIES", 3))
+GCAL_BACKOFF_BASE    = float(os.getenv("GCAL_BACKOFF_BASE", 1))
+GCAL_BACKOFF_MAX     = float(os.getenv("GCAL_BACKOFF_MAX", 64))
+
+QUOTA_REASONS = ("rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded")
+
+def is_quota_error(error):
+    """429, of 403 met een rate-limit reden van de Calendar API."""
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status == 429:
+        return True
+    return error.resp.status == 403 and any(reason in str(error.content) for reason in QUOTA_REASONS)
+
+def retry_after(error):
+    """Seconden uit de Retry-After header (getal of HTTP-datum), anders None."""
+    headers = getattr(error, "resp", None) or {}
+    value = next((v for k, v in dict(headers).items() if str(k).lower() == "retry-after"), None)
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt, base=None, cap=None):
+    """Exponentiële backoff met jitter: base * 2^(n-1) + willekeurig deel van base, begrensd op cap."""
+    base = GCAL_BACKOFF_BASE if base is None else base
+    cap = GCAL_BACKOFF_MAX if cap is None else cap
+    return min(cap, base * 2 ** (attempt - 1) + random.uniform(0, base))
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per seconde, maximaal `capacity`."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._state = self._initial_state()
+
+    def _initial_state(self):
+        return {"tokens": float(self.capacity), "updated": self.clock(), "blocked_until": 0.0,
+                "granted": 0, "waits": 0, "waited_seconds": 0.0, "throttled": 0}
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            yield self._state
+
+    def _take(self, state, tokens):
+        """Neemt tokens als het kan (0) of geeft terug hoe lang er gewacht moet worden."""
+        now = self.clock()
+        if now < state["blocked_until"]:
+            return state["blocked_until"] - now
+        if self.rate <= 0:
+            return 0
+        state["tokens"] = min(self.capacity, state["tokens"] + (now - state["updated"]) * self.rate)
+        state["updated"] = now
+        needed = min(tokens, self.capacity)
+        if state["tokens"] >= needed:
+            state["tokens"] -= tokens
+            return 0
+        return (needed - state["tokens"]) / self.rate
+
+    @property
+    def tokens(self):
+        with self._locked() as state:
+            return state["tokens"]
+
+    def acquire(self, tokens=1):
+        """Blokkeert tot er `tokens` beschikbaar zijn (grote aanvragen gaan in schuld)."""
+        waited = 0.0
+        while True:
+            with self._locked() as state:
+                wait = self._take(state, tokens)
+                if wait <= 0:
+                    state["granted"] += tokens
+                    if waited:
+                        state["waits"] += 1
+                        state["waited_seconds"] += waited
+                    return
+            self.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds):
+        """Niemand krijgt tokens tot `seconds` verstreken zijn (Retry-After / backoff)."""
+        with self._locked() as state:
+            state["blocked_until"] = max(state["blocked_until"], self.clock() + seconds)
+            state["throttled"] += 1
+
+    def usage(self):
+        with self._locked() as state:
+            now = self.clock()
+            tokens = state["tokens"]
+            if self.rate > 0:
+                tokens = min(self.capacity, tokens + (now - state["updated"]) * self.rate)
+            return {
+                "rate": self.rate,
+                "capacity": self.capacity,
+                "tokens": round(tokens, 3),
+                "blocked_for": round(max(0.0, state["blocked_until"] - now), 3),
+                "granted": state["granted"],
+                "waits": state["waits"],
+                "waited_seconds": round(state["waited_seconds"], 3),
+                "throttled": state["throttled"]
+            }
+
+class SharedTokenBucket(TokenBucket):
+    """
+    TokenBucket waarvan de toestand in een bestand staat, afgeschermd met
+    flock: alle processen die hetzelfde bestand gebruiken (app, synchronizer
+    workers) delen dus één quota. Gebruikt de wandklok, want monotonic is
+    niet vergelijkbaar tussen processen.
+    """
+
+    def __init__(self, path, rate, capacity, clock=time.time, sleep=time.sleep):
+        self.path = path
+        self._fd = None
+        super().__init__(rate, capacity, clock=clock, sleep=sleep)
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                raw = os.read(self._fd, 4096)
+                try:
+                    state = {**self._initial_state(), **json.loads(raw)} if raw else self._initial_state()
+                except ValueError:
+                    state = self._initial_state()
+                yield state
+                data = json.dumps(state).encode()
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.ftruncate(self._fd, 0)
+                os.write(self._fd, data)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+class QuotaManager:
+    """
+    Eén ingang voor Calendar API calls: wacht op de (gedeelde) token bucket,
+    voert uit en probeert bij 403/429 opnieuw na Retry-After of exponentiële
+    backoff. De pauze geldt voor iedereen die de bucket deelt.
+    """
+
+    def __init__(self, bucket, retries=None):
+        self.bucket = bucket
+        self.retries = GCAL_QUOTA_RETRIES if retries is None else retries
+
+    def acquire(self, tokens=1):
+        self.bucket.acquire(tokens)
+
+    def throttled(self, error, attempt):
+        """Registreert een quota-fout en pauzeert de bucket; geeft de wachttijd terug."""
+        delay = retry_after(error)
+        if delay is None:
+            delay = backoff_delay(attempt)
+        self.bucket.pause(delay)
+        return delay
+
+    def execute(self, request, tokens=1):
+        """request.execute() binnen de quota; gooit de laatste fout als de retries op zijn."""
+        attempt = 0
+        while True:
+            attempt += 1
+            self.acquire(tokens)
+            try:
+                return request.execute()
+            except HttpError as e:
+                if not is_quota_error(e) or attempt > self.retries:
+                    raise
+                self.throttled(e, attempt)
+
+    def usage(self):
+        return self.bucket.usage()
+
+_quota = None
+_quota_lock = threading.Lock()
+
+def get_quota():
+    """De QuotaManager van dit proces (gedeeld via GCAL_QUOTA_FILE indien ingesteld)."""
+    global _quota
+    with _quota_lock:
+        if _quota is None:
+            if GCAL_QUOTA_FILE and fcntl is not None:
+                bucket = SharedTokenBucket(GCAL_QUOTA_FILE, GCAL_RATE_PER_SECOND, GCAL_RATE_BURST)
+            else:
+                bucket = TokenBucket(GCAL_RATE_PER_SECOND, GCAL_RATE_BURST)
+            _quota = QuotaManager(bucket)
+        return _quota
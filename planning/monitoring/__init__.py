@@ -0,0 +1 @@
+from .shipper import LEVELS, LogShipper, get_shipper, send_monitoring_log
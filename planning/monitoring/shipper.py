@@ -0,0 +1,203 @@
+import os
+import sys
+import time
+import atexit
+import random
+import threading
+import xml.etree.ElementTree as ET
+from collections import deque
+from datetime import datetime
+import pika
+
+# === RabbitMQ config (monitoring logs) ===
+RABBITMQ_HOST      = 'rabbitmq'
+RABBITMQ_PORT      = int(os.getenv("RABBITMQ_AMQP_PORT", 5672))
+RABBITMQ_USERNAME  = os.getenv("RABBITMQ_USER")
+RABBITMQ_PASSWORD  = os.getenv("RABBITMQ_PASSWORD")
+RABBITMQ_VHOST     = os.getenv("RABBITMQ_USER")
+RABBITMQ_HEARTBEAT = int(os.getenv("RABBITMQ_HEARTBEAT", 30))
+
+# === SHIPPER CONFIG ===
+# Ringbuffer van MONITORING_BUFFER_SIZE logs; is hij vol, dan valt de oudste weg
+MONITORING_BUFFER_SIZE    = int(os.getenv("MONITORING_BUFFER_SIZE", 10000))
+# Max. logs per verzendronde, en hoe lang de thread wacht op een volle ronde
+MONITORING_BATCH_SIZE     = int(os.getenv("MONITORING_BATCH_SIZE", 200))
+MONITORING_FLUSH_INTERVAL = float(os.getenv("MONITORING_FLUSH_INTERVAL", 0.5))
+# Logs onder dit niveau worden niet verzonden (wel nog geprint door de services)
+MONITORING_LOG_LEVEL      = os.getenv("MONITORING_LOG_LEVEL", "info")
+# Fractie van de debug-logs die verzonden wordt (0 = geen, 1 = alle)
+MONITORING_DEBUG_SAMPLE   = float(os.getenv("MONITORING_DEBUG_SAMPLE", 0.1))
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40, "critical": 50}
+
+def _log_xml(sender, timestamp, level, message):
+    log = ET.Element("log")
+    ET.SubElement(log, "sender").text = sender
+    ET.SubElement(log, "timestamp").text = timestamp
+    ET.SubElement(log, "level").text = level
+    ET.SubElement(log, "message").text = message
+    return ET.tostring(log, encoding="utf-8")
+
+def _default_connect():
+    creds = pika.PlainCredentials(RABBITMQ_USERNAME, RABBITMQ_PASSWORD)
+    params = pika.ConnectionParameters(
+        host=RABBITMQ_HOST,
+        port=RABBITMQ_PORT,
+        virtual_host=RABBITMQ_VHOST,
+        credentials=creds,
+        heartbeat=RABBITMQ_HEARTBEAT
+    )
+    return pika.BlockingConnection(params)
+
+class LogShipper:
+    """
+    Verstuurt monitoring logs op de achtergrond. submit() zet enkel een record
+    in een begrensde ringbuffer; één thread haalt ze er per batch uit en
+    publiceert ze (één <log> per bericht, zoals de monitoring queue verwacht)
+    over een blijvend kanaal. Bij een volle buffer verdwijnt de oudste log en
+    telt `dropped`; het aantal wordt zelf ook als waarschuwing verzonden.
+    """
+
+    def __init__(self, connect=None, capacity=None, batch_size=None, flush_interval=None,
+                 min_level=None, debug_sample=None, sample=random.random):
+        self._connect = connect or _default_connect
+        self.batch_size = batch_size or MONITORING_BATCH_SIZE
+        self.flush_interval = MONITORING_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.min_level = LEVELS.get(min_level or MONITORING_LOG_LEVEL, LEVELS["info"])
+        self.debug_sample = MONITORING_DEBUG_SAMPLE if debug_sample is None else debug_sample
+        self._sample = sample
+        self._buffer = deque(maxlen=capacity or MONITORING_BUFFER_SIZE)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._busy = False
+        self._closed = False
+        self._conn = None
+        self._channel = None
+        self.counters = {"sent": 0, "dropped": 0, "filtered": 0, "sampled_out": 0, "failed": 0}
+        self._dropped_reported = 0
+
+    def submit(self, message, level="info", sender="planning", exchange="event"):
+        """Zet een log klaar voor verzending; geeft False terug als hij niet meegaat."""
+        if LEVELS.get(level, LEVELS["info"]) < self.min_level:
+            self.counters["filtered"] += 1
+            return False
+        if level == "debug" and self._sample() >= self.debug_sample:
+            self.counters["sampled_out"] += 1
+            return False
+        record = (exchange, sender, datetime.utcnow().isoformat() + "Z", level, message)
+        with self._cond:
+            if self._closed:
+                return False
+            if len(self._buffer) == self._buffer.maxlen:
+                self.counters["dropped"] += 1
+            self._buffer.append(record)
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-shipper", daemon=True)
+                self._thread.start()
+        return True
+
+    def _take_batch(self):
+        with self._cond:
+            if not self._buffer and not self._closed:
+                self._cond.wait(self.flush_interval)
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            dropped = self.counters["dropped"] - self._dropped_reported
+            self._dropped_reported += dropped
+            if dropped:
+                batch.append(("event", "log-shipper", datetime.utcnow().isoformat() + "Z", "warning",
+                              f"⚠️  {dropped} monitoring log(s) gedropt: buffer vol"))
+            self._busy = bool(batch)
+            return batch, self._closed and not batch
+
+    def _run(self):
+        while True:
+            batch, stop = self._take_batch()
+            if stop:
+                self._disconnect()
+                return
+            if batch:
+                self._ship(batch)
+            elif self._conn is not None:
+                self._idle()
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def _ship(self, batch):
+        try:
+            if self._channel is None or self._channel.is_closed:
+                self._disconnect()
+                self._conn = self._connect()
+                self._channel = self._conn.channel()
+            properties = pika.BasicProperties(content_type="application/xml")
+            for exchange, sender, timestamp, level, message in batch:
+                self._channel.basic_publish(
+                    exchange=exchange,
+                    routing_key="monitoring.log",
+                    body=_log_xml(sender, timestamp, level, message),
+                    properties=properties
+                )
+            self.counters["sent"] += len(batch)
+        except Exception as e:
+            self.counters["failed"] += len(batch)
+            self._disconnect()
+            print(f"🔴 Failed to send {len(batch)} monitoring log(s): {e}")
+
+    def _idle(self):
+        # houdt de heartbeats bij zolang er niets te verzenden is
+        try:
+            self._conn.process_data_events(time_limit=0)
+        except Exception:
+            self._disconnect()
+
+    def _disconnect(self):
+        conn, self._conn, self._channel = self._conn, None, None
+        if conn is not None and conn.is_open:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def flush(self, timeout=5):
+        """Wacht tot de buffer verzonden is (of `timeout` verstreken is)."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify()
+            while (self._buffer or self._busy) and self._thread is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=5):
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._cond:
+            return {**self.counters, "queued": len(self._buffer)}
+
+_shipper = None
+_shipper_lock = threading.Lock()
+
+def get_shipper():
+    """De LogShipper van dit proces; bij het afsluiten wordt hij nog leeggemaakt."""
+    global _shipper
+    with _shipper_lock:
+        if _shipper is None:
+            _shipper = LogShipper()
+            atexit.register(_shipper.close)
+        return _shipper
+
+def send_monitoring_log(message: str, level: str = "info", sender: str = "planning", exchange: str = "event"):
+    # Skip logging during unit tests
+    if os.getenv("UNITTEST_RUNNING") == "1" or "pytest" in sys.modules or "unittest" in sys.modules:
+        return
+    get_shipper().submit(message, level=level, sender=sender, exchange=exchange)
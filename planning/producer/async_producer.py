@@ -0,0 +1,180 @@
+import asyncio
+import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
+
+from .producer import (
+    RABBITMQ_HOST, RABBITMQ_PORT, RABBITMQ_USERNAME, RABBITMQ_PASSWORD, RABBITMQ_VHOST,
+    RABBITMQ_HEARTBEAT, RABBITMQ_BLOCKED_TIMEOUT, PUBLISH_CONFIRM_TIMEOUT, ROUTING_KEYS, ID_FIELDS,
+    _TO_XML, _exchange_for, _prepare_batch, _report_batch, _validate, log_error, log_info
+)
+
+# --- asyncio publisher -------------------------------------------------------
+class AsyncPublisher:
+    """
+    Asyncio-variant van de Publisher: één AsyncioConnection met één kanaal in
+    confirm mode, gedeeld door alle coroutines van de event loop. Elke publish
+    krijgt een future die de ack/nack van zijn delivery tag afwacht, dus veel
+    gelijktijdige publishes lopen over dezelfde verbinding zonder thread per
+    bericht. Een gesloten verbinding laat de openstaande futures falen; de
+    volgende publish verbindt opnieuw.
+    """
+
+    def __init__(self, open_channel=None):
+        self._open_channel = open_channel or self._default_open_channel
+        self._lock = None
+        self._conn = None
+        self._channel = None
+        self._pending = {}
+        self._next_tag = 1
+
+    async def _default_open_channel(self):
+        loop = asyncio.get_running_loop()
+        opened = loop.create_future()
+
+        def fail(conn, error):
+            if not opened.done():
+                opened.set_exception(pika.exceptions.AMQPConnectionError(error))
+            # een oude verbinding die laat sluit, mag de huidige niet afbreken
+            if conn is self._conn:
+                self._closed(error)
+
+        creds = pika.PlainCredentials(RABBITMQ_USERNAME, RABBITMQ_PASSWORD)
+        params = pika.ConnectionParameters(
+            host=RABBITMQ_HOST,
+            port=RABBITMQ_PORT,
+            virtual_host=RABBITMQ_VHOST,
+            credentials=creds,
+            heartbeat=RABBITMQ_HEARTBEAT,
+            blocked_connection_timeout=RABBITMQ_BLOCKED_TIMEOUT
+        )
+        old, self._conn = self._conn, None
+        if old is not None and not old.is_closed:
+            old.close()
+        self._conn = AsyncioConnection(
+            params,
+            on_open_callback=lambda conn: conn.channel(on_open_callback=opened.set_result),
+            on_open_error_callback=fail,
+            on_close_callback=fail,
+            custom_ioloop=loop
+        )
+        channel = await opened
+        selected = loop.create_future()
+
+        def channel_closed(ch, error):
+            if not selected.done():
+                selected.set_exception(pika.exceptions.AMQPChannelError(error))
+            if ch is self._channel:
+                self._closed(error)
+
+        channel.add_on_close_callback(channel_closed)
+        channel.confirm_delivery(ack_nack_callback=self._on_confirm,
+                                 callback=lambda frame: selected.set_result(frame))
+        await selected
+        return channel
+
+    async def _ensure_channel(self):
+        if self._channel is not None and self._channel.is_open:
+            return self._channel
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._channel is None or not self._channel.is_open:
+                self._channel = await self._open_channel()
+                self._next_tag = 1
+        return self._channel
+
+    def _on_confirm(self, frame):
+        method = frame.method
+        nack = not isinstance(method, pika.spec.Basic.Ack)
+        tags = [t for t in self._pending if t <= method.delivery_tag] if method.multiple else [method.delivery_tag]
+        for tag in tags:
+            future = self._pending.pop(tag, None)
+            if future is None or future.done():
+                continue
+            if nack:
+                future.set_exception(pika.exceptions.NackError([]))
+            else:
+                future.set_result(None)
+
+    def _closed(self, error):
+        self._channel = None
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(pika.exceptions.AMQPConnectionError(error))
+
+    def _send(self, channel, exchange, routing_key, body):
+        # tag toekennen en publiceren zonder await ertussen: de tags blijven in volgorde
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._next_tag] = future
+        self._next_tag += 1
+        channel.basic_publish(exchange=exchange, routing_key=routing_key, body=body,
+                              properties=pika.BasicProperties(content_type="application/xml"))
+        return future
+
+    async def _confirmed(self, future):
+        try:
+            await asyncio.wait_for(future, PUBLISH_CONFIRM_TIMEOUT)
+            return None
+        except asyncio.TimeoutError:
+            return TimeoutError("geen confirm van de broker ontvangen")
+        except Exception as e:
+            return e
+
+    async def publish(self, exchange, routing_key, body):
+        """Publiceert en keert terug na de ack; gooit de fout bij nack/timeout."""
+        channel = await self._ensure_channel()
+        error = await self._confirmed(self._send(channel, exchange, routing_key, body))
+        if error is not None:
+            raise error
+
+    async def publish_batch(self, messages):
+        """(exchange, routing_key, body) berichten -> per bericht None (ack) of de fout."""
+        if not messages:
+            return []
+        try:
+            channel = await self._ensure_channel()
+        except Exception as e:
+            # zelfde contract als de blocking variant: de fout per bericht
+            return [e] * len(messages)
+        futures = [self._send(channel, *message) for message in messages]
+        return list(await asyncio.gather(*(self._confirmed(future) for future in futures)))
+
+    async def close(self):
+        conn, self._conn, self._channel = self._conn, None, None
+        if conn is not None and not conn.is_closed:
+            conn.close()
+
+_publisher = AsyncPublisher()
+
+# --- openbare API ------------------------------------------------------------
+async def _publish_one(kind: str, data: dict, operation: str) -> None:
+    _validate(kind, data, operation)
+    routing_key = ROUTING_KEYS[kind][operation]
+
+    try:
+        await _publisher.publish(_exchange_for(routing_key), routing_key, _TO_XML[kind](data, operation))
+        log_info(f"{kind.capitalize()} published: {data[ID_FIELDS[kind]]} ({operation})")
+    except Exception as e:
+        log_error(f"❌ Failed to publish {kind}: {e}")
+        raise RuntimeError(f"❌ Failed to publish {kind} to RabbitMQ: {e}")
+
+async def publish_event(data: dict, operation: str = "create") -> None:
+    await _publish_one("event", data, operation)
+
+async def publish_session(data: dict, operation: str = "create") -> None:
+    await _publish_one("session", data, operation)
+
+async def _publish_batch(kind: str, items: list) -> list:
+    errors, messages, positions = _prepare_batch(kind, items)
+    for i, error in zip(positions, await _publisher.publish_batch(messages)):
+        errors[i] = error
+    return _report_batch(kind, items, errors)
+
+async def publish_events_batch(items: list) -> list:
+    """[(data, operation)] -> [None | fout] per event, zoals producer.publish_events_batch."""
+    return await _publish_batch("event", items)
+
+async def publish_sessions_batch(items: list) -> list:
+    """[(data, operation)] -> [None | fout] per sessie, zoals producer.publish_sessions_batch."""
+    return await _publish_batch("session", items)
@@ -1,8 +1,7 @@
 import os
-import sys
 import pika
-import xml.etree.ElementTree as ET
-from datetime import datetime
+import threading
+import time
 
 # --- RabbitMQ config ---------------------------------------------------------
 RABBITMQ_HOST      = 'rabbitmq' 
@@ -10,6 +9,13 @@ RABBITMQ_PORT      = int(os.getenv("RABBITMQ_AMQP_PORT", 5672))
 RABBITMQ_USERNAME  = os.getenv("RABBITMQ_USER")
 RABBITMQ_PASSWORD  = os.getenv("RABBITMQ_PASSWORD")
 RABBITMQ_VHOST     = os.getenv("RABBITMQ_USER")
+# AMQP heartbeat (s) van de blijvende verbinding; de broker sluit ze na ~2x stilte
+RABBITMQ_HEARTBEAT = int(os.getenv("RABBITMQ_HEARTBEAT", 30))
+RABBITMQ_BLOCKED_TIMEOUT = int(os.getenv("RABBITMQ_BLOCKED_TIMEOUT", 60))
+# Om de hoeveel seconden een stille verbinding haar heartbeats verwerkt (0 = uit)
+PUBLISHER_KEEPALIVE = float(os.getenv("PUBLISHER_KEEPALIVE_SECONDS", RABBITMQ_HEARTBEAT / 2))
+# Max. wachttijd (s) op de confirms van een batch
+PUBLISH_CONFIRM_TIMEOUT = float(os.getenv("PUBLISH_CONFIRM_TIMEOUT", 30))
 
 
 EXCHANGE_NAME = "event"                   # één exchange voor alles
@@ -25,31 +31,21 @@ ROUTING_KEYS  = {                         # topic‐routing
         "delete": "session.delete"
     }
 }
+# Verplichte velden per soort; bij delete enkel de id
+REQUIRED_FIELDS = {
+    "event": ["event_id", "title", "start_date", "end_date", "start_time", "end_time"],
+    "session": ["session_id", "event_id", "title", "date", "start_time", "end_time"]
+}
+ID_FIELDS = {"event": "event_id", "session": "session_id"}
 
-# --- Monitoring log utility --------------------------------------------------
-def send_monitoring_log(message: str, level: str = "info", sender: str = "event-producer"):
-    # Skip logging during unit tests
-    if os.getenv("UNITTEST_RUNNING") == "1" or "pytest" in sys.modules or "unittest" in sys.modules:
-        return
-
-    log = ET.Element("log")
-    ET.SubElement(log, "sender").text = sender
-    ET.SubElement(log, "timestamp").text = datetime.utcnow().isoformat() + "Z"
-    ET.SubElement(log, "level").text = level
-    ET.SubElement(log, "message").text = message
-    xml_bytes = ET.tostring(log, encoding="utf-8")
+# --- Monitoring log utility (gedeelde achtergrond-shipper) --------------------
+try:
+    from monitoring import send_monitoring_log as ship_monitoring_log
+except ModuleNotFoundError:
+    from planning.monitoring import send_monitoring_log as ship_monitoring_log
 
-    try:
-        conn, ch = _get_channel()
-        ch.basic_publish(
-            exchange="event",
-            routing_key="monitoring.log",
-            body=xml_bytes,
-            properties=pika.BasicProperties(content_type="application/xml")
-        )
-        conn.close()
-    except Exception as e:
-        print(f"🔴 Failed to send monitoring log: {e}")
+def send_monitoring_log(message: str, level: str = "info", sender: str = "event-producer"):
+    ship_monitoring_log(message, level=level, sender=sender)
 
 def log_info(message: str):
     print(message)  # Altijd naar de console
@@ -59,98 +55,285 @@ def log_error(message: str):
     print(message)  # Altijd naar de console
     send_monitoring_log(message, level="error")
 
-# --- verbinding helper -------------------------------------------------------
-def _get_channel():
-    creds = pika.PlainCredentials(RABBITMQ_USERNAME, RABBITMQ_PASSWORD)
-    params = pika.ConnectionParameters(
-        host=RABBITMQ_HOST,
-        port=RABBITMQ_PORT,
-        virtual_host=RABBITMQ_VHOST,
-        credentials=creds
-    )
-    conn = pika.BlockingConnection(params)
-    ch   = conn.channel()
-    return conn, ch
+# --- blijvende publisher -----------------------------------------------------
+class Publisher:
+    """
+    Eén langlevende AMQP-verbinding per proces, pas bij de eerste publish
+    geopend. publish() gebruikt een kanaal met publisher confirms (basic_publish
+    keert terug na de ack van de broker), publish_batch() een eigen kanaal dat
+    de confirms per delivery tag bijhoudt. Monitoring logs lopen via
+    monitoring.shipper, niet via deze klasse. pika's BlockingConnection is niet
+    thread-safe, dus een lock serialiseert de publishes. Bij een verbroken
+    verbinding wordt één keer opnieuw verbonden.
+
+    BlockingConnection verwerkt heartbeats enkel binnen process_data_events;
+    zolang de verbinding open is, roept een daemon-thread dat daarom om de
+    `keepalive` seconden aan, anders sluit de broker haar na een stille periode.
+    """
+
+    def __init__(self, connect=None, keepalive=None):
+        self._connect = connect or self._default_connect
+        self.keepalive = PUBLISHER_KEEPALIVE if keepalive is None else keepalive
+        self._lock = threading.Lock()
+        self._keepalive_thread = None
+        self._conn = None
+        self._confirm_channel = None
+        self._batch_channel = None
+        self._confirms = {}
+        self._next_tag = 1
+
+    @staticmethod
+    def _default_connect():
+        creds = pika.PlainCredentials(RABBITMQ_USERNAME, RABBITMQ_PASSWORD)
+        params = pika.ConnectionParameters(
+            host=RABBITMQ_HOST,
+            port=RABBITMQ_PORT,
+            virtual_host=RABBITMQ_VHOST,
+            credentials=creds,
+            heartbeat=RABBITMQ_HEARTBEAT,
+            blocked_connection_timeout=RABBITMQ_BLOCKED_TIMEOUT
+        )
+        return pika.BlockingConnection(params)
+
+    def _connection(self):
+        if self._conn is None or self._conn.is_closed:
+            self._reset()
+            self._conn = self._connect()
+            self._start_keepalive()
+        else:
+            # verwerkt heartbeats en merkt een door de broker gesloten verbinding op
+            self._conn.process_data_events(time_limit=0)
+        return self._conn
+
+    def _channel(self):
+        conn = self._connection()
+        if self._confirm_channel is None or self._confirm_channel.is_closed:
+            self._confirm_channel = conn.channel()
+            self._confirm_channel.confirm_delivery()
+        return self._confirm_channel
+
+    def _start_keepalive(self):
+        if self.keepalive > 0 and self._keepalive_thread is None:
+            self._keepalive_thread = threading.Thread(target=self._keep_alive, name="publisher-keepalive",
+                                                      daemon=True)
+            self._keepalive_thread.start()
+
+    def _keep_alive(self):
+        while True:
+            time.sleep(self.keepalive)
+            with self._lock:
+                if self._conn is None or self._conn.is_closed:
+                    # stopt; de volgende verbinding start een nieuwe thread
+                    self._keepalive_thread = None
+                    return
+                try:
+                    self._conn.process_data_events(time_limit=0)
+                except Exception:
+                    self._reset()
+
+    def _open_batch_channel(self):
+        """
+        Kanaal voor batches: confirms worden niet per bericht afgewacht maar
+        asynchroon per delivery tag bijgehouden (pika's BlockingChannel kent
+        enkel de blokkerende variant, dus op het onderliggende kanaal).
+        """
+        self._connection()
+        if self._batch_channel is None or self._batch_channel.is_closed:
+            ch = self._conn.channel()
+            selected = []
+            ch._impl.confirm_delivery(ack_nack_callback=self._on_confirm,
+                                      callback=lambda frame: selected.append(frame))
+            deadline = time.monotonic() + PUBLISH_CONFIRM_TIMEOUT
+            while not selected:
+                if time.monotonic() > deadline:
+                    raise pika.exceptions.AMQPChannelError("confirm.select timeout")
+                self._conn.process_data_events(time_limit=0.1)
+            self._batch_channel, self._confirms, self._next_tag = ch, {}, 1
+        return self._batch_channel
+
+    def _on_confirm(self, frame):
+        method = frame.method
+        error = None if isinstance(method, pika.spec.Basic.Ack) else pika.exceptions.NackError([])
+        tags = [t for t in self._confirms if t <= method.delivery_tag] if method.multiple else [method.delivery_tag]
+        for tag in tags:
+            slot = self._confirms.pop(tag, None)
+            if slot is not None:
+                slot[0] = error
+
+    def publish_batch(self, messages):
+        """
+        messages: lijst van (exchange, routing_key, body). Publiceert alles
+        achter elkaar en wacht daarna op de acks (gepipelined). Geeft per
+        bericht None (bevestigd) of de fout terug, in dezelfde volgorde.
+        """
+        if not messages:
+            return []
+        properties = pika.BasicProperties(content_type="application/xml")
+        pending = object()
+        slots = [[pending] for _ in messages]
+        with self._lock:
+            try:
+                try:
+                    ch = self._open_batch_channel()
+                except (pika.exceptions.AMQPConnectionError, pika.exceptions.AMQPChannelError):
+                    # nog niets gepubliceerd: één keer opnieuw verbinden, zoals publish()
+                    self._reset()
+                    ch = self._open_batch_channel()
+                for (exchange, routing_key, body), slot in zip(messages, slots):
+                    self._confirms[self._next_tag] = slot
+                    self._next_tag += 1
+                    ch._impl.basic_publish(exchange=exchange, routing_key=routing_key,
+                                           body=body, properties=properties)
+                deadline = time.monotonic() + PUBLISH_CONFIRM_TIMEOUT
+                while any(slot[0] is pending for slot in slots) and time.monotonic() < deadline:
+                    self._conn.process_data_events(time_limit=0.1)
+            except (pika.exceptions.AMQPConnectionError, pika.exceptions.AMQPChannelError) as e:
+                self._reset()
+                for slot in slots:
+                    if slot[0] is pending:
+                        slot[0] = e
+        timeout = TimeoutError("geen confirm van de broker ontvangen")
+        return [timeout if slot[0] is pending else slot[0] for slot in slots]
+
+    def _reset(self):
+        self._batch_channel, self._confirms = None, {}
+        conn, self._conn, self._confirm_channel = self._conn, None, None
+        if conn is not None and conn.is_open:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def publish(self, exchange, routing_key, body):
+        """Publiceert en keert terug na de ack (NackError/UnroutableError anders)."""
+        properties = pika.BasicProperties(content_type="application/xml")
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    self._channel().basic_publish(
+                        exchange=exchange, routing_key=routing_key, body=body, properties=properties)
+                    return
+                except (pika.exceptions.NackError, pika.exceptions.UnroutableError):
+                    raise
+                except (pika.exceptions.AMQPConnectionError, pika.exceptions.AMQPChannelError):
+                    self._reset()
+                    if attempt == 2:
+                        raise
+
+    def close(self):
+        with self._lock:
+            self._reset()
+
+_publisher = Publisher()
 
 # --- XML helpers -------------------------------------------------------------
-def _build_info(parent, operation: str):
-    info = ET.SubElement(parent, "info")
-    ET.SubElement(info, "sender").text     = "planning"
-    ET.SubElement(info, "operation").text  = operation
-    return info
-
-def _event_to_xml(data: dict, operation: str) -> bytes:
-    root = ET.Element("attendify", {
-        "xmlns:xsi": "http://www.w3.org/2001/XMLSchema-instance",
-        "xsi:noNamespaceSchemaLocation": "event.xsd"
-    })
-
-    info = ET.SubElement(root, "info")
-    ET.SubElement(info, "sender").text = "planning"
-    ET.SubElement(info, "operation").text = operation
-
-    e = ET.SubElement(root, "event")
-    ET.SubElement(e, "uid").text = data["event_id"]
-
-    if operation != "delete":
-        ET.SubElement(e, "gcid").text = data.get("gcal_id", "")
-        ET.SubElement(e, "title").text = data["title"]
-        ET.SubElement(e, "description").text = data.get("description", "")
-        ET.SubElement(e, "location").text = data.get("location", "")
-        ET.SubElement(e, "start_date").text = str(data["start_date"])
-        ET.SubElement(e, "end_date").text = str(data["end_date"])
-        ET.SubElement(e, "start_time").text = str(data["start_time"])
-        ET.SubElement(e, "end_time").text = str(data["end_time"])
-        ET.SubElement(e, "organizer_name").text = data.get("organizer_name", "")
-        ET.SubElement(e, "organizer_uid").text = data.get("organizer_uid", "")
-        ET.SubElement(e, "entrance_fee").text = str(data.get("entrance_fee", "0.00"))
-
-    return ET.tostring(root, encoding="utf-8")
-
-def _session_to_xml(data: dict, operation: str) -> bytes:
-    root = ET.Element("attendify", {
-        "xmlns:xsi": "http://www.w3.org/2001/XMLSchema-instance",
-        "xsi:noNamespaceSchemaLocation": "session.xsd"
-    })
-
-    info = ET.SubElement(root, "info")
-    ET.SubElement(info, "sender").text = "planning"
-    ET.SubElement(info, "operation").text = operation
-
-    s = ET.SubElement(root, "session")
-    ET.SubElement(s, "uid").text = data["session_id"]
-
-    if operation != "delete":
-        ET.SubElement(s, "event_id").text = data["event_id"]
-        ET.SubElement(s, "title").text = data["title"]
-        ET.SubElement(s, "description").text = data.get("description", "")
-        ET.SubElement(s, "date").text = str(data["date"])
-        ET.SubElement(s, "start_time").text = str(data["start_time"])
-        ET.SubElement(s, "end_time").text = str(data["end_time"])
-        ET.SubElement(s, "location").text = data.get("location", "")
-        ET.SubElement(s, "max_attendees").text = str(data.get("max_attendees", 0))
-        ET.SubElement(s, "gcid").text = data.get("gcal_id", "")
-
-        speaker = ET.SubElement(s, "speaker")
-        ET.SubElement(speaker, "name").text = f"{data.get('speaker_first_name','')} {data.get('speaker_name','')}".strip()
-        ET.SubElement(speaker, "bio").text = data.get("speaker_bio", "")
-
-    return ET.tostring(root, encoding="utf-8")
+# Voorgecompileerde templates: de vaste stukken XML staan als strings klaar en
+# enkel de veldwaarden worden ge-escaped en ertussen geschreven, zonder
+# ElementTree per bericht. De output is byte-identiek aan ET.tostring(root,
+# encoding="utf-8") van dezelfde boom (zie de golden tests).
+EVENT_FIELDS = (
+    ("gcid",           lambda d: d.get("gcal_id", "")),
+    ("title",          lambda d: d["title"]),
+    ("description",    lambda d: d.get("description", "")),
+    ("location",       lambda d: d.get("location", "")),
+    ("start_date",     lambda d: str(d["start_date"])),
+    ("end_date",       lambda d: str(d["end_date"])),
+    ("start_time",     lambda d: str(d["start_time"])),
+    ("end_time",       lambda d: str(d["end_time"])),
+    ("organizer_name", lambda d: d.get("organizer_name", "")),
+    ("organizer_uid",  lambda d: d.get("organizer_uid", "")),
+    ("entrance_fee",   lambda d: str(d.get("entrance_fee", "0.00")))
+)
 
-# --- openbare API ------------------------------------------------------------
-def publish_event(data: dict, operation: str = "create") -> None:
-    if operation not in ROUTING_KEYS["event"]:
-        raise ValueError("Invalid operation for event")
+SESSION_FIELDS = (
+    ("event_id",      lambda d: d["event_id"]),
+    ("title",         lambda d: d["title"]),
+    ("description",   lambda d: d.get("description", "")),
+    ("date",          lambda d: str(d["date"])),
+    ("start_time",    lambda d: str(d["start_time"])),
+    ("end_time",      lambda d: str(d["end_time"])),
+    ("location",      lambda d: d.get("location", "")),
+    ("max_attendees", lambda d: str(d.get("max_attendees", 0))),
+    ("gcid",          lambda d: d.get("gcal_id", "")),
+    ("speaker", (
+        ("name", lambda d: f"{d.get('speaker_first_name','')} {d.get('speaker_name','')}".strip()),
+        ("bio",  lambda d: d.get("speaker_bio", ""))
+    ))
+)
+
+def _escape(text) -> str:
+    # zelfde regels (en dezelfde fout bij geen tekst) als ElementTree
+    if not isinstance(text, str):
+        raise TypeError(f"cannot serialize {text!r} (type {type(text).__name__})")
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+def _compile(fields):
+    """(tag, getter) of (tag, geneste velden) -> (open, close, leeg, getter/velden)."""
+    return tuple(
+        (f"<{tag}>", f"</{tag}>", None, _compile(getter)) if isinstance(getter, tuple)
+        else (f"<{tag}>", f"</{tag}>", f"<{tag} />", getter)
+        for tag, getter in fields
+    )
+
+def _write(out: list, data: dict, compiled) -> None:
+    for open_tag, close_tag, empty, getter in compiled:
+        if empty is None:
+            out.append(open_tag)
+            _write(out, data, getter)
+            out.append(close_tag)
+            continue
+        text = getter(data)
+        # lege tekst wordt <tag />, net als bij ElementTree
+        out.append(open_tag + _escape(text) + close_tag if text else empty)
+
+def _element(tag: str, text) -> str:
+    return f"<{tag}>{_escape(text)}</{tag}>" if text else f"<{tag} />"
+
+def _compile_message(kind: str, schema: str, fields):
+    head = ('<attendify xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+            f'xsi:noNamespaceSchemaLocation="{schema}"><info><sender>planning</sender>')
+    body_open, body_close = f"</info><{kind}>", f"</{kind}></attendify>"
+    id_field = ID_FIELDS[kind]
+    compiled = _compile(fields)
+
+    def serialize(data: dict, operation: str) -> bytes:
+        out = [head, _element("operation", operation), body_open, _element("uid", data[id_field])]
+        if operation != "delete":
+            _write(out, data, compiled)
+        out.append(body_close)
+        return "".join(out).encode("utf-8", "xmlcharrefreplace")
+
+    return serialize
+
+_event_to_xml = _compile_message("event", "event.xsd", EVENT_FIELDS)
+_session_to_xml = _compile_message("session", "session.xsd", SESSION_FIELDS)
+
+# --- validatie ---------------------------------------------------------------
+def _validate(kind: str, data: dict, operation: str) -> None:
+    if operation not in ROUTING_KEYS[kind]:
+        raise ValueError(f"Invalid operation for {kind}")
 
     # Alleen bij create/update de andere velden verplicht maken
     if operation in ["create", "update"]:
-        required_fields = ["event_id", "title", "start_date", "end_date", "start_time", "end_time"]
+        required_fields = REQUIRED_FIELDS[kind]
     else:  # delete
-        required_fields = ["event_id"]
+        required_fields = [ID_FIELDS[kind]]
 
     for field in required_fields:
         if field not in data:
-            raise KeyError(f"⛔ Required field '{field}' is missing in event data for RabbitMQ publish.")
+            raise KeyError(f"⛔ Required field '{field}' is missing in {kind} data for RabbitMQ publish.")
+
+_TO_XML = {"event": _event_to_xml, "session": _session_to_xml}
+
+# --- openbare API ------------------------------------------------------------
+def publish_event(data: dict, operation: str = "create") -> None:
+    _validate("event", data, operation)
 
     try:
         xml_bytes = _event_to_xml(data, operation)
@@ -161,17 +344,7 @@ def publish_event(data: dict, operation: str = "create") -> None:
         raise RuntimeError(f"❌ Failed to publish event to RabbitMQ: {e}")
 
 def publish_session(data: dict, operation: str = "create") -> None:
-    if operation not in ROUTING_KEYS["session"]:
-        raise ValueError("Invalid operation for session")
-
-    if operation in ["create", "update"]:
-        required_fields = ["session_id", "event_id", "title", "date", "start_time", "end_time"]
-    else:  # delete
-        required_fields = ["session_id"]
-
-    for field in required_fields:
-        if field not in data:
-            raise KeyError(f"⛔ Required field '{field}' is missing in session data for RabbitMQ publish.")
+    _validate("session", data, operation)
 
     try:
         xml_bytes = _session_to_xml(data, operation)
@@ -181,17 +354,58 @@ def publish_session(data: dict, operation: str = "create") -> None:
         log_error(f"❌ Failed to publish session: {e}")
         raise RuntimeError(f"❌ Failed to publish session to RabbitMQ: {e}")
 
-def _publish(xml_payload: bytes, routing_key: str):
+def _prepare_batch(kind: str, items: list):
+    """
+    Valideert en serialiseert (data, operation) items. Geeft (errors,
+    messages, positions): ongeldige items staan al als fout in `errors`, de
+    berichten horen bij de items op `positions`.
+    """
+    errors, messages, positions = [None] * len(items), [], []
+    for i, (data, operation) in enumerate(items):
+        try:
+            _validate(kind, data, operation)
+            routing_key = ROUTING_KEYS[kind][operation]
+            messages.append((_exchange_for(routing_key), routing_key, _TO_XML[kind](data, operation)))
+            positions.append(i)
+        except Exception as e:
+            errors[i] = e
+    return errors, messages, positions
+
+def _report_batch(kind: str, items: list, errors: list) -> list:
+    if items:
+        confirmed = sum(error is None for error in errors)
+        log_info(f"📨  {confirmed}/{len(items)} {kind}(s) bevestigd door exchange '{kind}'")
+    for i, error in enumerate(errors):
+        if error is not None:
+            log_error(f"❌ Failed to publish {kind} {items[i][0].get(ID_FIELDS[kind])}: {error!r}")
+    return errors
+
+def _publish_batch(kind: str, items: list) -> list:
+    """
+    items: lijst van (data, operation). Ongeldige items falen apart; de rest
+    gaat in één keer naar de broker met gepipelinede confirms. Geeft per item
+    None (bevestigd) of de fout terug, in dezelfde volgorde.
+    """
+    errors, messages, positions = _prepare_batch(kind, items)
+    for i, error in zip(positions, _publisher.publish_batch(messages)):
+        errors[i] = error
+    return _report_batch(kind, items, errors)
+
+def publish_events_batch(items: list) -> list:
+    """[(data, operation)] -> [None | fout] per event; zie _publish_batch."""
+    return _publish_batch("event", items)
+
+def publish_sessions_batch(items: list) -> list:
+    """[(data, operation)] -> [None | fout] per sessie; zie _publish_batch."""
+    return _publish_batch("session", items)
+
+def _exchange_for(routing_key: str) -> str:
     # Bepaal exchange op basis van routing key
-    exchange = "session" if routing_key.startswith("session.") else "event"
-
-    conn, ch = _get_channel()
-    ch.basic_publish(
-        exchange=exchange,
-        routing_key=routing_key,
-        body=xml_payload,
-        properties=pika.BasicProperties(content_type="application/xml")
-    )
+    return "session" if routing_key.startswith("session.") else "event"
+
+def _publish(xml_payload: bytes, routing_key: str):
+    exchange = _exchange_for(routing_key)
+
+    _publisher.publish(exchange, routing_key, xml_payload)
     msg = f"📨  Verzonden naar exchange '{exchange}' met key '{routing_key}'"
     log_info(msg)
-    conn.close()
@@ -2,66 +2,37 @@ import os
 import sys
 import time
 import mysql.connector
+from mysql.connector import pooling
 import json
 import hashlib
-import pika
-import xml.etree.ElementTree as ET
-from datetime import datetime
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-
-# === RabbitMQ config (producer logging) ===
-RABBITMQ_HOST      = 'rabbitmq' 
-RABBITMQ_PORT      = int(os.getenv("RABBITMQ_AMQP_PORT", 5672))
-RABBITMQ_USERNAME  = os.getenv("RABBITMQ_USER")
-RABBITMQ_PASSWORD  = os.getenv("RABBITMQ_PASSWORD")
-RABBITMQ_VHOST     = os.getenv("RABBITMQ_USER")
-
-def _get_channel():
-    creds = pika.PlainCredentials(RABBITMQ_USERNAME, RABBITMQ_PASSWORD)
-    params = pika.ConnectionParameters(
-        host=RABBITMQ_HOST,
-        port=RABBITMQ_PORT,
-        virtual_host=RABBITMQ_VHOST,
-        credentials=creds
-    )
-    conn = pika.BlockingConnection(params)
-    ch   = conn.channel()
-    return conn, ch
+import math
+import random
+import socket
+import argparse
+import queue
+import threading
+from collections import defaultdict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
+from googleapiclient.errors import HttpError
+
+# --- Monitoring logs (gedeelde achtergrond-shipper) ---
+sys.path.append('/usr/local/bin')
+try:
+    from monitoring import send_monitoring_log as ship_monitoring_log
+except ModuleNotFoundError:
+    from planning.monitoring import send_monitoring_log as ship_monitoring_log
+
+# event en session binden monitoring.log op dezelfde queue (configure.py):
+# "both" hoeft de log dus maar één keer te verzenden
+LOG_EXCHANGES = {"event": "event", "session": "session", "both": "event"}
 
 def send_monitoring_log(message: str, level: str = "info", sender: str = "sync-service", target="event"):
     """
     target: "event", "session" of "both"
     """
-    # Skip logging during unit tests
-    if os.getenv("UNITTEST_RUNNING") == "1" or "pytest" in sys.modules or "unittest" in sys.modules:
-        return
-
-    log = ET.Element("log")
-    ET.SubElement(log, "sender").text = sender
-    ET.SubElement(log, "timestamp").text = datetime.utcnow().isoformat() + "Z"
-    ET.SubElement(log, "level").text = level
-    ET.SubElement(log, "message").text = message
-    xml_bytes = ET.tostring(log, encoding="utf-8")
-
-    targets = []
-    if target == "both":
-        targets = ["event", "session"]
-    else:
-        targets = [target]
-
-    for exch in targets:
-        try:
-            conn, ch = _get_channel()
-            ch.basic_publish(
-                exchange=exch,
-                routing_key="monitoring.log",
-                body=xml_bytes,
-                properties=pika.BasicProperties(content_type="application/xml")
-            )
-            conn.close()
-        except Exception as e:
-            print(f"🔴 Failed to send monitoring log to {exch}: {e}")
+    ship_monitoring_log(message, level=level, sender=sender, exchange=LOG_EXCHANGES.get(target, target))
 
 def log_info(message: str, target="event"):
     print(message)
@@ -71,6 +42,11 @@ def log_error(message: str, target="event"):
     print(message)
     send_monitoring_log(message, level="error", target=target)
 
+def log_debug(message: str, target="event"):
+    # MONITORING_LOG_LEVEL / MONITORING_DEBUG_SAMPLE bepalen of hij verzonden wordt
+    print(message)
+    send_monitoring_log(message, level="debug", target=target)
+
 # === GOOGLE & DB CONFIG ===
 
 DB_CONFIG = {
@@ -80,22 +56,197 @@ DB_CONFIG = {
     'database': os.getenv('LOCAL_DB_NAME', 'planning')
 }
 
+DB_POOL_SIZE          = int(os.getenv('SYNC_DB_POOL_SIZE', 2))
+DB_RECONNECT_ATTEMPTS = int(os.getenv('SYNC_DB_RECONNECT_ATTEMPTS', 3))
+
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 SERVICE_ACCOUNT_FILE = 'app/service_account.json'
 GCAL_EVENT_CALENDAR_ID = os.getenv('GOOGLE_CALENDAR_ID')
+# Calendar API raadt max. 50 calls per batch request aan
+GCAL_BATCH_SIZE = int(os.getenv('GCAL_BATCH_SIZE', 50))
+# Aantal threads dat GCal batches parallel verstuurt (1 = sequentieel). Het
+# quotum (GCAL_RATE_*, GCAL_QUOTA_*) beheert de gedeelde gcal.quota module.
+SYNC_WORKERS          = int(os.getenv('SYNC_WORKERS', 1))
+
+# === INCREMENTAL SYNC CONFIG ===
+# In incrementele modus leest elke cyclus enkel rijen waarvan updated_at na de
+# laatst opgeslagen watermark ligt en verwijderde rijen uit de delete-entries in
+# sync_outbox; om de FULL_SYNC_INTERVAL seconden volgt een volledige pass als
+# vangnet (o.a. voor rijen die buiten de watermark vielen).
+SYNC_INCREMENTAL          = os.getenv("SYNC_INCREMENTAL", "1") == "1"
+FULL_SYNC_INTERVAL        = int(os.getenv("SYNC_FULL_INTERVAL_SECONDS", 300))
+WATERMARK_OVERLAP_SECONDS = int(os.getenv("SYNC_WATERMARK_OVERLAP_SECONDS", 2))
+
+# === SCHEDULER CONFIG ===
+# Basisinterval tussen cycli; halveert (tot MIN) zolang er wijzigingen zijn en
+# verdubbelt (tot MAX) bij stilte of quota-fouten van Google.
+SYNC_INTERVAL     = float(os.getenv("SYNC_INTERVAL_SECONDS", 5))
+SYNC_MIN_INTERVAL = float(os.getenv("SYNC_MIN_INTERVAL_SECONDS", 1))
+SYNC_MAX_INTERVAL = float(os.getenv("SYNC_MAX_INTERVAL_SECONDS", 60))
+
+# === OUTBOX CONFIG ===
+# Triggers op events/sessions schrijven elke wijziging naar sync_outbox; de
+# hoofdloop wacht daarop i.p.v. blind te slapen. Zonder wijzigingen draait er
+# toch een cyclus wanneer de scheduler dat plant (retries, volledige pass).
+SYNC_OUTBOX     = os.getenv("SYNC_OUTBOX", "1") == "1"
+OUTBOX_POLL_MIN = float(os.getenv("SYNC_OUTBOX_POLL_MIN_SECONDS", 0.1))
+OUTBOX_POLL_MAX = float(os.getenv("SYNC_OUTBOX_POLL_MAX_SECONDS", 1.0))
+
+# Snapshot/synced writes worden gebufferd en in één transactie per cyclus
+# weggeschreven; bij zeer grote cycli wordt tussentijds geflusht.
+SYNC_WRITE_FLUSH_ROWS = int(os.getenv("SYNC_WRITE_FLUSH_ROWS", 500))
+
+# Met SYNC_DB_HASH=1 vergelijkt MySQL de gegenereerde row_hash kolom met die in
+# de snapshot, zodat ongewijzigde rijen de database niet verlaten.
+SYNC_DB_HASH = os.getenv("SYNC_DB_HASH", "0") == "1"
+
+# === PIPELINE CONFIG ===
+# Bij werk over meerdere GCal batches lopen de stages gelijktijdig: GCal calls
+# (worker pool) -> publiceren naar RabbitMQ -> snapshot writes (eigen DB-
+# connectie), verbonden met begrensde queues van SYNC_PIPELINE_DEPTH batches.
+# 0 = alles sequentieel in de hoofdthread.
+SYNC_PIPELINE_DEPTH = int(os.getenv("SYNC_PIPELINE_DEPTH", 4))
+
+# === HORIZON CONFIG ===
+# Het hete pad bekijkt enkel rijen die binnen SYNC_HORIZON_DAYS dagen voorbij
+# zijn of nog moeten komen (events.end_date / sessions.date). Oudere rijen
+# komen om de SYNC_SWEEP_INTERVAL seconden aan bod in een volledige sweep.
+# SYNC_HORIZON_DAYS < 0 schakelt het venster uit.
+SYNC_HORIZON_DAYS    = int(os.getenv("SYNC_HORIZON_DAYS", 30))
+SYNC_SWEEP_INTERVAL  = int(os.getenv("SYNC_SWEEP_INTERVAL_SECONDS", 6 * 3600))
+
+# === DEBOUNCE CONFIG ===
+# Een rij die minder dan SYNC_QUIET_SECONDS geleden gewijzigd werd, wacht tot
+# de bewerkingen stilvallen; zo gaat enkel de eindtoestand naar GCal/RabbitMQ.
+# Na SYNC_MAX_DELAY_SECONDS wordt ze hoe dan ook verstuurd. 0 = uit.
+SYNC_QUIET_SECONDS = float(os.getenv("SYNC_QUIET_SECONDS", 3))
+SYNC_MAX_DELAY     = float(os.getenv("SYNC_MAX_DELAY_SECONDS", 30))
+
+# === STREAMING CONFIG ===
+# Met SYNC_STREAM=1 leest een volledige pass de tabellen in pagina's op primary
+# key (keyset) en verwerkt de diff als stroom, zodat het geheugengebruik niet
+# met de tabelgrootte groeit.
+SYNC_STREAM      = os.getenv("SYNC_STREAM", "0") == "1"
+SYNC_STREAM_PAGE = int(os.getenv("SYNC_STREAM_PAGE_SIZE", 1000))
+
+# === SHARDING CONFIG ===
+# Met SYNC_SHARDS > 1 verdelen meerdere synchronizers de rijen op basis van
+# CRC32(event_id) MOD SYNC_SHARDS (sessies volgen hun event). Elke shard wordt
+# geclaimd met een MySQL GET_LOCK; sterft een worker, dan vallen zijn locks
+# vrij en nemen de anderen over. Eén leader doet de globale taken (pull,
+# deletes, outbox opruimen).
+SYNC_SHARDS           = int(os.getenv("SYNC_SHARDS", 1))
+SYNC_WORKER_ID        = os.getenv("SYNC_WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+SYNC_HEARTBEAT        = float(os.getenv("SYNC_HEARTBEAT_SECONDS", 5))
+SYNC_WORKER_TIMEOUT   = int(os.getenv("SYNC_WORKER_TIMEOUT_SECONDS", 15))
+
+# === PULL CONFIG ===
+# Elke cyclus haalt de synchronizer met een syncToken enkel de events op die
+# in Google Calendar gewijzigd zijn sinds de vorige pull (token in sync_state).
+SYNC_PULL           = os.getenv("SYNC_PULL", "1") == "1"
+GCAL_PULL_PAGE_SIZE = int(os.getenv("GCAL_PULL_PAGE_SIZE", 250))
+SYNC_TOKEN_STATE    = "gcal:sync_token"
+
+# === RETRY CONFIG ===
+# Rijen die niet naar GCal geraakten komen in sync_failures en worden pas na
+# een exponentieel groeiende wachttijd (met jitter) opnieuw geprobeerd.
+SYNC_RETRY_BASE = float(os.getenv("SYNC_RETRY_BASE_SECONDS", 30))
+SYNC_RETRY_MAX  = float(os.getenv("SYNC_RETRY_MAX_SECONDS", 3600))
+
+# Kolommen die niet in de content hash meetellen
+HASH_IGNORED_FIELDS = ('gcal_id', 'synced', 'synced_at', 'updated_at', 'row_hash')
+# Prefix van de huidige content hash (BLAKE2); snapshots zonder prefix hebben
+# nog de oude SHA-256 over JSON en worden bij de eerstvolgende pass gemigreerd.
+FINGERPRINT_PREFIX = "b2:"
+
+SYNC_TABLES = {
+    "events": {
+        "snapshot_table": "event_snapshots",
+        "id_field":       "event_id",
+        "target":         "event",
+        "label":          "Event",
+        "shard_field":    "event_id",
+        "horizon_field":  "end_date"
+    },
+    "sessions": {
+        "snapshot_table": "session_snapshots",
+        "id_field":       "session_id",
+        "target":         "session",
+        "label":          "Sessie",
+        "shard_field":    "event_id",
+        "horizon_field":  "date",
+        # een sessie gaat pas naar GCal als haar event er al staat
+        "parent":         ("event_snapshots", "event_id")
+    }
+}
+
+# Rijen die in deze cyclus werden tegengehouden (bv. sessies zonder event of
+# nog niet uitgedebounced);
+# worden de volgende cyclus opnieuw gelezen, ook al ligt hun updated_at voor
+# de nieuwe watermark. Mislukte syncs gaan naar sync_failures.
+_carry_over = {table: set() for table in SYNC_TABLES}
+# Sinds wanneer (monotonic) de debounce een rij vasthoudt
+_held_since = {table: {} for table in SYNC_TABLES}
 
 # --- Producer imports (RabbitMQ event/session messages) ---
-sys.path.append('/usr/local/bin')
 try:
-    from producer.producer import publish_event, publish_session
+    from producer.producer import publish_event, publish_session, publish_events_batch, publish_sessions_batch
 except ModuleNotFoundError:
-    from planning.producer.producer import publish_event, publish_session
+    from planning.producer.producer import (publish_event, publish_session,
+                                            publish_events_batch, publish_sessions_batch)
+
+# Batch-variant (gepipelinede confirms) van elke publish functie
+BATCH_PUBLISHERS = {publish_event: publish_events_batch, publish_session: publish_sessions_batch}
+try:
+    from gcal import get_service, get_quota, is_quota_error
+except ModuleNotFoundError:
+    from planning.gcal import get_service, get_quota, is_quota_error
 
 # --- HELPERS ---
 def get_gcal_service():
-    credentials = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-    return build('calendar', 'v3', credentials=credentials)
+    # gecachete credentials + meegeleverd discovery document, één service per thread
+    return get_service(SERVICE_ACCOUNT_FILE, SCOPES)
+
+# Eén pool voor het hele proces; de hoofdloop houdt er één connectie uit vast
+# en controleert die elke cyclus met een ping i.p.v. telkens opnieuw te verbinden.
+_db_pool = None
+_db_conn = None
+
+def get_db_connection():
+    global _db_pool, _db_conn
+    if _db_pool is None:
+        _db_pool = pooling.MySQLConnectionPool(
+            pool_name="synchronizer", pool_size=DB_POOL_SIZE, **DB_CONFIG)
+
+    if _db_conn is not None:
+        try:
+            _db_conn.ping(reconnect=True, attempts=DB_RECONNECT_ATTEMPTS, delay=1)
+            return _db_conn
+        except Exception as e:
+            log_error(f"⚠️  DB connectie verloren, nieuwe connectie uit pool: {e}", target="both")
+            _close_quietly(_db_conn)
+            _db_conn = None
+
+    _db_conn = _db_pool.get_connection()
+    log_info("✅ Verbonden met DB", target="both")
+    return _db_conn
+
+def get_pipeline_connection():
+    """Tweede connectie uit de pool voor de snapshot-stage van de pijplijn."""
+    get_db_connection()
+    return _db_pool.get_connection()
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+def _rollback_quietly(conn):
+    try:
+        conn.rollback()
+    except Exception:
+        pass
 
 def normalize_value(value):
     if value is None:
@@ -105,28 +256,363 @@ def normalize_value(value):
     return str(value)
 
 def hash_row(row):
+    """Legacy content hash (SHA-256 over JSON); enkel nog om oude snapshots te vergelijken."""
     relevant = {
         k: normalize_value(v)
         for k, v in row.items()
-        if k not in ('gcal_id', 'synced', 'synced_at')
+        if k not in HASH_IGNORED_FIELDS
     }
     json_string = json.dumps(relevant, sort_keys=True, ensure_ascii=False)
     return hashlib.sha256(json_string.encode('utf-8')).hexdigest()
 
-def fetch_all(conn, table):
-    cur = conn.cursor(dictionary=True)
-    cur.execute(f"SELECT * FROM {table}")
-    rows = cur.fetchall()
+# --- ROW RECORDS ---
+def _length_prefixed(data):
+    return len(data).to_bytes(4, "big") + data
+
+def _value_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, datetime):
+        return value.isoformat().encode("utf-8")
+    return str(value).encode("utf-8")
+
+class RowLayout:
+    """Kolomvolgorde van een resultset, gedeeld door alle rijen ervan."""
+    __slots__ = ("columns", "index", "hashed")
+
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self.index = {name: i for i, name in enumerate(self.columns)}
+        # (gecodeerde kolomnaam, positie) van de kolommen in de fingerprint, gesorteerd op naam
+        self.hashed = tuple(
+            (_length_prefixed(name.encode("utf-8")), self.index[name])
+            for name in sorted(self.columns) if name not in HASH_IGNORED_FIELDS
+        )
+
+class SyncRow(Mapping):
+    """Compacte, read-only rij: een tuple waarden plus de gedeelde RowLayout."""
+    __slots__ = ("layout", "values")
+
+    def __init__(self, layout, values):
+        self.layout = layout
+        self.values = tuple(values)
+
+    def __getitem__(self, key):
+        return self.values[self.layout.index[key]]
+
+    def __iter__(self):
+        return iter(self.layout.columns)
+
+    def __len__(self):
+        return len(self.layout.columns)
+
+    def __repr__(self):
+        return f"SyncRow({dict(self)!r})"
+
+def fetch_records(cur, extra=0):
+    """
+    Leest een (niet-dictionary) cursor als SyncRows. De laatste `extra`
+    kolommen (bv. gejoinde snapshot-kolommen) komen apart terug.
+    Geeft een lijst van (SyncRow, extra_waarden) terug.
+    """
+    columns = tuple(cur.column_names)
+    layout = RowLayout(columns[:len(columns) - extra])
+    split = len(layout.columns)
+    return [(SyncRow(layout, values[:split]), tuple(values[split:])) for values in cur.fetchall()]
+
+def fingerprint(row):
+    """
+    Content hash van een rij: BLAKE2b over de relevante kolommen (op naam
+    gesorteerd), elk als lengte-geprefixte naam en waarde. Geen tussentijdse
+    dict of JSON; voor SyncRows ligt de kolomvolgorde al vast in de layout.
+    """
+    if isinstance(row, SyncRow):
+        values = row.values
+        fields = row.layout.hashed
+    else:
+        values = row
+        fields = [(_length_prefixed(name.encode("utf-8")), name)
+                  for name in sorted(row) if name not in HASH_IGNORED_FIELDS]
+    parts = []
+    for name, key in fields:
+        value = values[key]
+        if value is None:
+            parts.append(name + b"\x00")
+        else:
+            data = value.encode("utf-8") if type(value) is str else _value_bytes(value)
+            parts.append(name + b"\x01" + len(data).to_bytes(4, "big") + data)
+    return FINGERPRINT_PREFIX + hashlib.blake2b(b"".join(parts), digest_size=16).hexdigest()
+
+def compare_content(row, snapshot_hash):
+    """
+    (fingerprint, ongewijzigd). Een snapshot met een legacy hash wordt met
+    hash_row vergeleken, zodat de overgang geen massale re-sync veroorzaakt;
+    de caller schrijft dan de nieuwe fingerprint weg.
+    """
+    current = fingerprint(row)
+    if snapshot_hash is None:
+        return current, False
+    if snapshot_hash.startswith(FINGERPRINT_PREFIX):
+        return current, snapshot_hash == current
+    return current, hash_row(row) == snapshot_hash
+
+def _scope(table, alias="", shard=None, horizon=None):
+    """
+    Extra WHERE-voorwaarden (en parameters) voor de eigen shards en het
+    sync-venster: rijen die langer dan `horizon` dagen voorbij zijn vallen weg.
+    """
+    spec = SYNC_TABLES[table]
+    conditions, params = [], []
+    if shard is not None:
+        clause, shard_params = shard.clause(f"{alias}{spec['shard_field']}")
+        conditions.append(clause)
+        params.extend(shard_params)
+    if horizon is not None:
+        column = f"{alias}{spec['horizon_field']}"
+        conditions.append(f"({column} >= CURDATE() - INTERVAL %s DAY OR {column} IS NULL)")
+        params.append(horizon)
+    return conditions, params
+
+def fetch_all(conn, table, shard=None, horizon=None):
+    sql = f"SELECT * FROM {table}"
+    conditions, params = _scope(table, shard=shard, horizon=horizon)
+    if conditions:
+        sql += f" WHERE {' AND '.join(conditions)}"
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    rows = [row for row, _ in fetch_records(cur)]
     cur.close()
     return rows
 
-def fetch_snapshot_map(conn, snapshot_table, id_field):
-    cur = conn.cursor(dictionary=True)
-    cur.execute(f"SELECT {id_field}, content_hash FROM {snapshot_table}")
-    result = {row[id_field]: row["content_hash"] for row in cur.fetchall()}
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+def fetch_changed(conn, table, id_field, since, extra_ids=(), shard=None, horizon=None):
+    """Rijen gewijzigd sinds de watermark, plus expliciet opgegeven ids."""
+    sql = f"SELECT * FROM {table} WHERE (updated_at >= %s - INTERVAL %s SECOND"
+    params = [since, WATERMARK_OVERLAP_SECONDS]
+    extra_ids = list(extra_ids)
+    if extra_ids:
+        sql += f" OR {id_field} IN ({_placeholders(extra_ids)})"
+        params.extend(extra_ids)
+    sql += ")"
+    conditions, scope_params = _scope(table, shard=shard, horizon=horizon)
+    for clause in conditions:
+        sql += f" AND {clause}"
+    params.extend(scope_params)
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    rows = [row for row, _ in fetch_records(cur)]
+    cur.close()
+    return rows
+
+def fetch_snapshot_map(conn, snapshot_table, id_field, ids=None):
+    """
+    Compacte snapshot-index {id: (content_hash, gcal_id, row_hash)}; met `ids`
+    enkel voor die rijen.
+    """
+    if ids is not None and not ids:
+        return {}
+    cur = conn.cursor()
+    if ids is None:
+        cur.execute(f"SELECT {id_field}, content_hash, gcal_id, row_hash FROM {snapshot_table}")
+    else:
+        ids = list(ids)
+        cur.execute(f"SELECT {id_field}, content_hash, gcal_id, row_hash FROM {snapshot_table} "
+                    f"WHERE {id_field} IN ({_placeholders(ids)})", ids)
+    result = {row[0]: tuple(row[1:]) for row in cur.fetchall()}
     cur.close()
     return result
 
+def fetch_hash_diff(conn, table, snapshot_table, id_field, since=None, extra_ids=(), shard=None, horizon=None):
+    """
+    Laat MySQL de row_hash van de live rij vergelijken met die in de snapshot:
+    enkel rijen zonder snapshot of met een afwijkende hash komen terug, samen
+    met hun snapshot-index. Met `since` bovendien beperkt tot de watermark.
+    """
+    sql = f"""
+        SELECT t.*, s.{id_field} AS snapshot_id, s.content_hash AS snapshot_content_hash,
+               s.gcal_id AS snapshot_gcal_id, s.row_hash AS snapshot_row_hash
+        FROM {table} t
+        LEFT JOIN {snapshot_table} s ON s.{id_field} = t.{id_field}
+        WHERE (s.{id_field} IS NULL OR s.row_hash IS NULL OR s.row_hash <> t.row_hash)
+    """
+    params = []
+    if since is not None:
+        sql += " AND (t.updated_at >= %s - INTERVAL %s SECOND"
+        params = [since, WATERMARK_OVERLAP_SECONDS]
+        extra_ids = list(extra_ids)
+        if extra_ids:
+            sql += f" OR t.{id_field} IN ({_placeholders(extra_ids)})"
+            params.extend(extra_ids)
+        sql += ")"
+    conditions, scope_params = _scope(table, "t.", shard, horizon)
+    for clause in conditions:
+        sql += f" AND {clause}"
+    params.extend(scope_params)
+
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    rows, snapshot_map = [], {}
+    for row, joined in fetch_records(cur, extra=4):
+        snapshot = _split_snapshot(joined)
+        if snapshot is not None:
+            snapshot_map[row[id_field]] = snapshot
+        rows.append(row)
+    cur.close()
+    return rows, snapshot_map
+
+def _split_snapshot(joined):
+    """(snapshot_id, content_hash, gcal_id, row_hash) -> snapshot-tuple, of None zonder snapshot."""
+    snapshot_id, content_hash, gcal_id, row_hash = joined
+    return (content_hash, gcal_id, row_hash) if snapshot_id is not None else None
+
+def stream_rows(conn, table, snapshot_table, id_field, shard=None, changed_only=False, page_size=None, horizon=None):
+    """
+    Generator van (row, snapshot) voor alle live rijen, in pagina's van
+    `page_size` op primary key (keyset: WHERE id > laatste id). De vergelijking
+    en volgorde gebeuren in MySQL, dus met de collatie van de kolom zelf.
+    changed_only -> enkel rijen waarvan de row_hash afwijkt van de snapshot.
+    """
+    page_size = page_size or SYNC_STREAM_PAGE
+    last_id = None
+    while True:
+        conditions, params = [], []
+        if last_id is not None:
+            conditions.append(f"t.{id_field} > %s")
+            params.append(last_id)
+        if changed_only:
+            conditions.append(f"(s.{id_field} IS NULL OR s.row_hash IS NULL OR s.row_hash <> t.row_hash)")
+        scope, scope_params = _scope(table, "t.", shard, horizon)
+        conditions.extend(scope)
+        params.extend(scope_params)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT t.*, s.{id_field} AS snapshot_id, s.content_hash AS snapshot_content_hash,
+                   s.gcal_id AS snapshot_gcal_id, s.row_hash AS snapshot_row_hash
+            FROM {table} t
+            LEFT JOIN {snapshot_table} s ON s.{id_field} = t.{id_field}
+            {where}
+            ORDER BY t.{id_field} LIMIT %s
+        """, params + [page_size])
+        page = fetch_records(cur, extra=4)
+        cur.close()
+        for row, joined in page:
+            yield row, _split_snapshot(joined)
+        if len(page) < page_size:
+            return
+        last_id = page[-1][0][id_field]
+
+def stream_deleted(conn, table, snapshot_table, id_field, page_size=None):
+    """Generator van (id, gcal_id) zoals fetch_deleted, in pagina's op primary key."""
+    page_size = page_size or SYNC_STREAM_PAGE
+    last_id = None
+    while True:
+        sql, params = f"""
+            SELECT s.{id_field}, s.gcal_id FROM {snapshot_table} s
+            LEFT JOIN {table} t ON t.{id_field} = s.{id_field}
+            WHERE t.{id_field} IS NULL""", []
+        if last_id is not None:
+            sql += f" AND s.{id_field} > %s"
+            params.append(last_id)
+        cur = conn.cursor()
+        cur.execute(sql + f" ORDER BY s.{id_field} LIMIT %s", params + [page_size])
+        page = cur.fetchall()
+        cur.close()
+        for row_id, gcal_id in page:
+            yield row_id, gcal_id
+        if len(page) < page_size:
+            return
+        last_id = page[-1][0]
+
+def stream_diff(conn, table, shard=None, deletes=True, page_size=None, horizon=None):
+    """
+    Streamt de diff tussen een live tabel en haar snapshot als operaties:
+      ("create", row, content_hash, None)
+      ("update", row, content_hash, gcal_id)
+      ("backfill", row, content_hash, gcal_id)  -> enkel fingerprint/row_hash in snapshot bijwerken
+      ("delete", row_id, None, gcal_id)
+    Het geheugengebruik is begrensd door de paginagrootte.
+    """
+    spec = SYNC_TABLES[table]
+    snapshot_table, id_field = spec["snapshot_table"], spec["id_field"]
+    for row, snapshot in stream_rows(conn, table, snapshot_table, id_field, shard, SYNC_DB_HASH, page_size, horizon):
+        old_hash, old_gcal_id, old_row_hash = snapshot or (None, None, None)
+        current_hash, unchanged = compare_content(row, old_hash)
+        if old_hash is None:
+            yield "create", row, current_hash, None
+        elif not unchanged:
+            yield "update", row, current_hash, old_gcal_id
+        elif old_hash != current_hash or (row.get("row_hash") and row["row_hash"] != old_row_hash):
+            yield "backfill", row, current_hash, old_gcal_id
+    if deletes:
+        for row_id, gcal_id in stream_deleted(conn, table, snapshot_table, id_field, page_size):
+            yield "delete", row_id, None, gcal_id
+
+def fetch_deleted(conn, table, snapshot_table, id_field):
+    """(id, gcal_id) van rijen die nog in de snapshot staan maar niet meer live."""
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT s.{id_field}, s.gcal_id FROM {snapshot_table} s
+        LEFT JOIN {table} t ON t.{id_field} = s.{id_field}
+        WHERE t.{id_field} IS NULL
+    """)
+    result = [(row_id, gcal_id) for row_id, gcal_id in cur.fetchall()]
+    cur.close()
+    return result
+
+def fetch_outbox_deleted(conn, table, snapshot_table, id_field, extra_ids=()):
+    """
+    Zoals fetch_deleted, maar enkel voor de ids die de delete-trigger in
+    sync_outbox zette (plus `extra_ids`, bv. deletes die op een retry wachten).
+    Kost in verhouding tot de wijzigingen i.p.v. tot de tabel; de volledige
+    anti-join blijft voor de periodieke volledige pass.
+    """
+    sql = f"""
+        SELECT s.{id_field}, s.gcal_id FROM {snapshot_table} s
+        LEFT JOIN {table} t ON t.{id_field} = s.{id_field}
+        WHERE t.{id_field} IS NULL AND (s.{id_field} IN (
+            SELECT row_id FROM sync_outbox WHERE table_name = %s AND operation = 'delete')"""
+    params = [table]
+    if extra_ids:
+        extra_ids = list(extra_ids)
+        sql += f" OR s.{id_field} IN ({_placeholders(extra_ids)})"
+        params += extra_ids
+    cur = conn.cursor()
+    cur.execute(sql + ")", params)
+    result = [(row_id, gcal_id) for row_id, gcal_id in cur.fetchall()]
+    cur.close()
+    return result
+
+def fetch_deleted_since(conn, table, snapshot_table, id_field, since, extra_ids=()):
+    """Incrementeel via de outbox (als die aan staat), anders de volledige anti-join."""
+    if since is not None and SYNC_OUTBOX:
+        return fetch_outbox_deleted(conn, table, snapshot_table, id_field, extra_ids)
+    return fetch_deleted(conn, table, snapshot_table, id_field)
+
+def db_now(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT NOW()")
+    now = cur.fetchone()[0]
+    cur.close()
+    return now
+
+def get_sync_state(conn, name):
+    cur = conn.cursor()
+    cur.execute("SELECT value FROM sync_state WHERE name = %s", (name,))
+    row = cur.fetchone()
+    cur.close()
+    return row[0] if row else None
+
+def set_sync_state(conn, name, value):
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO sync_state (name, value) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE value = VALUES(value)
+    """, (name, value))
+    cur.close()
+
 def update_snapshot(conn, snapshot_table, id_field, row_id, content_hash, gcal_id):
     cur = conn.cursor()
     cur.execute(f"""
@@ -134,26 +620,588 @@ def update_snapshot(conn, snapshot_table, id_field, row_id, content_hash, gcal_i
         VALUES (%s, %s, NOW(), %s)
         ON DUPLICATE KEY UPDATE content_hash = VALUES(content_hash), last_seen = NOW(), gcal_id = VALUES(gcal_id)
     """, (row_id, content_hash, gcal_id))
-    conn.commit()
     cur.close()
 
+def bulk_update_snapshots(conn, snapshot_table, id_field, rows):
+    """rows: lijst van (row_id, content_hash, gcal_id, row_hash); één multi-row upsert."""
+    if not rows:
+        return
+    cur = conn.cursor()
+    cur.executemany(f"""
+        INSERT INTO {snapshot_table} ({id_field}, content_hash, last_seen, gcal_id, row_hash)
+        VALUES (%s, %s, NOW(), %s, %s)
+        ON DUPLICATE KEY UPDATE content_hash = VALUES(content_hash), last_seen = NOW(),
+                                gcal_id = VALUES(gcal_id), row_hash = VALUES(row_hash)
+    """, rows)
+    cur.close()
+
+def bulk_mark_synced(conn, table, id_field, rows):
+    """rows: lijst van (row_id, gcal_id); één UPDATE met CASE voor alle rijen."""
+    if not rows:
+        return
+    case_sql = " ".join(["WHEN %s THEN %s"] * len(rows))
+    ids = [row_id for row_id, _ in rows]
+    params = [value for pair in rows for value in pair] + ids
+    cur = conn.cursor()
+    cur.execute(f"""
+        UPDATE {table}
+        SET synced = 1, synced_at = NOW(), updated_at = updated_at,
+            gcal_id = CASE {id_field} {case_sql} END
+        WHERE {id_field} IN ({_placeholders(ids)})
+    """, params)
+    cur.close()
+
+class SyncWriteBuffer:
+    """
+    Verzamelt de DB-writes van een cyclus (synced-markering, snapshot upserts
+    en snapshot deletes) en schrijft ze in bulk weg in één transactie.
+    """
+
+    def __init__(self, conn, flush_rows=None):
+        self.conn = conn
+        self.flush_rows = flush_rows or SYNC_WRITE_FLUSH_ROWS
+        self._synced = defaultdict(list)
+        self._snapshots = defaultdict(list)
+        self._snapshot_deletes = defaultdict(list)
+        self._failures = []
+        self._cleared = []
+        self._count = 0
+        # ids die deze cyclus een snapshot kregen (blijft staan na flush)
+        self.snapshotted = defaultdict(set)
+        # retry-status per tabel zoals gelezen aan het begin van de cyclus
+        self.failures = {}
+
+    def mark_synced(self, table, id_field, row_id, gcal_id):
+        self._synced[(table, id_field)].append((row_id, gcal_id))
+        self._count += 1
+
+    def update_snapshot(self, snapshot_table, id_field, row_id, content_hash, gcal_id, row_hash=None):
+        self._snapshots[(snapshot_table, id_field)].append((row_id, content_hash, gcal_id, row_hash))
+        self.snapshotted[snapshot_table].add(row_id)
+        self._count += 1
+
+    def delete_snapshot(self, snapshot_table, id_field, row_id):
+        self._snapshot_deletes[(snapshot_table, id_field)].append(row_id)
+        self._count += 1
+
+    def record_failure(self, table, row_id, error):
+        attempts = self.failures.get(table, {}).get(row_id, (0, True))[0] + 1
+        self._failures.append((table, row_id, attempts, retry_delay(attempts), str(error)[:1000]))
+        self._count += 1
+        return attempts
+
+    def clear_failure(self, table, row_id):
+        if row_id in self.failures.get(table, {}):
+            self._cleared.append((table, row_id))
+            self._count += 1
+
+    def __len__(self):
+        return self._count
+
+    def maybe_flush(self):
+        if self._count >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        try:
+            for (table, id_field), rows in self._synced.items():
+                bulk_mark_synced(self.conn, table, id_field, rows)
+            for (snapshot_table, id_field), rows in self._snapshots.items():
+                bulk_update_snapshots(self.conn, snapshot_table, id_field, rows)
+            for (snapshot_table, id_field), ids in self._snapshot_deletes.items():
+                bulk_delete_snapshots(self.conn, snapshot_table, id_field, ids)
+            bulk_record_failures(self.conn, self._failures)
+            bulk_clear_failures(self.conn, self._cleared)
+            self.conn.commit()
+        except Exception:
+            _rollback_quietly(self.conn)
+            raise
+        finally:
+            self._synced.clear()
+            self._snapshots.clear()
+            self._snapshot_deletes.clear()
+            self._failures.clear()
+            self._cleared.clear()
+            self._count = 0
+
+def bulk_delete_snapshots(conn, snapshot_table, id_field, ids):
+    if not ids:
+        return
+    cur = conn.cursor()
+    cur.execute(f"DELETE FROM {snapshot_table} WHERE {id_field} IN ({_placeholders(ids)})", list(ids))
+    cur.close()
+
+# --- RETRY QUEUE ---
+def retry_delay(attempts):
+    """Exponentiële backoff met jitter: base * 2^(n-1), begrensd op max."""
+    delay = min(SYNC_RETRY_MAX, SYNC_RETRY_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+def fetch_failures(conn, table, shard=None, horizon=None):
+    """
+    {row_id: (attempts, due)} voor de tabel; due = het retry-tijdstip is bereikt.
+    Met een shard en/of horizon enkel de rijen binnen die scope; rijen die niet
+    meer bestaan horen bij de leader (die ook de deletes doet).
+    """
+    sql, params = "SELECT f.row_id, f.attempts, f.next_attempt_at <= NOW() FROM sync_failures f", [table]
+    where = "f.table_name = %s"
+    conditions, scope_params = _scope(table, "t.", shard, horizon)
+    if conditions:
+        id_field = SYNC_TABLES[table]["id_field"]
+        sql += f" LEFT JOIN {table} t ON t.{id_field} = f.row_id"
+        clause = " AND ".join(conditions)
+        if shard is None or shard.leader:
+            clause = f"({clause}) OR t.{id_field} IS NULL"
+        where += f" AND ({clause})"
+        params.extend(scope_params)
+    cur = conn.cursor()
+    cur.execute(f"{sql} WHERE {where}", params)
+    result = {row_id: (attempts, bool(due)) for row_id, attempts, due in cur.fetchall()}
+    cur.close()
+    return result
+
+def bulk_record_failures(conn, rows):
+    """rows: lijst van (table, row_id, attempts, delay_seconds, error); één multi-row upsert."""
+    if not rows:
+        return
+    cur = conn.cursor()
+    cur.executemany("""
+        INSERT INTO sync_failures (table_name, row_id, attempts, next_attempt_at, last_error)
+        VALUES (%s, %s, %s, NOW() + INTERVAL %s SECOND, %s)
+        ON DUPLICATE KEY UPDATE attempts = VALUES(attempts), next_attempt_at = VALUES(next_attempt_at),
+                                last_error = VALUES(last_error)
+    """, [(table, row_id, attempts, int(delay), error) for table, row_id, attempts, delay, error in rows])
+    cur.close()
+
+def bulk_clear_failures(conn, keys):
+    """keys: lijst van (table, row_id) die opnieuw gesynchroniseerd zijn."""
+    if not keys:
+        return
+    by_table = defaultdict(list)
+    for table, row_id in keys:
+        by_table[table].append(row_id)
+    cur = conn.cursor()
+    for table, ids in by_table.items():
+        cur.execute(f"DELETE FROM sync_failures WHERE table_name = %s AND row_id IN ({_placeholders(ids)})",
+                    [table] + ids)
+    cur.close()
+
+def list_failures(conn):
+    cur = conn.cursor(dictionary=True)
+    cur.execute("""
+        SELECT table_name, row_id, attempts, next_attempt_at, last_error
+        FROM sync_failures ORDER BY next_attempt_at
+    """)
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+def retry_failures(conn, table=None, row_id=None):
+    """Zet het retry-tijdstip op nu (alles, een tabel of één rij); geeft het aantal rijen terug."""
+    sql, params = "UPDATE sync_failures SET next_attempt_at = NOW()", []
+    if table is not None:
+        sql += " WHERE table_name = %s"
+        params.append(table)
+        if row_id is not None:
+            sql += " AND row_id = %s"
+            params.append(row_id)
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    count = cur.rowcount
+    cur.close()
+    conn.commit()
+    return count
+
 def delete_from_snapshot(conn, snapshot_table, id_field, row_id):
     cur = conn.cursor()
     cur.execute(f"DELETE FROM {snapshot_table} WHERE {id_field} = %s", (row_id,))
-    conn.commit()
     cur.close()
 
 def remove_from_gcal(service, gcal_id):
-    log_info(f"🧪 [DEBUG] remove_from_gcal() called with: {gcal_id}", target="both")
+    log_debug(f"🧪 [DEBUG] remove_from_gcal() called with: {gcal_id}", target="both")
     if gcal_id:
         try:
-            service.events().delete(calendarId=GCAL_EVENT_CALENDAR_ID, eventId=gcal_id).execute()
+            _gcal_quota.execute(service.events().delete(calendarId=GCAL_EVENT_CALENDAR_ID, eventId=gcal_id))
             log_info(f"🗑️  GCal event verwijderd: {gcal_id}", target="both")
         except Exception as e:
             log_error(f"⚠️  Verwijderen uit GCal mislukt voor {gcal_id}: {e}", target="both")
     else:
         log_error("⚠️  Geen gcal_id opgegeven, dus niets verwijderd.", target="both")
 
+# --- CONCURRENCY ---
+# Calls, Retry-After pauzes en backoff lopen via de gedeelde quota manager
+_gcal_quota = get_quota()
+_worker_local = threading.local()
+_executor = None
+
+def _worker_service():
+    # De Google client is niet thread-safe: elke worker krijgt een eigen service
+    if getattr(_worker_local, "service", None) is None:
+        _worker_local.service = get_gcal_service()
+    return _worker_local.service
+
+def run_gcal_batches(service, chunks, fn):
+    """
+    Voert fn(service, chunk) uit voor elke chunk en geeft de resultaten in
+    dezelfde volgorde terug. Met SYNC_WORKERS > 1 lopen de chunks parallel,
+    elk op de service van de worker-thread.
+    """
+    if SYNC_WORKERS <= 1 or len(chunks) <= 1:
+        return (fn(service, chunk) for chunk in chunks)
+    return _gcal_executor().map(lambda chunk: fn(_worker_service(), chunk), chunks)
+
+def _gcal_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max(1, SYNC_WORKERS), thread_name_prefix="gcal")
+    return _executor
+
+# --- PIPELINE ---
+class _StageWrites:
+    """
+    Write-interface van SyncWriteBuffer voor de apply-stage: elke write gaat
+    via de begrensde queue naar de snapshot-stage, die ze in volgorde buffert.
+    """
+
+    def __init__(self, pipeline):
+        self._pipeline = pipeline
+
+    def _enqueue(self, method, *args):
+        self._pipeline._put(self._pipeline._write_q, (method, args))
+
+    def mark_synced(self, *args):
+        self._enqueue("mark_synced", *args)
+
+    def update_snapshot(self, *args):
+        self._enqueue("update_snapshot", *args)
+
+    def delete_snapshot(self, *args):
+        self._enqueue("delete_snapshot", *args)
+
+    def clear_failure(self, *args):
+        self._enqueue("clear_failure", *args)
+
+    def record_failure(self, table, row_id, error):
+        # zelfde telling als SyncWriteBuffer; de failures-dict wordt gedeeld
+        self._enqueue("record_failure", table, row_id, error)
+        return self._pipeline.buffer.failures.get(table, {}).get(row_id, (0, True))[0] + 1
+
+    def maybe_flush(self):
+        pass
+
+class SyncPipeline:
+    """
+    Pijplijn voor één tabel: diff (hoofdthread) -> GCal (worker pool) ->
+    publish (apply-thread) -> snapshot writes (writer-thread met een eigen
+    DB-connectie). Tussen de stages zitten begrensde queues, zodat een trage
+    stage de vorige afremt; elke stage verwerkt de batches in volgorde, dus
+    per rij blijft de volgorde behouden. close() wacht tot alles geschreven is.
+    """
+    _STOP = object()
+
+    def __init__(self, writes, conn, depth=None):
+        self.depth = depth or SYNC_PIPELINE_DEPTH
+        self.writes = writes
+        self.conn = conn
+        self.buffer = SyncWriteBuffer(conn)
+        self.buffer.failures = writes.failures
+        self.stage = _StageWrites(self)
+        self.error = None
+        self._apply_q = queue.Queue(self.depth)
+        self._write_q = queue.Queue(self.depth * GCAL_BATCH_SIZE)
+        self._threads = [
+            threading.Thread(target=self._apply_loop, name="sync-apply", daemon=True),
+            threading.Thread(target=self._write_loop, name="sync-write", daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _put(self, q, item):
+        # blokkeert bij een volle queue (backpressure), maar niet als een stage al faalde
+        while True:
+            if self.error is not None:
+                raise self.error
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def submit(self, service, gcal_fn, chunk, apply_fn):
+        """Start de GCal calls van een batch; apply_fn(results) volgt in de apply-stage."""
+        # met één worker gebruikt enkel die thread de service van de hoofdloop
+        future = _gcal_executor().submit(
+            lambda: gcal_fn(service if SYNC_WORKERS <= 1 else _worker_service(), chunk))
+        self._put(self._apply_q, (future, apply_fn))
+
+    def _apply_loop(self):
+        while True:
+            item = self._apply_q.get()
+            if item is self._STOP:
+                self._write_q.put(self._STOP)
+                return
+            if self.error is not None:
+                continue
+            future, apply_fn = item
+            try:
+                apply_fn(future.result())
+            except Exception as e:
+                self.error = e
+
+    def _write_loop(self):
+        while True:
+            item = self._write_q.get()
+            if item is self._STOP:
+                break
+            if self.error is not None:
+                continue
+            method, args = item
+            try:
+                getattr(self.buffer, method)(*args)
+                self.buffer.maybe_flush()
+            except Exception as e:
+                self.error = e
+        if self.error is None:
+            try:
+                self.buffer.flush()
+            except Exception as e:
+                self.error = e
+
+    def close(self):
+        """Laat de queues leeglopen, commit de snapshot writes en geeft de connectie terug."""
+        self._apply_q.put(self._STOP)
+        for thread in self._threads:
+            thread.join()
+        for snapshot_table, ids in self.buffer.snapshotted.items():
+            self.writes.snapshotted[snapshot_table] |= ids
+        _close_quietly(self.conn)
+        if self.error is not None:
+            raise self.error
+
+def open_pipeline(writes, batches):
+    """SyncPipeline als het werk meerdere GCal batches beslaat, anders None (sequentieel)."""
+    if SYNC_PIPELINE_DEPTH <= 0 or batches <= 1:
+        return None
+    return SyncPipeline(writes, get_pipeline_connection())
+
+# --- OUTBOX ---
+def outbox_head(conn):
+    """Hoogste id in sync_outbox, of None als de outbox leeg is."""
+    cur = conn.cursor()
+    cur.execute("SELECT MAX(id) FROM sync_outbox")
+    head = cur.fetchone()[0]
+    cur.close()
+    return head
+
+def wait_for_outbox(conn, timeout, after=None):
+    """
+    Blokkeert tot er entries in sync_outbox staan (met een id na `after`) of
+    `timeout` verstreken is. Pollt eerst kort en verdubbelt het interval (tot
+    OUTBOX_POLL_MAX) zolang het stil blijft. Geeft het hoogste outbox-id
+    terug, of None bij timeout.
+    """
+    deadline = time.monotonic() + timeout
+    delay = OUTBOX_POLL_MIN
+    while True:
+        conn.commit()  # nieuwe read view, anders zien we geen nieuwe entries
+        head = outbox_head(conn)
+        if head is not None and after is not None and head <= after:
+            head = None
+        remaining = deadline - time.monotonic()
+        if head is not None or remaining <= 0:
+            return head
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, OUTBOX_POLL_MAX)
+
+def drain_outbox(conn, head):
+    """Verwijdert de entries die door de afgelopen cyclus verwerkt zijn."""
+    cur = conn.cursor()
+    cur.execute("DELETE FROM sync_outbox WHERE id <= %s", (head,))
+    conn.commit()
+    cur.close()
+
+# --- SHARDING ---
+class ShardSet:
+    """De shards die deze worker in een cyclus verwerkt."""
+
+    def __init__(self, count, owned, leader=False):
+        self.count = count
+        self.owned = sorted(owned)
+        self.leader = leader
+
+    def clause(self, column):
+        """SQL-voorwaarde (en parameters) die rijen tot de eigen shards beperkt."""
+        if not self.owned:
+            return "1 = 0", []
+        return f"CRC32({column}) MOD %s IN ({_placeholders(self.owned)})", [self.count] + self.owned
+
+class ShardCoordinator:
+    """
+    Claimt shards met MySQL advisory locks (GET_LOCK) op de sync-connectie.
+    Elke worker houdt een heartbeat bij in sync_workers; het aantal levende
+    workers bepaalt het eerlijke aandeel ceil(shards / workers). Een worker
+    met te veel shards geeft er af, een worker met te weinig claimt vrije.
+    De locks hangen aan de DB-sessie: valt de connectie (of de worker) weg,
+    dan komen de shards vanzelf vrij.
+    """
+
+    def __init__(self, count=None, worker_id=None):
+        self.count = count or SYNC_SHARDS
+        self.worker_id = worker_id or SYNC_WORKER_ID
+        self.owned = set()
+        self.leader = False
+        self.processed_head = None
+
+    def _lock_name(self, suffix):
+        # GET_LOCK-namen zijn server-breed; prefix met de database
+        return f"{DB_CONFIG['database']}.sync.{suffix}"[:64]
+
+    def _scalar(self, conn, sql, params=()):
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        value = cur.fetchone()[0]
+        cur.close()
+        return value
+
+    def _holds(self, conn, suffix):
+        return self._scalar(conn, "SELECT IS_USED_LOCK(%s) = CONNECTION_ID()", (self._lock_name(suffix),)) == 1
+
+    def _acquire(self, conn, suffix):
+        if self._holds(conn, suffix):
+            return True
+        return self._scalar(conn, "SELECT GET_LOCK(%s, 0)", (self._lock_name(suffix),)) == 1
+
+    def _release(self, conn, suffix):
+        self._scalar(conn, "SELECT RELEASE_LOCK(%s)", (self._lock_name(suffix),))
+
+    def _reset_watermarks(self, conn, shards):
+        """
+        Wist de watermarks van shards die van eigenaar wisselen: de nieuwe
+        eigenaar doet er dan eerst een volledige pass over (het geheugen van de
+        vorige, zoals debounce en _carry_over, gaat niet mee).
+        """
+        names = [key for table in SYNC_TABLES for key in _watermark_keys(table, ShardSet(self.count, shards))]
+        if not names:
+            return
+        cur = conn.cursor()
+        cur.execute(f"DELETE FROM sync_state WHERE name IN ({_placeholders(names)})", names)
+        cur.close()
+        conn.commit()
+
+    def heartbeat(self, conn):
+        """Meldt de worker als levend; geeft het aantal levende workers terug."""
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO sync_workers (worker_id, heartbeat_at, shards, outbox_head)
+            VALUES (%s, NOW(), %s, %s)
+            ON DUPLICATE KEY UPDATE heartbeat_at = NOW(), shards = VALUES(shards),
+                                    outbox_head = VALUES(outbox_head)
+        """, (self.worker_id, ",".join(map(str, sorted(self.owned))), self.processed_head))
+        cur.execute("SELECT COUNT(*) FROM sync_workers WHERE heartbeat_at >= NOW() - INTERVAL %s SECOND",
+                    (SYNC_WORKER_TIMEOUT,))
+        live = cur.fetchone()[0]
+        cur.close()
+        conn.commit()
+        return max(1, live)
+
+    def rebalance(self, conn):
+        """Heartbeat, locks controleren, aandeel herberekenen; geeft de ShardSet terug."""
+        live = self.heartbeat(conn)
+        share = math.ceil(self.count / live)
+
+        # na een reconnect zijn de locks weg
+        lost = {shard for shard in self.owned if not self._holds(conn, f"shard.{shard}")}
+        if lost:
+            log_error(f"⚠️  Shards {sorted(lost)} niet meer in bezit (connectie verloren?)", target="both")
+        owned = self.owned - lost
+
+        while len(owned) > share:
+            shard = max(owned)
+            # vóór het vrijgeven, zodat de nieuwe eigenaar geen oude watermark leest
+            self._reset_watermarks(conn, {shard})
+            self._release(conn, f"shard.{shard}")
+            owned.discard(shard)
+        acquired = set()
+        for shard in range(self.count):
+            if len(owned) >= share:
+                break
+            if shard not in owned and self._acquire(conn, f"shard.{shard}"):
+                owned.add(shard)
+                acquired.add(shard)
+        # ook na een gestorven vorige eigenaar, die niets meer kon wissen
+        self._reset_watermarks(conn, acquired)
+
+        if owned != self.owned:
+            log_info(f"🧩 Worker {self.worker_id} verwerkt shards {sorted(owned)} "
+                     f"({live} worker(s), {self.count} shards)", target="both")
+        self.owned = owned
+
+        leader = self._acquire(conn, "leader")
+        if leader and not self.leader:
+            log_info(f"👑 Worker {self.worker_id} is leader", target="both")
+        self.leader = leader
+        return ShardSet(self.count, owned, leader)
+
+    def drainable_head(self, conn):
+        """Hoogste outbox-id dat alle levende workers al verwerkt hebben."""
+        return self._scalar(conn, """
+            SELECT MIN(COALESCE(outbox_head, 0)) FROM sync_workers
+            WHERE heartbeat_at >= NOW() - INTERVAL %s SECOND
+        """, (SYNC_WORKER_TIMEOUT,))
+
+    def prune(self, conn):
+        """Verwijdert workers zonder recente heartbeat (enkel door de leader)."""
+        cur = conn.cursor()
+        cur.execute("DELETE FROM sync_workers WHERE heartbeat_at < NOW() - INTERVAL %s SECOND",
+                    (SYNC_WORKER_TIMEOUT * 4,))
+        cur.close()
+        conn.commit()
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def execute_gcal_batch(service, requests):
+    """
+    Voert (key, request) paren uit via Google API batch requests van
+    max. GCAL_BATCH_SIZE calls. Geeft {key: (response, exception)} terug.
+    Calls die op 403/429 botsen worden na Retry-After/backoff opnieuw
+    gebundeld, tot GCAL_QUOTA_RETRIES keer.
+    """
+    results = {}
+
+    def callback(request_id, response, exception):
+        results[request_id] = (response, exception)
+
+    for chunk in _chunks(list(requests), GCAL_BATCH_SIZE):
+        attempt = 0
+        while chunk:
+            attempt += 1
+            _gcal_quota.acquire(len(chunk))
+            batch = service.new_batch_http_request(callback=callback)
+            for key, request in chunk:
+                batch.add(request, request_id=str(key))
+            try:
+                batch.execute()
+            except Exception as e:
+                for key, _ in chunk:
+                    results.setdefault(str(key), (None, e))
+
+            throttled = [(key, request) for key, request in chunk
+                         if is_quota_error(results.get(str(key), (None, None))[1])]
+            if not throttled or attempt > _gcal_quota.retries:
+                break
+            _gcal_quota.throttled(results[str(throttled[0][0])][1], attempt)
+            for key, _ in throttled:
+                del results[str(key)]
+            chunk = throttled
+
+    return results
+
+def _is_gone(error):
+    """404/410 bij delete: event bestaat al niet meer in GCal."""
+    return isinstance(error, HttpError) and error.resp.status in (404, 410)
+
 def get_gcal_id(conn, snapshot_table, id_field, row_id):
     cur = conn.cursor()
     try:
@@ -166,48 +1214,392 @@ def get_gcal_id(conn, snapshot_table, id_field, row_id):
     finally:
         cur.close()
 
-# --- SYNC EVENTS ---
-def sync_events(service, conn):
-    current_rows = fetch_all(conn, "events")
-    snapshot_map = fetch_snapshot_map(conn, "event_snapshots", "event_id")
-    current_ids = set()
+# --- SYNC (generiek voor events en sessies) ---
+def new_stats():
+    return {"changed": 0, "deleted": 0, "failed": 0, "quota_errors": 0, "held": 0}
 
-    for row in current_rows:
-        eid = row["event_id"]
-        current_ids.add(eid)
-        current_hash = hash_row(row)
-        old_hash = snapshot_map.get(eid)
+def _record_failure(writes, table, rid, error, stats):
+    spec = SYNC_TABLES[table]
+    attempts = writes.record_failure(table, rid, error)
+    log_error(f"❌ {spec['label']} '{rid}' fout bij sync (poging {attempts}): {error}", target=spec["target"])
+    stats["failed"] += 1
+    if is_quota_error(error):
+        stats["quota_errors"] += 1
+
+def push_changes(service, writes, table, pending, build_payload, publish, stats):
+    """
+    pending: lijst van (row, operation, content_hash).
+    Stuurt de inserts/updates per batch naar Google; enkel de rijen die
+    effectief geslaagd zijn worden gepubliceerd en in `writes` gebufferd.
+    Batches mogen parallel lopen, de resultaten worden in volgorde verwerkt.
+    Is `writes` een SyncPipeline, dan gebeurt dat laatste in zijn stages.
+    """
+    chunks = list(_chunks(pending, GCAL_BATCH_SIZE))
+    gcal_fn = lambda svc, chunk: _gcal_changes_batch(svc, chunk, build_payload)
+    if isinstance(writes, SyncPipeline):
+        for chunk in chunks:
+            writes.submit(service, gcal_fn, chunk, lambda results, chunk=chunk:
+                          _apply_changes_batch(writes.stage, table, chunk, results, publish, stats))
+        return
+    results = run_gcal_batches(service, chunks, gcal_fn)
+    for chunk, chunk_results in zip(chunks, results):
+        _apply_changes_batch(writes, table, chunk, chunk_results, publish, stats)
+        writes.maybe_flush()
 
-        if old_hash != current_hash:
+def _gcal_changes_batch(service, pending, build_payload):
+    """Bouwt en verstuurt één batch inserts/updates; {key: (response, error)}."""
+    requests, results = [], {}
+    for key, (row, operation, _) in enumerate(pending):
+        try:
+            if operation == "create" and not row.get("gcal_id"):
+                request = service.events().insert(
+                    calendarId=GCAL_EVENT_CALENDAR_ID,
+                    body=build_payload(row))
+            else:
+                # ook een create met gcal_id: het event bestaat al van een poging
+                # waarvan enkel de publish mislukte
+                request = service.events().update(
+                    calendarId=GCAL_EVENT_CALENDAR_ID,
+                    eventId=row["gcal_id"],
+                    body=build_payload(row))
+            requests.append((key, request))
+        except Exception as e:
+            results[str(key)] = (None, e)
+    if requests:
+        results.update(execute_gcal_batch(service, requests))
+    return results
+
+def _apply_changes_batch(writes, table, pending, results, publish, stats):
+    spec = SYNC_TABLES[table]
+    id_field = spec["id_field"]
+
+    synced = []
+    for key, (row, operation, content_hash) in enumerate(pending):
+        rid = row[id_field]
+        response, error = results.get(str(key), (None, RuntimeError("geen antwoord in batch")))
+        try:
+            if error is not None:
+                if operation == "create" and row.get("gcal_id") and _is_gone(error):
+                    # event van de vorige poging bestaat niet meer: opnieuw aanmaken
+                    writes.mark_synced(table, id_field, rid, None)
+                raise error
+            if operation == "create":
+                gcal_id = response["id"]
+                # meteen bewaren, ook als de publish hieronder mislukt: de retry
+                # werkt dan dit event bij i.p.v. een duplicaat aan te maken
+                writes.mark_synced(table, id_field, rid, gcal_id)
+            else:
+                gcal_id = row["gcal_id"]
+            synced.append((row, operation, content_hash, gcal_id))
+        except Exception as e:
+            _record_failure(writes, table, rid, e, stats)
+
+    # enkel rijen die de broker bevestigde krijgen een snapshot
+    errors = publish_rows(publish, [(row, operation) for row, operation, _, _ in synced])
+    for (row, operation, content_hash, gcal_id), error in zip(synced, errors):
+        rid = row[id_field]
+        if error is not None:
+            _record_failure(writes, table, rid, error, stats)
+            continue
+        log_info(f"✅ {spec['label']} '{rid}' gesynchroniseerd ({operation})", target=spec["target"])
+        writes.update_snapshot(spec["snapshot_table"], id_field, rid, content_hash, gcal_id, row.get("row_hash"))
+        writes.clear_failure(table, rid)
+        stats["changed"] += 1
+
+def publish_rows(publish, items):
+    """
+    items: lijst van (data, operation). Via de batch-API als `publish` er een
+    heeft, anders rij per rij. Geeft per item None of de fout terug.
+    """
+    if not items:
+        return []
+    batch = BATCH_PUBLISHERS.get(publish)
+    if batch is not None:
+        return batch(items)
+    errors = []
+    for data, operation in items:
+        try:
+            publish(data, operation)
+            errors.append(None)
+        except Exception as e:
+            errors.append(e)
+    return errors
+
+def publish_deletes(publish, id_field, row_ids):
+    """Publiceert de delete-berichten van een batch; geeft de geslaagde ids terug."""
+    published = []
+    errors = publish_rows(publish, [({id_field: row_id}, "delete") for row_id in row_ids])
+    for row_id, error in zip(row_ids, errors):
+        if error is None:
+            published.append(row_id)
+        else:
+            log_error(f"❌ Delete-bericht voor '{row_id}' niet verzonden: {error}", target="both")
+    return published
+
+def push_deletes(service, writes, table, deletes, publish, stats):
+    """
+    deletes: lijst van (id, gcal_id) uit de snapshot-index.
+    Verwijdert per batch uit GCal, publiceert de delete-berichten en buffert
+    de snapshot deletes (één DELETE ... IN (...) per flush).
+    """
+    chunks = list(_chunks(list(deletes), GCAL_BATCH_SIZE))
+    if isinstance(writes, SyncPipeline):
+        for chunk in chunks:
+            writes.submit(service, _gcal_deletes_batch, chunk, lambda results, chunk=chunk:
+                          _apply_deletes_batch(writes.stage, table, chunk, results, publish, stats))
+        return
+    results = run_gcal_batches(service, chunks, _gcal_deletes_batch)
+    for chunk, chunk_results in zip(chunks, results):
+        _apply_deletes_batch(writes, table, chunk, chunk_results, publish, stats)
+        writes.maybe_flush()
+
+def _gcal_deletes_batch(service, deletes):
+    requests = [
+        (key, service.events().delete(calendarId=GCAL_EVENT_CALENDAR_ID, eventId=gcal_id))
+        for key, (_, gcal_id) in enumerate(deletes) if gcal_id
+    ]
+    if not requests:
+        return {}
+    return execute_gcal_batch(service, requests)
+
+def _apply_deletes_batch(writes, table, deletes, results, publish, stats):
+    spec = SYNC_TABLES[table]
+    id_field = spec["id_field"]
+    target   = spec["target"]
+    label    = spec["label"]
+
+    removed = []
+    for key, (row_id, gcal_id) in enumerate(deletes):
+        if gcal_id:
+            _, error = results.get(str(key), (None, RuntimeError("geen antwoord in batch")))
+            if error is not None and not _is_gone(error):
+                _record_failure(writes, table, row_id, error, stats)
+                continue
+        else:
+            log_error(f"⚠️  Geen gcal_id voor {label} '{row_id}', dus niets verwijderd in GCal.", target=target)
+        removed.append(row_id)
+
+    published = publish_deletes(publish, id_field, removed)
+    for row_id in published:
+        writes.delete_snapshot(spec["snapshot_table"], id_field, row_id)
+        writes.clear_failure(table, row_id)
+    for row_id in set(removed) - set(published):
+        _record_failure(writes, table, row_id, RuntimeError("delete-bericht niet verzonden"), stats)
+    stats["deleted"] += len(published)
+    if published:
+        log_info(f"🗑️  {len(published)} {label.lower()}(s) verwijderd: {', '.join(published)}", target=target)
+
+def debounce(table, pending, now, stats, clock=time.monotonic):
+    """
+    Houdt creates/updates vast waarvan updated_at minder dan SYNC_QUIET_SECONDS
+    voor `now` (DB-klok) ligt: die rij wordt wellicht nog verder bewerkt. Ze
+    komt de volgende cyclus opnieuw aan bod; na SYNC_MAX_DELAY seconden
+    vasthouden gaat ze toch door.
+    """
+    held = _held_since[table]
+    if SYNC_QUIET_SECONDS <= 0:
+        held.clear()
+        return pending
+    id_field = SYNC_TABLES[table]["id_field"]
+    t = clock()
+    ready = []
+    for item in pending:
+        row = item[0]
+        rid = row[id_field]
+        updated_at = row.get("updated_at")
+        if updated_at is not None and (now - updated_at).total_seconds() < SYNC_QUIET_SECONDS:
+            first = held.setdefault(rid, t)
+            if t - first < SYNC_MAX_DELAY:
+                _carry_over[table].add(rid)
+                stats["held"] += 1
+                continue
+        held.pop(rid, None)
+        ready.append(item)
+    # rijen die intussen niet meer gewijzigd zijn (bv. teruggedraaid)
+    for rid in [rid for rid, first in held.items() if t - first > 2 * SYNC_MAX_DELAY]:
+        del held[rid]
+    return ready
+
+def hold_orphans(conn, writes, table, pending):
+    """
+    Houdt creates tegen waarvan de parent (bv. het event van een sessie) nog
+    niet in GCal staat; die rijen komen de volgende cyclus opnieuw aan bod.
+    """
+    parent = SYNC_TABLES[table].get("parent")
+    if not parent:
+        return pending
+    parent_snapshot_table, parent_field = parent
+    parent_ids = {row[parent_field] for row, operation, _ in pending if operation == "create"}
+    known = set(fetch_snapshot_map(conn, parent_snapshot_table, parent_field, parent_ids))
+    known |= writes.snapshotted[parent_snapshot_table]
+
+    ready = []
+    for item in pending:
+        row, operation, _ = item
+        if operation == "create" and row[parent_field] not in known:
+            rid = row[SYNC_TABLES[table]["id_field"]]
+            log_info(f"⏳ {SYNC_TABLES[table]['label']} '{rid}' wacht op {parent_field} '{row[parent_field]}'",
+                     target=SYNC_TABLES[table]["target"])
+            _carry_over[table].add(rid)
+            continue
+        ready.append(item)
+    return ready
+
+def _sync_table(service, conn, table, build_payload, publish, since=None, writes=None, shard=None, horizon=None):
+    """
+    Synchroniseert één tabel met Google Calendar.
+    since=None  -> volledige pass (alle rijen + volledige snapshot)
+    since=<ts>  -> incrementeel: enkel rijen met updated_at >= since
+    writes      -> gedeelde SyncWriteBuffer; zonder buffer wordt op het einde geflusht
+    shard       -> ShardSet: enkel de eigen shards; deletes enkel door de leader
+    horizon     -> enkel rijen die hoogstens zoveel dagen voorbij zijn (None = alles)
+    """
+    own_writes = writes is None
+    if own_writes:
+        writes = SyncWriteBuffer(conn)
+    spec = SYNC_TABLES[table]
+    snapshot_table = spec["snapshot_table"]
+    id_field       = spec["id_field"]
+    stats = new_stats()
+
+    # Mislukte rijen blijven uit het hete pad tot hun retry-tijdstip bereikt is
+    failures = writes.failures[table] = fetch_failures(conn, table, shard, horizon)
+    waiting  = {rid for rid, (_, due) in failures.items() if not due}
+    extra_ids = _carry_over[table] | (set(failures) - waiting)
+
+    if SYNC_STREAM and since is None:
+        _carry_over[table] = set()
+        _sync_table_streaming(service, conn, writes, table, build_payload, publish, shard, failures, waiting,
+                              stats, horizon)
+        if own_writes:
+            writes.flush()
+        return stats
+
+    if SYNC_DB_HASH:
+        current_rows, snapshot_map = fetch_hash_diff(conn, table, snapshot_table, id_field,
+                                                     since, extra_ids, shard, horizon)
+        deleted = fetch_deleted_since(conn, table, snapshot_table, id_field, since, extra_ids)
+    elif since is None and shard is None and horizon is None:
+        current_rows = fetch_all(conn, table)
+        snapshot_map = fetch_snapshot_map(conn, snapshot_table, id_field)
+        current_ids = {row[id_field] for row in current_rows}
+        deleted = [(sid, entry[1]) for sid, entry in snapshot_map.items() if sid not in current_ids]
+    else:
+        if since is None:
+            current_rows = fetch_all(conn, table, shard, horizon)
+        else:
+            current_rows = fetch_changed(conn, table, id_field, since, extra_ids, shard, horizon)
+        snapshot_map = fetch_snapshot_map(conn, snapshot_table, id_field,
+                                          [row[id_field] for row in current_rows])
+        deleted = fetch_deleted_since(conn, table, snapshot_table, id_field, since, extra_ids)
+
+    if shard is not None and not shard.leader:
+        # verwijderde rijen hebben geen shard meer; de leader neemt ze voor zijn rekening
+        deleted = []
+
+    _carry_over[table] = set()
+    deleted = [item for item in deleted if item[0] not in waiting]
+
+    pending = []
+    for row in current_rows:
+        rid = row[id_field]
+        if rid in waiting:
+            continue
+        old_hash, old_gcal_id, old_row_hash = snapshot_map.get(rid, (None, None, None))
+        current_hash, unchanged = compare_content(row, old_hash)
+        if not unchanged:
             operation = "create" if old_hash is None else "update"
-            try:
-                if operation == "create":
-                    gcal_id = service.events().insert(
-                        calendarId=GCAL_EVENT_CALENDAR_ID,
-                        body=build_gcal_payload(row)).execute()["id"]
-                    mark_synced(conn, "events", "event_id", eid, gcal_id)
-                else:
-                    gcal_id = row["gcal_id"]
-                    service.events().update(
-                        calendarId=GCAL_EVENT_CALENDAR_ID,
-                        eventId=gcal_id,
-                        body=build_gcal_payload(row)).execute()
-
-                log_info(f"✅ Event '{eid}' gesynchroniseerd ({operation})", target="event")
-                publish_event(row, operation)
-                update_snapshot(conn, "event_snapshots", "event_id", eid, current_hash, gcal_id)
-            except Exception as e:
-                log_error(f"❌ Event '{eid}' fout bij sync: {e}", target="event")
-
-    # Detect deletes
-    for snapshot_id in snapshot_map:
-        if snapshot_id not in current_ids:
-            log_info(f"🗑️  Event '{snapshot_id}' verwijderd", target="event")
-            gcal_id = get_gcal_id(conn, "event_snapshots", "event_id", snapshot_id)
-            log_info(f"📎 GCal ID voor delete: {gcal_id}", target="event")
-            remove_from_gcal(service, gcal_id)
-            publish_event({"event_id": snapshot_id}, operation="delete")
-            delete_from_snapshot(conn, "event_snapshots", "event_id", snapshot_id)
+            pending.append((row, operation, current_hash))
+        elif old_hash != current_hash or (row.get("row_hash") and row["row_hash"] != old_row_hash):
+            # Inhoud ongewijzigd, enkel fingerprint (legacy hash) of DB-hash in de snapshot bijwerken
+            writes.update_snapshot(snapshot_table, id_field, rid, current_hash, old_gcal_id, row.get("row_hash"))
+
+    # Due rijen die intussen niets meer te syncen hebben (bv. teruggedraaid)
+    in_flight = {row[id_field] for row, _, _ in pending} | {row_id for row_id, _ in deleted}
+    for rid in set(failures) - waiting - in_flight:
+        writes.clear_failure(table, rid)
+
+    if pending and SYNC_QUIET_SECONDS > 0:
+        pending = debounce(table, pending, db_now(conn), stats)
+    pending = hold_orphans(conn, writes, table, pending)
+    pipeline = open_pipeline(writes, math.ceil(len(pending) / GCAL_BATCH_SIZE) +
+                                     math.ceil(len(deleted) / GCAL_BATCH_SIZE))
+    try:
+        push_changes(service, pipeline or writes, table, pending, build_payload, publish, stats)
+        push_deletes(service, pipeline or writes, table, deleted, publish, stats)
+    finally:
+        if pipeline is not None:
+            pipeline.close()
+    if own_writes:
+        writes.flush()
+    return stats
+
+def _sync_table_streaming(service, conn, writes, table, build_payload, publish, shard, failures, waiting, stats,
+                          horizon=None):
+    """
+    Volledige pass op basis van stream_diff: operaties worden per blok van
+    GCAL_BATCH_SIZE * SYNC_WORKERS doorgestuurd, zodat nooit de hele tabel
+    (of snapshot) in het geheugen staat.
+    """
+    block = GCAL_BATCH_SIZE * max(1, SYNC_WORKERS)
+    pending, deleted, seen = [], [], set()
+    now = db_now(conn) if SYNC_QUIET_SECONDS > 0 else None
+    # een volledige pass is groot genoeg om de stages altijd te laten overlappen
+    pipeline = open_pipeline(writes, batches=2)
+    target = pipeline or writes
+
+    def push_pending():
+        ready = debounce(table, pending, now, stats) if now is not None else pending
+        push_changes(service, target, table, hold_orphans(conn, writes, table, ready), build_payload, publish, stats)
+        pending.clear()
+
+    def push_deleted():
+        push_deletes(service, target, table, deleted, publish, stats)
+        deleted.clear()
+
+    try:
+        _stream_operations(conn, writes, table, shard, horizon, failures, waiting, seen,
+                           pending, deleted, block, push_pending, push_deleted)
+    finally:
+        if pipeline is not None:
+            pipeline.close()
+
+    for rid in set(failures) - waiting - seen:
+        writes.clear_failure(table, rid)
+
+def _stream_operations(conn, writes, table, shard, horizon, failures, waiting, seen,
+                       pending, deleted, block, push_pending, push_deleted):
+    spec = SYNC_TABLES[table]
+    id_field = spec["id_field"]
+
+    deletes = shard is None or shard.leader
+    for operation, item, content_hash, gcal_id in stream_diff(conn, table, shard, deletes, horizon=horizon):
+        rid = item if operation == "delete" else item[id_field]
+        if rid in waiting:
+            continue
+        if operation == "backfill":
+            writes.update_snapshot(spec["snapshot_table"], id_field, rid, content_hash, gcal_id, item.get("row_hash"))
+            continue
+        if rid in failures:
+            seen.add(rid)
+        if operation == "delete":
+            if pending:
+                push_pending()
+            deleted.append((rid, gcal_id))
+            if len(deleted) >= block:
+                push_deleted()
+        else:
+            pending.append((item, operation, content_hash))
+            if len(pending) >= block:
+                push_pending()
+    if pending:
+        push_pending()
+    if deleted:
+        push_deleted()
+
+# --- SYNC EVENTS ---
+def sync_events(service, conn, since=None, writes=None, shard=None, horizon=None):
+    return _sync_table(service, conn, "events", build_gcal_payload, publish_event, since, writes, shard, horizon)
 
 def build_gcal_payload(row):
     return {
@@ -228,54 +1620,15 @@ def mark_synced(conn, table, id_field, row_id, gcal_id):
     cur = conn.cursor()
     cur.execute(f"""
         UPDATE {table}
-        SET synced = 1, synced_at = NOW(), gcal_id = %s
+        SET synced = 1, synced_at = NOW(), gcal_id = %s, updated_at = updated_at
         WHERE {id_field} = %s
     """, (gcal_id, row_id))
-    conn.commit()
     cur.close()
 
 # --- SYNC SESSIONS ---
-def sync_sessions(service, conn):
-    current_rows = fetch_all(conn, "sessions")
-    snapshot_map = fetch_snapshot_map(conn, "session_snapshots", "session_id")
-    current_ids = set()
-
-    for row in current_rows:
-        sid = row["session_id"]
-        current_ids.add(sid)
-        current_hash = hash_row(row)
-        old_hash = snapshot_map.get(sid)
-
-        if old_hash != current_hash:
-            operation = "create" if old_hash is None else "update"
-            try:
-                if operation == "create":
-                    gcal_id = service.events().insert(
-                        calendarId=GCAL_EVENT_CALENDAR_ID,
-                        body=build_gcal_payload_session(row)).execute()["id"]
-                    mark_synced(conn, "sessions", "session_id", sid, gcal_id)
-                else:
-                    gcal_id = row["gcal_id"]
-                    service.events().update(
-                        calendarId=GCAL_EVENT_CALENDAR_ID,
-                        eventId=gcal_id,
-                        body=build_gcal_payload_session(row)).execute()
-
-                log_info(f"✅ Sessie '{sid}' gesynchroniseerd ({operation})", target="session")
-                publish_session(row, operation)
-                update_snapshot(conn, "session_snapshots", "session_id", sid, current_hash, gcal_id)
-
-            except Exception as e:
-                log_error(f"❌ Sessie '{sid}' fout bij sync: {e}", target="session")
-
-    for snapshot_id in snapshot_map:
-        if snapshot_id not in current_ids:
-            log_info(f"🗑️  Sessie '{snapshot_id}' verwijderd", target="session")
-            gcal_id = get_gcal_id(conn, "session_snapshots", "session_id", snapshot_id)
-            log_info(f"📎 GCal ID voor delete: {gcal_id}", target="session")
-            remove_from_gcal(service, gcal_id)
-            publish_session({"session_id": snapshot_id}, operation="delete")
-            delete_from_snapshot(conn, "session_snapshots", "session_id", snapshot_id)
+def sync_sessions(service, conn, since=None, writes=None, shard=None, horizon=None):
+    return _sync_table(service, conn, "sessions", build_gcal_payload_session, publish_session,
+                       since, writes, shard, horizon)
 
 def build_gcal_payload_session(row):
     return {
@@ -292,24 +1645,570 @@ def build_gcal_payload_session(row):
         }
     }
 
+# --- PULL (GCal -> DB) ---
+def list_gcal_changes(service, sync_token=None, **filters):
+    """
+    Haalt alle pagina's van events.list op. Met een sync_token enkel wat sinds
+    dat token gewijzigd is (incl. verwijderde events); `filters` (bv. timeMin,
+    timeMax) gaan ongewijzigd mee. Geeft (items, next_sync_token).
+    """
+    items, page_token = [], None
+    while True:
+        params = {
+            "calendarId":  GCAL_EVENT_CALENDAR_ID,
+            "showDeleted": True,
+            "maxResults":  GCAL_PULL_PAGE_SIZE,
+            "timeZone":    "Europe/Brussels",
+            **filters
+        }
+        if sync_token:
+            params["syncToken"] = sync_token
+        if page_token:
+            params["pageToken"] = page_token
+        response = _gcal_quota.execute(service.events().list(**params))
+        items.extend(response.get("items", []))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return items, response.get("nextSyncToken")
+
+def _split_gcal_time(value):
+    """{'dateTime': '2025-05-01T09:00:00+02:00'} -> ('2025-05-01', '09:00:00'); hele dag -> (datum, None)."""
+    value = value or {}
+    if "dateTime" in value:
+        return value["dateTime"][:10], value["dateTime"][11:19]
+    return value.get("date"), None
+
+def gcal_to_row(table, item):
+    """Vertaalt een GCal event terug naar de kolommen die de payload vult."""
+    start_date, start_time = _split_gcal_time(item.get("start"))
+    end_date, end_time = _split_gcal_time(item.get("end"))
+    row = {
+        "title":       item.get("summary", ""),
+        "location":    item.get("location"),
+        "description": item.get("description")
+    }
+    if table == "events":
+        row.update(start_date=start_date, start_time=start_time, end_date=end_date, end_time=end_time)
+    else:
+        row.update(date=start_date, start_time=start_time, end_time=end_time)
+    return row
+
+def _db_value(value):
+    """Maakt DB-waarden vergelijkbaar met de strings uit GCal ('' telt als leeg)."""
+    if isinstance(value, timedelta):
+        seconds = int(value.total_seconds())
+        return f"{seconds // 3600:02}:{seconds % 3600 // 60:02}:{seconds % 60:02}"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()[:10]
+    if value is None or value == "":
+        return None
+    return str(value)
+
+def gcal_changes(table, row, item):
+    """Kolommen waarin het GCal event afwijkt van de DB-rij: {kolom: waarde uit GCal}."""
+    return {col: value for col, value in gcal_to_row(table, item).items()
+            if _db_value(value) != _db_value(row.get(col))}
+
+def fetch_gcal_index(conn, snapshot_table, id_field, gcal_ids):
+    """{gcal_id: (id, content_hash)} voor de opgegeven gcal_ids."""
+    gcal_ids = list(gcal_ids)
+    if not gcal_ids:
+        return {}
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT gcal_id, {id_field}, content_hash FROM {snapshot_table}
+        WHERE gcal_id IN ({_placeholders(gcal_ids)})
+    """, gcal_ids)
+    index = {gcal_id: (row_id, content_hash) for gcal_id, row_id, content_hash in cur.fetchall()}
+    cur.close()
+    return index
+
+def fetch_rows(conn, table, id_field, ids):
+    ids = list(ids)
+    if not ids:
+        return {}
+    cur = conn.cursor(dictionary=True)
+    cur.execute(f"SELECT * FROM {table} WHERE {id_field} IN ({_placeholders(ids)})", ids)
+    rows = {row[id_field]: row for row in cur.fetchall()}
+    cur.close()
+    return rows
+
+def fetch_ids_with_children(conn, table, ids):
+    """Ids uit `table` waar nog rijen van een child-tabel (parent in SYNC_TABLES) naar verwijzen."""
+    ids = list(ids)
+    found = set()
+    if not ids:
+        return found
+    cur = conn.cursor()
+    for child, spec in SYNC_TABLES.items():
+        parent = spec.get("parent")
+        if not parent or parent[0] != SYNC_TABLES[table]["snapshot_table"]:
+            continue
+        cur.execute(f"SELECT DISTINCT {parent[1]} FROM {child} WHERE {parent[1]} IN ({_placeholders(ids)})", ids)
+        found.update(row[0] for row in cur.fetchall())
+    cur.close()
+    return found
+
+def apply_gcal_changes(conn, items):
+    """
+    Past gewijzigde GCal events toe op events/sessions via de gcal_id in de
+    snapshot. Echo's van onze eigen push (zelfde inhoud) worden overgeslagen,
+    net als rijen met een lokale wijziging die nog niet gepusht is: dan wint
+    de DB. Geannuleerde events worden uit de tabel verwijderd; de push-stap
+    verstuurt daarna het delete-bericht en ruimt de snapshot op. Gewijzigde
+    rijen krijgen een nieuwe hash, zodat de push ze publiceert.
+    Een event met sessies wordt niet verwijderd (zoals in de webforms): het
+    blijft staan en telt als `kept`; reconcile zet het terug in GCal.
+    """
+    stats = {"updated": 0, "deleted": 0, "skipped": 0, "kept": 0}
+    by_gcal_id = {item["id"]: item for item in items if item.get("id")}
+    # children eerst: een geannuleerd event met geannuleerde sessies kan dan mee weg
+    for table, spec in reversed(SYNC_TABLES.items()):
+        id_field = spec["id_field"]
+        index = fetch_gcal_index(conn, spec["snapshot_table"], id_field, by_gcal_id)
+        rows = fetch_rows(conn, table, id_field, [rid for rid, _ in index.values()])
+        # de children zijn al verwerkt: hun deletes uit deze pull tellen mee
+        in_use = fetch_ids_with_children(conn, table, [
+            rid for gcal_id, (rid, _) in index.items() if by_gcal_id[gcal_id].get("status") == "cancelled"])
+        cur = conn.cursor()
+        for gcal_id, (rid, snapshot_hash) in index.items():
+            item, row = by_gcal_id[gcal_id], rows.get(rid)
+            if row is None or not compare_content(row, snapshot_hash)[1]:
+                stats["skipped"] += 1
+                continue
+            try:
+                if item.get("status") == "cancelled":
+                    if rid in in_use:
+                        log_error(f"⚠️  {spec['label']} '{rid}' geannuleerd in Google Calendar maar heeft nog "
+                                  f"sessies: niet verwijderd", target=spec["target"])
+                        stats["kept"] += 1
+                        continue
+                    cur.execute(f"DELETE FROM {table} WHERE {id_field} = %s", (rid,))
+                    log_info(f"🗑️  {spec['label']} '{rid}' verwijderd in Google Calendar", target=spec["target"])
+                    stats["deleted"] += 1
+                    continue
+                changes = gcal_changes(table, row, item)
+                if not changes:
+                    stats["skipped"] += 1
+                    continue
+                assignments = ", ".join(f"{col} = %s" for col in changes)
+                cur.execute(f"UPDATE {table} SET {assignments} WHERE {id_field} = %s",
+                            list(changes.values()) + [rid])
+                log_info(f"⬇️  {spec['label']} '{rid}' bijgewerkt vanuit Google Calendar "
+                         f"({', '.join(changes)})", target=spec["target"])
+                stats["updated"] += 1
+            except mysql.connector.Error as e:
+                log_error(f"❌ {spec['label']} '{rid}' niet bijgewerkt vanuit GCal: {e}", target=spec["target"])
+        cur.close()
+    return stats
+
+def pull_gcal_changes(service, conn):
+    """
+    Incrementele pull met het opgeslagen syncToken. Een ongeldig token (410)
+    leidt tot een volledige, gepagineerde resync. Het nieuwe token wordt in
+    dezelfde transactie als de wijzigingen opgeslagen (de caller commit).
+    """
+    token = get_sync_state(conn, SYNC_TOKEN_STATE)
+    try:
+        items, next_token = list_gcal_changes(service, token)
+    except HttpError as e:
+        if token is None or e.resp.status != 410:
+            raise
+        log_info("♻️  syncToken verlopen, volledige resync vanuit Google Calendar", target="both")
+        items, next_token = list_gcal_changes(service, None)
+    stats = apply_gcal_changes(conn, items)
+    if next_token:
+        set_sync_state(conn, SYNC_TOKEN_STATE, next_token)
+    return stats
+
+# --- RECONCILE ---
+RECONCILE_WINDOWS = int(os.getenv("SYNC_RECONCILE_WINDOWS", 16))
+
+def reconcile_windows(conn, count=None):
+    """
+    Verdeelt de kalender in tijdvensters (timeMin, timeMax) die parallel
+    gelijst kunnen worden: `count` gelijke stukken over de datums in de DB,
+    plus een open venster ervoor en erna (None = onbegrensd).
+    """
+    count = max(1, count or RECONCILE_WINDOWS)
+    cur = conn.cursor()
+    cur.execute("SELECT MIN(start_date), MAX(end_date) FROM events")
+    first, last = cur.fetchone()
+    cur.close()
+    if first is None or last is None:
+        return [(None, None)]
+    last = max(first, last) + timedelta(days=1)
+    step = max(1, math.ceil((last - first).days / count))
+    bounds = [first + timedelta(days=step * i) for i in range(count) if first + timedelta(days=step * i) < last]
+    bounds = [None] + [f"{day.isoformat()}T00:00:00Z" for day in bounds + [last]] + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def _list_window(service, window):
+    time_min, time_max = window
+    filters = {}
+    if time_min:
+        filters["timeMin"] = time_min
+    if time_max:
+        filters["timeMax"] = time_max
+    items, _ = list_gcal_changes(service, None, **filters)
+    return items
+
+def fetch_gcal_calendar(service, windows):
+    """
+    Index {gcal_id: event} van de hele kalender; de vensters worden parallel
+    gepagineerd (pageToken). Events op een venstergrens komen twee keer voor
+    en worden ontdubbeld; geannuleerde events tellen niet mee.
+    """
+    index = {}
+    for items in run_gcal_batches(service, list(windows), _list_window):
+        for item in items:
+            if item.get("status") != "cancelled":
+                index[item["id"]] = item
+    return index
+
+def plan_reconcile(conn, index):
+    """
+    Vergelijkt de kalender-index met events/sessions en hun snapshots. Per tabel:
+      create   -> rij zonder (bestaand) GCal event: (row, "create", hash)
+      update   -> GCal wijkt af van de DB: (row, "update", hash)
+      snapshot -> enkel snapshot herstellen: (id, hash, gcal_id, row_hash)
+      link     -> gcal_id in de live rij rechtzetten: (id, gcal_id)
+      delete   -> snapshot zonder live rij: (id, gcal_id)
+    plus "orphans": GCal events waar niets in de DB naar verwijst.
+    """
+    plan = {"orphans": []}
+    referenced = set()
+    for table, spec in SYNC_TABLES.items():
+        id_field = spec["id_field"]
+        actions = plan[table] = {"create": [], "update": [], "snapshot": [], "link": [], "delete": []}
+        snapshots = fetch_snapshot_map(conn, spec["snapshot_table"], id_field)
+        live_ids = set()
+        for row in fetch_all(conn, table):
+            rid = row[id_field]
+            live_ids.add(rid)
+            snapshot = snapshots.get(rid)
+            gcal_id = row.get("gcal_id") or (snapshot[1] if snapshot else None)
+            content_hash = fingerprint(row)
+            item = index.get(gcal_id) if gcal_id else None
+            if item is None:
+                # zonder gcal_id: een create met gcal_id wordt een update van dat (verdwenen) event
+                actions["create"].append((dict(row, gcal_id=None), "create", content_hash))
+                continue
+            referenced.add(gcal_id)
+            if row.get("gcal_id") != gcal_id:
+                actions["link"].append((rid, gcal_id))
+            if gcal_changes(table, row, item):
+                actions["update"].append((dict(row, gcal_id=gcal_id), "update", content_hash))
+            elif snapshot is None or snapshot[0] != content_hash or snapshot[1] != gcal_id:
+                actions["snapshot"].append((rid, content_hash, gcal_id, row.get("row_hash")))
+        for sid, (_, gcal_id, _) in snapshots.items():
+            if sid not in live_ids:
+                actions["delete"].append((sid, gcal_id if gcal_id in index else None))
+                referenced.add(gcal_id)
+    plan["orphans"] = [gcal_id for gcal_id in index if gcal_id not in referenced]
+    return plan
+
+def apply_reconcile(service, conn, plan, delete_orphans=False):
+    """
+    Herstelt de verschillen met gebatchte (en parallelle) API calls. Er wordt
+    niets gepubliceerd: de DB-inhoud verandert niet, enkel GCal en de snapshots.
+    """
+    payloads = {"events": build_gcal_payload, "sessions": build_gcal_payload_session}
+    no_publish = lambda *args, **kwargs: None
+    writes = SyncWriteBuffer(conn)
+    stats = new_stats()
+    for table, spec in SYNC_TABLES.items():
+        actions, id_field = plan[table], spec["id_field"]
+        for rid, gcal_id in actions["link"]:
+            writes.mark_synced(table, id_field, rid, gcal_id)
+        for rid, content_hash, gcal_id, row_hash in actions["snapshot"]:
+            writes.update_snapshot(spec["snapshot_table"], id_field, rid, content_hash, gcal_id, row_hash)
+        push_changes(service, writes, table, actions["create"] + actions["update"], payloads[table], no_publish, stats)
+        push_deletes(service, writes, table, actions["delete"], no_publish, stats)
+    if delete_orphans and plan["orphans"]:
+        chunks = list(_chunks([(None, gcal_id) for gcal_id in plan["orphans"]], GCAL_BATCH_SIZE))
+        for results in run_gcal_batches(service, chunks, _gcal_deletes_batch):
+            for response, error in results.values():
+                if error is None or _is_gone(error):
+                    stats["deleted"] += 1
+                else:
+                    stats["failed"] += 1
+    writes.flush()
+    return stats
+
+def print_reconcile_report(plan, limit=10):
+    for table in SYNC_TABLES:
+        for action, items in plan[table].items():
+            if not items:
+                continue
+            ids = [item[0] if not isinstance(item[0], Mapping) else item[0][SYNC_TABLES[table]["id_field"]]
+                   for item in items[:limit]]
+            more = f" (+{len(items) - limit})" if len(items) > limit else ""
+            print(f"{table:<10} {action:<9} {len(items):>6}  {', '.join(map(str, ids))}{more}")
+    print(f"{'gcal':<10} {'orphans':<9} {len(plan['orphans']):>6}  {', '.join(plan['orphans'][:limit])}")
+
+def reconcile(service, conn, dry_run=False, windows=None, delete_orphans=False):
+    started = time.monotonic()
+    index = fetch_gcal_calendar(service, reconcile_windows(conn, windows))
+    plan = plan_reconcile(conn, index)
+    log_info(f"🔎 Reconcile: {len(index)} events in Google Calendar gelijst in "
+             f"{time.monotonic() - started:.1f}s", target="both")
+    print_reconcile_report(plan)
+    if dry_run:
+        return None
+    stats = apply_reconcile(service, conn, plan, delete_orphans)
+    log_info(f"🛠️  Reconcile klaar: {stats['changed']} hersteld, {stats['deleted']} verwijderd, "
+             f"{stats['failed']} mislukt", target="both")
+    return stats
+
+# --- SCHEDULER ---
+class AdaptiveScheduler:
+    """
+    Plant de sync-cycli aan een vaste rate: de volgende start wordt gerekend
+    vanaf de geplande start van de vorige cyclus, niet vanaf het einde ervan.
+    Het interval halveert zolang er wijzigingen binnenkomen, verdubbelt bij
+    stilte of quota-fouten en valt terug op de basis bij gewone fouten. Een
+    cyclus die volledig mislukt (bv. MySQL onbereikbaar) schuift de volgende
+    start exponentieel op, tot max_interval.
+    """
+
+    def __init__(self, base=None, min_interval=None, max_interval=None, clock=time.monotonic):
+        self.base = base or SYNC_INTERVAL
+        self.min_interval = min_interval or SYNC_MIN_INTERVAL
+        self.max_interval = max_interval or SYNC_MAX_INTERVAL
+        self.clock = clock
+        self.interval = self.base
+        self.next_run = clock()
+        self.last_duration = 0.0
+        self.lag = 0.0
+        self.overruns = 0
+        self.failures = 0
+        self._scheduled = self.next_run
+        self._started = self.next_run
+
+    def time_until_next(self):
+        return max(0.0, self.next_run - self.clock())
+
+    def wait(self):
+        time.sleep(self.time_until_next())
+
+    def start_cycle(self):
+        now = self.clock()
+        # lag: hoeveel later dan gepland; vroeger (outbox) telt niet
+        self.lag = max(0.0, now - self.next_run)
+        self._scheduled = min(now, self.next_run)
+        self._started = now
+
+    def end_cycle(self, stats, crashed=False):
+        """Past het interval aan; geeft True terug als de cyclus zijn budget overschreed."""
+        end = self.clock()
+        self.last_duration = end - self._started
+
+        if crashed:
+            # niet meteen opnieuw: base, 2x base, 4x base, ... tot max_interval
+            self.failures += 1
+            self.next_run = end + min(self.max_interval, self.base * 2 ** (self.failures - 1))
+            return False
+        self.failures = 0
+
+        if stats.get("quota_errors"):
+            self.interval = min(self.max_interval, self.interval * 2)
+        elif stats.get("failed"):
+            self.interval = min(self.interval, self.base)
+        elif stats.get("changed") or stats.get("deleted") or stats.get("held"):
+            # vastgehouden rijen moeten snel na hun stilteperiode opnieuw aan bod komen
+            self.interval = max(self.min_interval, self.interval / 2)
+        else:
+            self.interval = min(self.max_interval, self.interval * 2)
+
+        next_run = self._scheduled + self.interval
+        overrun = next_run < end
+        if overrun:
+            # Niet inhalen met een reeks cycli; gewoon meteen verder
+            self.overruns += 1
+            next_run = end
+        self.next_run = next_run
+        return overrun
+
+    def metrics(self):
+        return {
+            "interval": round(self.interval, 3),
+            "last_duration": round(self.last_duration, 3),
+            "lag": round(self.lag, 3),
+            "overruns": self.overruns
+        }
+
 # --- MAIN LOOP ---
+def _watermark_keys(table, shard=None):
+    if shard is None:
+        return [f"watermark:{table}"]
+    return [f"watermark:{table}:{n}" for n in shard.owned]
+
+def read_watermark(conn, table, shard=None):
+    """
+    Watermark van de tabel; bij sharding de oudste over de eigen shards, of
+    None (volledige pass) zodra één shard er nog geen heeft (bv. net overgenomen).
+    """
+    values = [get_sync_state(conn, key) for key in _watermark_keys(table, shard)]
+    if not values or None in values:
+        return None
+    return min(values)
+
+def run_sync_cycle(service, conn, full=False, shard=None, sweep=False):
+    """
+    Eén synchronisatiecyclus. De watermark wordt vóór het lezen vastgelegd
+    (DB-klok), zodat wijzigingen tijdens de cyclus de volgende keer meekomen.
+    Alle snapshot/synced writes en de watermarks gaan in één transactie; de
+    commit sluit ook de leestransactie af zodat de volgende cyclus verse data ziet.
+    Vooraf worden wijzigingen uit Google Calendar binnengehaald (SYNC_PULL);
+    bij sharding enkel door de leader.
+    Buiten een sweep worden enkel rijen binnen het sync-venster bekeken.
+    """
+    cycle_start = db_now(conn)
+    horizon = None if sweep or SYNC_HORIZON_DAYS < 0 else SYNC_HORIZON_DAYS
+    if SYNC_PULL and (shard is None or shard.leader):
+        try:
+            pulled = pull_gcal_changes(service, conn)
+            if pulled["updated"] or pulled["deleted"] or pulled["kept"]:
+                log_info(f"⬇️  Pull uit Google Calendar: {pulled['updated']} bijgewerkt, "
+                         f"{pulled['deleted']} verwijderd, {pulled['kept']} behouden", target="both")
+        except Exception as e:
+            log_error(f"⚠️  Pull uit Google Calendar mislukt: {e}", target="both")
+            _rollback_quietly(conn)
+    writes = SyncWriteBuffer(conn)
+    totals = new_stats()
+    for table, sync_fn in (("events", sync_events), ("sessions", sync_sessions)):
+        since = None
+        if SYNC_INCREMENTAL and not full and not sweep:
+            since = read_watermark(conn, table, shard)
+        stats = sync_fn(service, conn, since=since, writes=writes, shard=shard, horizon=horizon)
+        for key in totals:
+            totals[key] += stats.get(key, 0)
+        for key in _watermark_keys(table, shard):
+            set_sync_state(conn, key, str(cycle_start))
+    writes.flush()
+    return totals
+
 def main_loop():
     log_info("🌀 Synchronisator gestart...", target="both")
     service = get_gcal_service()
+    scheduler = AdaptiveScheduler()
+    coordinator = ShardCoordinator() if SYNC_SHARDS > 1 else None
+    last_full = None
+    last_sweep = None
+    last_head = None
 
     while True:
+        conn = None
+        crashed = False
+        stats = new_stats()
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
-            log_info("✅ Verbonden met DB", target="both")
+            conn = get_db_connection()
+
+            shard = None
+            timeout = scheduler.time_until_next()
+            if coordinator is not None:
+                shard = coordinator.rebalance(conn)
+                # wakker blijven voor de heartbeat, ook als er niets te doen is
+                timeout = min(timeout, SYNC_HEARTBEAT)
+
+            head = None
+            if SYNC_OUTBOX:
+                head = wait_for_outbox(conn, timeout, after=last_head)
+            else:
+                time.sleep(timeout)
+            # na een mislukte cyclus wacht ook een gevulde outbox op de backoff
+            if (head is None or scheduler.failures) and scheduler.time_until_next() > 0:
+                continue
 
-            sync_events(service, conn)
-            sync_sessions(service, conn)
+            scheduler.start_cycle()
+            now = time.monotonic()
+            # zeldzame sweep zonder sync-venster voor het verleden
+            sweep = last_sweep is None or now - last_sweep >= SYNC_SWEEP_INTERVAL
+            full = sweep or last_full is None or now - last_full >= FULL_SYNC_INTERVAL
+            stats = run_sync_cycle(service, conn, full=full, shard=shard, sweep=sweep)
+            if full:
+                last_full = now
+            if sweep:
+                last_sweep = now
 
-            conn.close()
+            if head is not None:
+                last_head = head
+                if coordinator is None:
+                    drain_outbox(conn, head)
+                else:
+                    # enkel opruimen wat alle workers gezien hebben
+                    coordinator.processed_head = head
+                    if coordinator.leader:
+                        drain_outbox(conn, coordinator.drainable_head(conn))
+                        coordinator.prune(conn)
         except Exception as e:
             log_error(f"❗ Fout bij verbinding of synchronisatie: {e}", target="both")
+            if conn is not None:
+                _rollback_quietly(conn)
+            stats["failed"] += 1
+            crashed = True
+
+        if scheduler.end_cycle(stats, crashed=crashed):
+            log_error(f"⏱️  Cyclus duurde {scheduler.last_duration:.2f}s, langer dan het "
+                      f"interval van {scheduler.interval:.2f}s (lag {scheduler.lag:.2f}s)", target="both")
+        try:
+            if conn is not None:
+                suffix = "" if coordinator is None else f":{coordinator.worker_id}"
+                set_sync_state(conn, f"metrics:scheduler{suffix}", json.dumps(scheduler.metrics()))
+                set_sync_state(conn, f"metrics:gcal_quota{suffix}", json.dumps(_gcal_quota.usage()))
+                conn.commit()
+        except Exception:
+            _rollback_quietly(conn)
+        if crashed:
+            scheduler.wait()
 
-        time.sleep(5)
+# --- CLI ---
+def print_failures(conn):
+    rows = list_failures(conn)
+    if not rows:
+        print("✅ Geen openstaande sync-fouten")
+        return
+    for row in rows:
+        print(f"{row['table_name']:<10} {row['row_id']:<40} poging {row['attempts']:<3} "
+              f"volgende: {row['next_attempt_at']}  {row['last_error']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synchronisatie van events/sessies met Google Calendar")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("run", help="start de synchronisatielus (standaard)")
+    failures = commands.add_parser("failures", help="beheer van de retry-wachtrij")
+    failure_commands = failures.add_subparsers(dest="action", required=True)
+    failure_commands.add_parser("list", help="toon rijen die wachten op een nieuwe poging")
+    retry = failure_commands.add_parser("retry", help="probeer rijen bij de volgende cyclus opnieuw")
+    retry.add_argument("--all", action="store_true", help="alle rijen in de wachtrij")
+    retry.add_argument("table", nargs="?", choices=sorted(SYNC_TABLES))
+    retry.add_argument("row_id", nargs="?")
+    reconcile_cmd = commands.add_parser("reconcile", help="volledige vergelijking met Google Calendar en herstel")
+    reconcile_cmd.add_argument("--dry-run", action="store_true", help="enkel rapporteren, niets herstellen")
+    reconcile_cmd.add_argument("--windows", type=int, help="aantal tijdvensters om parallel te lijsten")
+    reconcile_cmd.add_argument("--workers", type=int, help="aantal parallelle GCal workers (standaard SYNC_WORKERS)")
+    reconcile_cmd.add_argument("--delete-orphans", action="store_true",
+                               help="GCal events zonder rij in de DB verwijderen")
+    args = parser.parse_args(argv)
+
+    if args.command in (None, "run"):
+        main_loop()
+        return
+
+    conn = get_db_connection()
+    if args.command == "reconcile":
+        global SYNC_WORKERS
+        if args.workers:
+            SYNC_WORKERS = args.workers
+        reconcile(get_gcal_service(), conn, args.dry_run, args.windows, args.delete_orphans)
+    elif args.action == "list":
+        print_failures(conn)
+    else:
+        if not args.all and args.table is None:
+            parser.error("geef --all of een tabel (en eventueel row_id) op")
+        count = retry_failures(conn, None if args.all else args.table, args.row_id)
+        print(f"🔁 {count} rij(en) worden bij de volgende cyclus opnieuw geprobeerd")
 
 if __name__ == '__main__':
-    main_loop()
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark: per-rij writes (oude pad) vs. gebufferde bulk writes van de synchronizer.
+
+Draait tegen een echte MySQL (zelfde env vars als sync.py) op TEMPORARY tabellen,
+dus de echte events/snapshots worden niet aangeraakt.
+
+    PYTHONPATH=$(pwd) python planning/tests/benchmark/bench_sync_writes.py --rows 2000
+
+Met --count is geen MySQL nodig: dan telt een nep-connectie enkel de
+statements en commits (round trips) per pad i.p.v. de doorvoer te meten.
+"""
+import argparse
+import time
+
+import mysql.connector
+
+import planning.synchronizer.sync as sync
+
+EVENTS = "bench_events"
+SNAPSHOTS = "bench_event_snapshots"
+
+
+def setup_tables(conn, rows):
+    cur = conn.cursor()
+    cur.execute(f"DROP TEMPORARY TABLE IF EXISTS {EVENTS}")
+    cur.execute(f"DROP TEMPORARY TABLE IF EXISTS {SNAPSHOTS}")
+    cur.execute(f"CREATE TEMPORARY TABLE {EVENTS} LIKE events")
+    cur.execute(f"CREATE TEMPORARY TABLE {SNAPSHOTS} LIKE event_snapshots")
+    cur.executemany(
+        f"INSERT INTO {EVENTS} (event_id, uid, title) VALUES (%s, %s, %s)",
+        [(f"BENCH{i}", f"BENCH{i}", f"Bench event {i}") for i in range(rows)]
+    )
+    conn.commit()
+    cur.close()
+
+
+def per_row(conn, rows):
+    # Oude pad: mark_synced + update_snapshot, elk met een eigen commit
+    for i in range(rows):
+        sync.mark_synced(conn, EVENTS, "event_id", f"BENCH{i}", f"G{i}")
+        conn.commit()
+        sync.update_snapshot(conn, SNAPSHOTS, "event_id", f"BENCH{i}", f"h{i}", f"G{i}")
+        conn.commit()
+
+
+def buffered(conn, rows):
+    writes = sync.SyncWriteBuffer(conn, flush_rows=rows * 2)
+    for i in range(rows):
+        writes.mark_synced(EVENTS, "event_id", f"BENCH{i}", f"G{i}")
+        writes.update_snapshot(SNAPSHOTS, "event_id", f"BENCH{i}", f"h{i}", f"G{i}")
+    writes.flush()
+
+
+class CountingCursor:
+    def __init__(self, counts):
+        self.counts = counts
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        self.counts["statements"] += 1
+
+    def executemany(self, sql, rows):
+        self.counts["statements"] += 1
+
+    def fetchone(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class CountingConnection:
+    """Nep-connectie die round trips telt (statements + commits)."""
+
+    def __init__(self):
+        self.counts = {"statements": 0, "commits": 0}
+
+    def cursor(self, *args, **kwargs):
+        return CountingCursor(self.counts)
+
+    def commit(self):
+        self.counts["commits"] += 1
+
+    def rollback(self):
+        pass
+
+
+def count(label, fn, rows):
+    conn = CountingConnection()
+    fn(conn, rows)
+    counts = conn.counts
+    print(f"{label:<10} {rows} rijen  ->  {counts['statements']} statements, {counts['commits']} commits "
+          f"({counts['statements'] + counts['commits']} round trips)")
+
+
+def run(label, fn, conn, rows):
+    setup_tables(conn, rows)
+    start = time.perf_counter()
+    fn(conn, rows)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {rows} rijen in {elapsed:.3f}s  ->  {rows / elapsed:,.0f} rijen/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--count", action="store_true", help="enkel round trips tellen, zonder MySQL")
+    args = parser.parse_args()
+
+    if args.count:
+        count("per-rij", per_row, args.rows)
+        count("bulk", buffered, args.rows)
+        return
+
+    conn = mysql.connector.connect(**sync.DB_CONFIG)
+    try:
+        run("per-rij", per_row, conn, args.rows)
+        run("bulk", buffered, conn, args.rows)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark: XML-opbouw met ElementTree (oude pad) vs. de voorgecompileerde
+template serializers van de producer, in berichten per seconde.
+
+Heeft geen broker of database nodig.
+
+    PYTHONPATH=$(pwd) python planning/tests/benchmark/bench_xml_serializers.py --messages 50000
+"""
+import argparse
+import time
+
+from planning.producer.producer import _event_to_xml, _session_to_xml
+from planning.tests.unit.test_producer import etree_event_to_xml, etree_session_to_xml
+
+EVENT = {
+    "event_id": "EVT123", "title": "Test Event & co", "description": "Beschrijving <met> tekens",
+    "location": "Room A", "start_date": "2025-01-01", "end_date": "2025-01-01",
+    "start_time": "10:00", "end_time": "12:00", "organizer_name": "Alice",
+    "organizer_uid": "USR1", "entrance_fee": "10.00", "gcal_id": "GC123"
+}
+
+SESSION = {
+    "session_id": "SES123", "event_id": "EVT123", "title": "Session Title",
+    "description": "Session Desc", "date": "2025-01-02", "start_time": "14:00",
+    "end_time": "15:00", "location": "Room B", "max_attendees": 25, "gcal_id": "GC456",
+    "speaker_first_name": "John", "speaker_name": "Doe", "speaker_bio": "Speaker bio"
+}
+
+
+def run(label, fn, data, messages):
+    start = time.perf_counter()
+    for _ in range(messages):
+        fn(data, "update")
+    elapsed = time.perf_counter() - start
+    rate = messages / elapsed
+    print(f"{label:<20} {messages} berichten in {elapsed:.3f}s  ->  {rate:,.0f} berichten/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+
+    assert _event_to_xml(EVENT, "update") == etree_event_to_xml(EVENT, "update")
+    assert _session_to_xml(SESSION, "update") == etree_session_to_xml(SESSION, "update")
+
+    for kind, data, old, new in (("event", EVENT, etree_event_to_xml, _event_to_xml),
+                                 ("session", SESSION, etree_session_to_xml, _session_to_xml)):
+        before = run(f"{kind} ElementTree", old, data, args.messages)
+        after = run(f"{kind} template", new, data, args.messages)
+        print(f"{kind:<20} {after / before:.1f}x sneller")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import threading
+import httplib2
+import pytest
+from unittest.mock import patch, MagicMock
+from googleapiclient.errors import HttpError
+import planning.gcal.client as client
+import planning.gcal.quota as quota
+
+def test_discovery_document_is_vendored_and_read_once():
+    with patch.object(client, "_document", None), \
+         patch("builtins.open", wraps=open) as mock_open:
+        doc = client.discovery_document()
+        assert client.discovery_document() is doc
+    assert mock_open.call_count == 1
+    assert '"calendar"' in doc and '"events"' in doc
+
+@patch("planning.gcal.client.service_account.Credentials.from_service_account_file")
+def test_credentials_are_cached_per_file(mock_from_file):
+    with patch.object(client, "_credentials", {}):
+        first = client.get_credentials("sa.json")
+        assert client.get_credentials("sa.json") is first
+        client.get_credentials("other.json")
+    assert mock_from_file.call_count == 2
+
+def test_build_service_uses_static_document_without_network():
+    service = client.build_service(MagicMock(universe_domain="googleapis.com"))
+    request = service.events().list(calendarId="primary")
+    assert request.uri.startswith("https://www.googleapis.com/calendar/v3/calendars/primary/events")
+
+@patch("planning.gcal.client.build_service", side_effect=lambda creds: MagicMock())
+@patch("planning.gcal.client.get_credentials", return_value=MagicMock())
+def test_get_service_is_cached_per_thread(mock_creds, mock_build):
+    main = client.get_service()
+    assert client.get_service() is main
+    other = []
+    thread = threading.Thread(target=lambda: other.append(client.get_service()))
+    thread.start()
+    thread.join()
+    assert other[0] is not main
+    assert mock_build.call_count == 2
+
+# ---------------------------
+# Quota manager
+# ---------------------------
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+        self.waits = []
+    def __call__(self):
+        return self.now
+    def sleep(self, seconds):
+        self.waits.append(seconds)
+        self.now += seconds
+
+def quota_error(status=429, headers=None, reason="rateLimitExceeded"):
+    resp = httplib2.Response({"status": status, **(headers or {})})
+    return HttpError(resp, f'{{"error": {{"errors": [{{"reason": "{reason}"}}]}}}}'.encode())
+
+def test_token_bucket_waits_when_empty():
+    clock = FakeClock()
+    bucket = quota.TokenBucket(rate=10, capacity=5, clock=clock, sleep=clock.sleep)
+    bucket.acquire(5)
+    assert clock.waits == []
+    bucket.acquire(2)
+    assert clock.waits == [pytest.approx(0.2)]
+
+def test_token_bucket_disabled_with_zero_rate():
+    bucket = quota.TokenBucket(rate=0, capacity=1, sleep=lambda s: pytest.fail("should not sleep"))
+    bucket.acquire(100)
+
+def test_pause_blocks_every_caller_until_it_expires():
+    clock = FakeClock()
+    bucket = quota.TokenBucket(rate=0, capacity=1, clock=clock, sleep=clock.sleep)
+    bucket.pause(7)
+    bucket.acquire()
+    assert clock.waits == [7]
+    usage = bucket.usage()
+    assert usage["throttled"] == 1 and usage["granted"] == 1
+    assert usage["waits"] == 1 and usage["waited_seconds"] == 7
+
+def test_retry_after_reads_seconds_and_http_dates():
+    assert quota.retry_after(quota_error(headers={"Retry-After": "12"})) == 12
+    assert quota.retry_after(quota_error(headers={"retry-after": "Thu, 01 Jan 2099 00:00:00 GMT"})) > 0
+    assert quota.retry_after(quota_error()) is None
+    assert quota.retry_after(Exception("boom")) is None
+
+def test_backoff_delay_grows_and_is_capped():
+    with patch.object(quota.random, "uniform", return_value=0):
+        assert [quota.backoff_delay(n, base=1, cap=5) for n in (1, 2, 3, 4)] == [1, 2, 4, 5]
+
+def test_execute_honours_retry_after_then_succeeds():
+    clock = FakeClock()
+    bucket = quota.TokenBucket(rate=0, capacity=1, clock=clock, sleep=clock.sleep)
+    manager = quota.QuotaManager(bucket, retries=3)
+    request = MagicMock()
+    request.execute.side_effect = [quota_error(headers={"Retry-After": "3"}), {"id": "G1"}]
+    assert manager.execute(request) == {"id": "G1"}
+    assert clock.waits == [3]
+
+def test_execute_gives_up_after_retries_and_ignores_other_errors():
+    clock = FakeClock()
+    manager = quota.QuotaManager(quota.TokenBucket(0, 1, clock=clock, sleep=clock.sleep), retries=1)
+    request = MagicMock()
+    request.execute.side_effect = quota_error(status=403)
+    with patch.object(quota.random, "uniform", return_value=0), pytest.raises(HttpError):
+        manager.execute(request)
+    assert request.execute.call_count == 2
+
+    request.execute.side_effect = HttpError(MagicMock(status=404), b"")
+    with pytest.raises(HttpError):
+        manager.execute(request)
+    assert request.execute.call_count == 3
+
+def test_shared_bucket_is_shared_through_the_file(tmp_path):
+    path = str(tmp_path / "quota.json")
+    clock = FakeClock(1000.0)
+    first = quota.SharedTokenBucket(path, rate=1, capacity=2, clock=clock, sleep=clock.sleep)
+    second = quota.SharedTokenBucket(path, rate=1, capacity=2, clock=clock, sleep=clock.sleep)
+    first.acquire(2)
+    second.acquire(1)
+    assert clock.waits == [pytest.approx(1)]
+    first.pause(5)
+    assert second.usage()["blocked_for"] == 5
+    assert second.usage()["granted"] == 3
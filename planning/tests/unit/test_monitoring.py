@@ -0,0 +1,70 @@
+import threading
+import xml.etree.ElementTree as ET
+from unittest.mock import MagicMock
+
+from planning.monitoring.shipper import LogShipper, send_monitoring_log
+
+def make_connect():
+    conn = MagicMock(is_open=True)
+    conn.channel.return_value = MagicMock(is_closed=False)
+    return MagicMock(return_value=conn), conn.channel.return_value
+
+def test_logs_are_batched_over_one_connection():
+    connect, channel = make_connect()
+    shipper = LogShipper(connect=connect, batch_size=10, flush_interval=0.01)
+    for i in range(25):
+        assert shipper.submit(f"regel {i}", sender="sync-service")
+    assert shipper.flush(2)
+    shipper.close(1)
+
+    connect.assert_called_once()
+    bodies = [ET.fromstring(c.kwargs["body"]) for c in channel.basic_publish.call_args_list]
+    assert [b.find("message").text for b in bodies] == [f"regel {i}" for i in range(25)]
+    assert bodies[0].find("sender").text == "sync-service"
+    assert {c.kwargs["routing_key"] for c in channel.basic_publish.call_args_list} == {"monitoring.log"}
+    assert shipper.stats()["sent"] == 25
+
+def test_level_filter_and_debug_sampling():
+    shipper = LogShipper(connect=MagicMock(), min_level="debug", debug_sample=0.5,
+                         sample=iter([0.9, 0.1]).__next__)
+    assert not shipper.submit("ruis", level="debug")
+    assert shipper.submit("sample", level="debug")
+    strict = LogShipper(connect=MagicMock(), min_level="error")
+    assert not strict.submit("info", level="info")
+    assert strict.stats()["filtered"] == 1
+    assert shipper.stats()["sampled_out"] == 1
+
+def test_full_buffer_drops_oldest_and_reports_it():
+    connect, channel = make_connect()
+    release = threading.Event()
+    connect.side_effect = lambda: release.wait(2) and connect.return_value
+    shipper = LogShipper(connect=connect, capacity=3, batch_size=1, flush_interval=0.01)
+    shipper.submit("eerste")
+    for i in range(5):
+        shipper.submit(f"log {i}")
+    release.set()
+    shipper.flush(2)
+    shipper.close(1)
+
+    messages = [ET.fromstring(c.kwargs["body"]).find("message").text for c in channel.basic_publish.call_args_list]
+    assert shipper.stats()["dropped"] >= 2
+    assert messages[-1] == "log 4"
+    assert any("gedropt" in m for m in messages)
+
+def test_failed_send_reconnects_next_batch():
+    connect, channel = make_connect()
+    channel.basic_publish.side_effect = [RuntimeError("weg"), None]
+    shipper = LogShipper(connect=connect, batch_size=1, flush_interval=0.01)
+    shipper.submit("a")
+    shipper.flush(2)
+    shipper.submit("b")
+    shipper.flush(2)
+    shipper.close(1)
+    assert connect.call_count == 2
+    assert shipper.stats()["failed"] == 1 and shipper.stats()["sent"] == 1
+
+def test_send_monitoring_log_is_skipped_under_pytest():
+    from planning.monitoring import shipper as module
+    module._shipper = None
+    send_monitoring_log("niet verzenden")
+    assert module._shipper is None
@@ -1,8 +1,14 @@
+import asyncio
+import pika
 import pytest
+import time
 import xml.etree.ElementTree as ET
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
 
+import planning.producer.producer as producer
+import planning.producer.async_producer as async_producer
 from planning.producer.producer import (
+    Publisher,
     _event_to_xml,
     _session_to_xml,
     publish_event,
@@ -140,3 +146,368 @@ def test_publish_session_delete_triggers_publish(mock_pub):
     assert b"<session>" in args[0]
     assert b"<uid>SES999</uid>" in args[0]
     assert args[1] == "session.delete"
+
+# ---------------------------
+# Persistent publisher
+# ---------------------------
+
+def make_connection():
+    conn = MagicMock(is_closed=False, is_open=True)
+    conn.channel.side_effect = lambda: MagicMock(is_closed=False)
+    return conn
+
+def test_publisher_reuses_connection_and_confirm_channel():
+    conn = make_connection()
+    connect = MagicMock(return_value=conn)
+    publisher = Publisher(connect=connect)
+    publisher.publish("event", "event.create", b"<a/>")
+    publisher.publish("event", "event.update", b"<b/>")
+    connect.assert_called_once()
+    conn.channel.assert_called_once()
+    ch = publisher._confirm_channel
+    ch.confirm_delivery.assert_called_once()
+    assert [c.kwargs["routing_key"] for c in ch.basic_publish.call_args_list] == ["event.create", "event.update"]
+
+def test_publisher_reconnects_once_after_lost_connection():
+    broken, fresh = make_connection(), make_connection()
+    connect = MagicMock(side_effect=[broken, fresh])
+    publisher = Publisher(connect=connect)
+    publisher.publish("event", "event.create", b"<a/>")
+    broken.process_data_events.side_effect = pika.exceptions.StreamLostError("weg")
+    publisher.publish("event", "event.update", b"<b/>")
+    assert connect.call_count == 2
+    broken.close.assert_called_once()
+    assert publisher._confirm_channel.basic_publish.call_args.kwargs["routing_key"] == "event.update"
+
+def test_publisher_raises_nack_without_retry():
+    conn = make_connection()
+    connect = MagicMock(return_value=conn)
+    publisher = Publisher(connect=connect)
+    publisher.publish("event", "event.create", b"<a/>")
+    publisher._confirm_channel.basic_publish.side_effect = pika.exceptions.NackError([])
+    with pytest.raises(pika.exceptions.NackError):
+        publisher.publish("event", "event.create", b"<a/>")
+    connect.assert_called_once()
+
+def wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "voorwaarde niet bereikt"
+        time.sleep(0.005)
+
+def test_publisher_pumps_heartbeats_while_idle():
+    conn = make_connection()
+    publisher = Publisher(connect=MagicMock(return_value=conn), keepalive=0.01)
+    publisher.publish("event", "event.create", b"<a/>")
+    wait_until(lambda: conn.process_data_events.call_count >= 3)
+    conn.process_data_events.assert_called_with(time_limit=0)
+    publisher.close()
+    wait_until(lambda: publisher._keepalive_thread is None)
+
+def test_publisher_publishes_after_connection_went_stale():
+    stale, fresh = make_connection(), make_connection()
+    connect = MagicMock(side_effect=[stale, fresh])
+    publisher = Publisher(connect=connect, keepalive=0.01)
+    publisher.publish("event", "event.create", b"<a/>")
+    # de broker sluit de verbinding tijdens een stille periode
+    stale.process_data_events.side_effect = pika.exceptions.StreamLostError("weg")
+    wait_until(lambda: publisher._conn is None)
+    stale.close.assert_called_once()
+    publisher.publish("event", "event.update", b"<b/>")
+    assert connect.call_count == 2
+    assert publisher._confirm_channel.basic_publish.call_args.kwargs["routing_key"] == "event.update"
+    publisher.close()
+
+# ---------------------------
+# Batch publishing
+# ---------------------------
+
+def confirm_frame(method_cls, tag, multiple=False):
+    return MagicMock(method=method_cls(delivery_tag=tag, multiple=multiple))
+
+def make_batch_connection(frames):
+    """Connectie waarvan het batch-kanaal na de publishes `frames` als confirms aflevert."""
+    conn = make_connection()
+    publisher = Publisher(connect=MagicMock(return_value=conn))
+    batch_ch = MagicMock(is_closed=False)
+    batch_ch._impl.confirm_delivery.side_effect = \
+        lambda ack_nack_callback, callback: callback(MagicMock())
+    conn.channel.side_effect = [batch_ch]
+
+    def deliver(time_limit=None):
+        while frames and batch_ch._impl.basic_publish.call_count:
+            publisher._on_confirm(frames.pop(0))
+    conn.process_data_events.side_effect = deliver
+    return publisher, batch_ch
+
+def test_publish_batch_pipelines_and_tracks_delivery_tags():
+    frames = [confirm_frame(pika.spec.Basic.Ack, 2, multiple=True), confirm_frame(pika.spec.Basic.Nack, 3)]
+    publisher, batch_ch = make_batch_connection(frames)
+    errors = publisher.publish_batch([("event", "event.create", b"<%d/>" % i) for i in range(3)])
+    assert batch_ch._impl.basic_publish.call_count == 3
+    assert errors[:2] == [None, None]
+    assert isinstance(errors[2], pika.exceptions.NackError)
+
+def test_publish_batch_reconnects_once_when_connection_went_stale():
+    stale = make_connection()
+    stale.process_data_events.side_effect = pika.exceptions.StreamLostError("weg")
+    publisher, batch_ch = make_batch_connection([confirm_frame(pika.spec.Basic.Ack, 1)])
+    fresh = publisher._connect.return_value
+    publisher._connect = MagicMock(side_effect=[stale, fresh])
+    publisher.keepalive = 0
+    publisher.publish("event", "event.create", b"<a/>")
+    errors = publisher.publish_batch([("event", "event.create", b"<b/>")])
+    assert errors == [None]
+    assert publisher._connect.call_count == 2
+    stale.close.assert_called_once()
+    batch_ch._impl.basic_publish.assert_called_once()
+
+def test_publish_batch_times_out_unconfirmed_messages():
+    publisher, _ = make_batch_connection([confirm_frame(pika.spec.Basic.Ack, 1)])
+    with patch.object(producer, "PUBLISH_CONFIRM_TIMEOUT", 0.01):
+        errors = publisher.publish_batch([("event", "event.create", b"<a/>"), ("event", "event.create", b"<b/>")])
+    assert errors[0] is None and isinstance(errors[1], TimeoutError)
+
+def test_publish_events_batch_reports_per_item(example_event):
+    publisher = MagicMock()
+    publisher.publish_batch.side_effect = lambda messages: [None] * len(messages)
+    with patch.object(producer, "_publisher", publisher):
+        errors = producer.publish_events_batch([(example_event, "create"), ({"title": "No ID"}, "create"),
+                                                ({"event_id": "EVT9"}, "delete")])
+    assert errors[0] is None and errors[2] is None
+    assert isinstance(errors[1], KeyError)
+    messages = publisher.publish_batch.call_args.args[0]
+    assert [(exchange, key) for exchange, key, _ in messages] == [("event", "event.create"), ("event", "event.delete")]
+
+# ---------------------------
+# Golden tests: template serializers == ElementTree
+# ---------------------------
+
+# Referentie: de vroegere ElementTree-opbouw, byte voor byte na te bootsen
+def etree_event_to_xml(data: dict, operation: str) -> bytes:
+    root = ET.Element("attendify", {
+        "xmlns:xsi": "http://www.w3.org/2001/XMLSchema-instance",
+        "xsi:noNamespaceSchemaLocation": "event.xsd"
+    })
+
+    info = ET.SubElement(root, "info")
+    ET.SubElement(info, "sender").text = "planning"
+    ET.SubElement(info, "operation").text = operation
+
+    e = ET.SubElement(root, "event")
+    ET.SubElement(e, "uid").text = data["event_id"]
+
+    if operation != "delete":
+        ET.SubElement(e, "gcid").text = data.get("gcal_id", "")
+        ET.SubElement(e, "title").text = data["title"]
+        ET.SubElement(e, "description").text = data.get("description", "")
+        ET.SubElement(e, "location").text = data.get("location", "")
+        ET.SubElement(e, "start_date").text = str(data["start_date"])
+        ET.SubElement(e, "end_date").text = str(data["end_date"])
+        ET.SubElement(e, "start_time").text = str(data["start_time"])
+        ET.SubElement(e, "end_time").text = str(data["end_time"])
+        ET.SubElement(e, "organizer_name").text = data.get("organizer_name", "")
+        ET.SubElement(e, "organizer_uid").text = data.get("organizer_uid", "")
+        ET.SubElement(e, "entrance_fee").text = str(data.get("entrance_fee", "0.00"))
+
+    return ET.tostring(root, encoding="utf-8")
+
+def etree_session_to_xml(data: dict, operation: str) -> bytes:
+    root = ET.Element("attendify", {
+        "xmlns:xsi": "http://www.w3.org/2001/XMLSchema-instance",
+        "xsi:noNamespaceSchemaLocation": "session.xsd"
+    })
+
+    info = ET.SubElement(root, "info")
+    ET.SubElement(info, "sender").text = "planning"
+    ET.SubElement(info, "operation").text = operation
+
+    s = ET.SubElement(root, "session")
+    ET.SubElement(s, "uid").text = data["session_id"]
+
+    if operation != "delete":
+        ET.SubElement(s, "event_id").text = data["event_id"]
+        ET.SubElement(s, "title").text = data["title"]
+        ET.SubElement(s, "description").text = data.get("description", "")
+        ET.SubElement(s, "date").text = str(data["date"])
+        ET.SubElement(s, "start_time").text = str(data["start_time"])
+        ET.SubElement(s, "end_time").text = str(data["end_time"])
+        ET.SubElement(s, "location").text = data.get("location", "")
+        ET.SubElement(s, "max_attendees").text = str(data.get("max_attendees", 0))
+        ET.SubElement(s, "gcid").text = data.get("gcal_id", "")
+
+        speaker = ET.SubElement(s, "speaker")
+        ET.SubElement(speaker, "name").text = f"{data.get('speaker_first_name','')} {data.get('speaker_name','')}".strip()
+        ET.SubElement(speaker, "bio").text = data.get("speaker_bio", "")
+
+    return ET.tostring(root, encoding="utf-8")
+
+GOLDEN_EVENT = (
+    b'<attendify xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:noNamespaceSchemaLocation="event.xsd">'
+    b'<info><sender>planning</sender><operation>create</operation></info><event><uid>EVT123</uid>'
+    b'<gcid>GC123</gcid><title>Test Event</title><description>Description</description><location>Room A</location>'
+    b'<start_date>2025-01-01</start_date><end_date>2025-01-01</end_date><start_time>10:00</start_time>'
+    b'<end_time>12:00</end_time><organizer_name>Alice</organizer_name><organizer_uid>USR1</organizer_uid>'
+    b'<entrance_fee>10.00</entrance_fee></event></attendify>'
+)
+
+TRICKY_VALUES = ["", None, "a & b <c> \"d\" 'e'", "tab\tnl\ncr\r", "é ü ✓ 😀", "\ud800", "]]>", 0, "0"]
+
+def test_event_serializer_matches_golden_output(example_event):
+    assert _event_to_xml(example_event, "create") == GOLDEN_EVENT
+    assert etree_event_to_xml(example_event, "create") == GOLDEN_EVENT
+
+@pytest.mark.parametrize("operation", ["create", "update", "delete"])
+def test_serializers_match_elementtree_for_examples(example_event, example_session, operation):
+    assert _event_to_xml(example_event, operation) == etree_event_to_xml(example_event, operation)
+    assert _session_to_xml(example_session, operation) == etree_session_to_xml(example_session, operation)
+
+@pytest.mark.parametrize("value", TRICKY_VALUES)
+def test_serializers_match_elementtree_for_tricky_values(example_event, example_session, value):
+    for field in ["title", "description", "location", "organizer_name", "gcal_id", "start_date"]:
+        data = {**example_event, field: value}
+        assert _event_to_xml(data, "update") == etree_event_to_xml(data, "update")
+    for field in ["title", "speaker_first_name", "speaker_name", "speaker_bio", "max_attendees"]:
+        data = {**example_session, field: value}
+        try:
+            expected = etree_session_to_xml(data, "create")
+        except Exception as e:
+            with pytest.raises(type(e)):
+                _session_to_xml(data, "create")
+        else:
+            assert _session_to_xml(data, "create") == expected
+
+def test_serializers_reject_non_text_like_elementtree(example_event):
+    data = {**example_event, "title": 5}
+    with pytest.raises(TypeError):
+        etree_event_to_xml(data, "create")
+    with pytest.raises(TypeError):
+        _event_to_xml(data, "create")
+
+# ---------------------------
+# Asyncio publisher
+# ---------------------------
+
+class FakeAsyncChannel:
+    """Kanaal dat na elke publish (later in de loop) de confirm uit `answers` aflevert."""
+    def __init__(self, publisher, answers):
+        self.publisher = publisher
+        self.answers = answers
+        self.published = []
+        self.is_open = True
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.published.append((exchange, routing_key, body))
+        tag = len(self.published)
+        method = self.answers.get(tag, pika.spec.Basic.Ack)
+        if method is not None:
+            frame = confirm_frame(method, tag)
+            asyncio.get_running_loop().call_soon(self.publisher._on_confirm, frame)
+
+def make_async_publisher(*answers):
+    """answers: per geopend kanaal een {tag: Ack/Nack/None}; standaard alles Ack."""
+    publisher = async_producer.AsyncPublisher()
+    opened = []
+    async def open_channel():
+        opened.append(FakeAsyncChannel(publisher, answers[len(opened)] if len(opened) < len(answers) else {}))
+        return opened[-1]
+    publisher._open_channel = open_channel
+    return publisher, opened
+
+def test_async_publisher_multiplexes_one_channel():
+    publisher, opened = make_async_publisher()
+    async def scenario():
+        await asyncio.gather(*(publisher.publish("event", "event.create", b"<%d/>" % i) for i in range(5)))
+    asyncio.run(scenario())
+    assert len(opened) == 1
+    assert len(opened[0].published) == 5
+
+def test_async_publish_raises_on_nack():
+    publisher, _ = make_async_publisher({1: pika.spec.Basic.Nack})
+    with pytest.raises(pika.exceptions.NackError):
+        asyncio.run(publisher.publish("event", "event.create", b"<a/>"))
+
+def test_async_batch_returns_per_item_results():
+    publisher, _ = make_async_publisher({2: pika.spec.Basic.Nack, 3: None})
+    with patch.object(async_producer, "PUBLISH_CONFIRM_TIMEOUT", 0.05):
+        errors = asyncio.run(publisher.publish_batch([("event", "event.create", b"<%d/>" % i) for i in range(3)]))
+    assert errors[0] is None
+    assert isinstance(errors[1], pika.exceptions.NackError)
+    assert isinstance(errors[2], TimeoutError)
+
+def test_async_closed_connection_fails_pending_and_reconnects():
+    publisher, opened = make_async_publisher({1: None})
+    async def scenario():
+        first = asyncio.ensure_future(publisher.publish("event", "event.create", b"<a/>"))
+        await asyncio.sleep(0)
+        opened[0].is_open = False
+        publisher._closed("verbinding weg")
+        with pytest.raises(pika.exceptions.AMQPConnectionError):
+            await first
+        await publisher.publish("event", "event.update", b"<b/>")
+    asyncio.run(scenario())
+    assert len(opened) == 2
+
+def test_async_batch_returns_connection_error_per_item(example_event):
+    async def open_channel():
+        raise pika.exceptions.AMQPConnectionError("broker onbereikbaar")
+    publisher = async_producer.AsyncPublisher(open_channel=open_channel)
+    with patch.object(async_producer, "_publisher", publisher):
+        errors = asyncio.run(async_producer.publish_events_batch([(example_event, "create"), (example_event, "update")]))
+    assert len(errors) == 2
+    assert all(isinstance(error, pika.exceptions.AMQPConnectionError) for error in errors)
+
+class FakeAsyncioConnection:
+    """Opent meteen (in de loop) een kanaal; bewaart de close callbacks."""
+    def __init__(self, params, on_open_callback, on_open_error_callback, on_close_callback, custom_ioloop):
+        self.on_close_callback = on_close_callback
+        self.is_closed = False
+        self.channel_obj = MagicMock(is_open=True)
+        self.channel_obj.confirm_delivery.side_effect = \
+            lambda ack_nack_callback, callback: custom_ioloop.call_soon(callback, MagicMock())
+        custom_ioloop.call_soon(on_open_callback, self)
+
+    def channel(self, on_open_callback):
+        on_open_callback(self.channel_obj)
+
+    def close(self):
+        self.is_closed = True
+
+def test_async_late_close_of_old_connection_leaves_new_one_alone():
+    publisher = async_producer.AsyncPublisher()
+    async def scenario():
+        old_channel = await publisher._ensure_channel()
+        old_conn = publisher._conn
+        old_channel.is_open = False
+        new_channel = await publisher._ensure_channel()
+        assert old_conn.is_closed and new_channel is not old_channel
+        pending = publisher._send(new_channel, "event", "event.create", b"<a/>")
+        # de callbacks van de oude verbinding komen pas na de reconnect binnen
+        old_conn.on_close_callback(old_conn, "oud")
+        old_channel.add_on_close_callback.call_args.args[0](old_channel, "oud")
+        assert publisher._channel is new_channel
+        assert not pending.done()
+    with patch.object(async_producer, "AsyncioConnection", FakeAsyncioConnection), \
+         patch.object(async_producer, "RABBITMQ_VHOST", "/"):
+        asyncio.run(scenario())
+
+def test_async_publish_event_shares_validation_and_serialisation(example_event):
+    publisher = MagicMock()
+    async def publish(exchange, routing_key, body):
+        publisher.calls.append((exchange, routing_key, body))
+    publisher.calls = []
+    publisher.publish = publish
+    with patch.object(async_producer, "_publisher", publisher):
+        asyncio.run(async_producer.publish_event(example_event, "update"))
+        with pytest.raises(KeyError):
+            asyncio.run(async_producer.publish_session({"title": "x"}, "create"))
+    assert publisher.calls == [("event", "event.update", _event_to_xml(example_event, "update"))]
+
+def test_async_publish_sessions_batch(example_session):
+    publisher = MagicMock()
+    async def publish_batch(messages):
+        return [None] * len(messages)
+    publisher.publish_batch = publish_batch
+    with patch.object(async_producer, "_publisher", publisher):
+        errors = asyncio.run(async_producer.publish_sessions_batch([(example_session, "create"), ({}, "delete")]))
+    assert errors[0] is None and isinstance(errors[1], KeyError)
@@ -114,3 +114,1120 @@ def test_remove_from_gcal_skips_if_none():
     mock_service = MagicMock()
     sync.remove_from_gcal(mock_service, None)
     mock_service.events().delete.assert_not_called()
+
+def test_remove_from_gcal_traces_at_debug_level():
+    with patch.object(sync, "ship_monitoring_log") as ship:
+        sync.remove_from_gcal(MagicMock(), "GCAL123")
+    levels = {call.args[0]: call.kwargs["level"] for call in ship.call_args_list}
+    assert levels["🧪 [DEBUG] remove_from_gcal() called with: GCAL123"] == "debug"
+    assert levels["🗑️  GCal event verwijderd: GCAL123"] == "info"
+
+# ---------------------------
+# Incremental sync (watermark)
+# ---------------------------
+
+def test_hash_row_ignores_updated_at():
+    row1 = {"event_id": "1", "title": "Test", "updated_at": datetime(2025, 1, 1)}
+    row2 = {"event_id": "1", "title": "Test", "updated_at": datetime(2025, 6, 1)}
+    assert sync.hash_row(row1) == sync.hash_row(row2)
+
+@patch("planning.synchronizer.sync.publish_event")
+@patch("planning.synchronizer.sync.fetch_deleted")
+@patch("planning.synchronizer.sync.fetch_outbox_deleted", return_value=[])
+@patch("planning.synchronizer.sync.fetch_snapshot_map", return_value={})
+@patch("planning.synchronizer.sync.fetch_changed", return_value=[])
+@patch("planning.synchronizer.sync.fetch_all")
+def test_sync_events_incremental_reads_only_changed_rows(mock_all, mock_changed, mock_snap, mock_outbox, mock_deleted, mock_pub):
+    stats = sync.sync_events(MagicMock(), MagicMock(), since="2025-01-01 10:00:00")
+    mock_all.assert_not_called()
+    # deletes via de outbox, geen anti-join over de hele tabel
+    mock_outbox.assert_called_once()
+    mock_deleted.assert_not_called()
+    mock_changed.assert_called_once()
+    assert mock_changed.call_args[0][3] == "2025-01-01 10:00:00"
+    assert stats == {"changed": 0, "deleted": 0, "failed": 0, "quota_errors": 0, "held": 0}
+
+@patch("planning.synchronizer.sync.publish_event")
+@patch("planning.synchronizer.sync.fetch_snapshot_map", return_value={})
+@patch("planning.synchronizer.sync.fetch_all")
+def test_sync_events_failed_row_goes_to_retry_queue(mock_all, mock_snap, mock_pub):
+    mock_all.return_value = [{"event_id": "EVT1", "title": "T"}]
+    service = MagicMock()
+    service.events.return_value.insert.side_effect = Exception("boom")
+    writes = sync.SyncWriteBuffer(MagicMock())
+
+    with patch.object(sync, "fetch_failures", return_value={}):
+        stats = sync.sync_events(service, MagicMock(), writes=writes)
+    assert stats["failed"] == 1
+    assert writes._failures[0][:3] == ("events", "EVT1", 1)
+    assert "EVT1" not in sync._carry_over["events"]
+
+@patch("planning.synchronizer.sync.set_sync_state")
+@patch("planning.synchronizer.sync.get_sync_state", return_value="2025-01-01 10:00:00")
+@patch("planning.synchronizer.sync.db_now", return_value=datetime(2025, 1, 1, 10, 5))
+def test_run_sync_cycle_full_ignores_watermark(mock_now, mock_get, mock_set):
+    with patch.object(sync, "sync_events") as ev, patch.object(sync, "sync_sessions") as ses, \
+         patch.object(sync, "pull_gcal_changes", return_value={"updated": 0, "deleted": 0, "skipped": 0, "kept": 0}):
+        sync.run_sync_cycle(MagicMock(), MagicMock(), full=True)
+        assert ev.call_args.kwargs["since"] is None
+        assert ses.call_args.kwargs["since"] is None
+    written = {args[1]: args[2] for args, _ in mock_set.call_args_list}
+    assert written["watermark:events"] == "2025-01-01 10:05:00"
+
+# ---------------------------
+# Batched GCal writes
+# ---------------------------
+
+class FakeBatch:
+    """Simuleert service.new_batch_http_request(); antwoorden per request_id."""
+    def __init__(self, callback, answers):
+        self.callback = callback
+        self.answers = answers
+        self.added = []
+
+    def add(self, request, request_id):
+        self.added.append(request_id)
+
+    def execute(self):
+        for request_id in self.added:
+            response, error = self.answers(request_id)
+            self.callback(request_id, response, error)
+
+def make_batch_service(answers):
+    service = MagicMock()
+    service.batches = []
+    def new_batch(callback):
+        batch = FakeBatch(callback, answers)
+        service.batches.append(batch)
+        return batch
+    service.new_batch_http_request.side_effect = new_batch
+    return service
+
+def test_execute_gcal_batch_splits_into_chunks():
+    service = make_batch_service(lambda rid: ({"id": f"G{rid}"}, None))
+    with patch.object(sync, "GCAL_BATCH_SIZE", 2):
+        results = sync.execute_gcal_batch(service, [(i, MagicMock()) for i in range(5)])
+    assert len(service.batches) == 3
+    assert results["4"] == ({"id": "G4"}, None)
+
+def test_execute_gcal_batch_retries_throttled_calls():
+    import httplib2
+    from googleapiclient.errors import HttpError
+    throttled = HttpError(httplib2.Response({"status": 429, "retry-after": "2"}), b"")
+    answers = {"0": [({"id": "G0"}, None)], "1": [(None, throttled), ({"id": "G1"}, None)]}
+    service = make_batch_service(lambda rid: answers[rid].pop(0))
+    manager = MagicMock(retries=3)
+    with patch.object(sync, "_gcal_quota", manager):
+        results = sync.execute_gcal_batch(service, [(0, MagicMock()), (1, MagicMock())])
+    assert results == {"0": ({"id": "G0"}, None), "1": ({"id": "G1"}, None)}
+    assert [batch.added for batch in service.batches] == [["0", "1"], ["1"]]
+    manager.throttled.assert_called_once_with(throttled, 1)
+    assert [c.args for c in manager.acquire.call_args_list] == [(2,), (1,)]
+
+@patch("planning.synchronizer.sync.publish_event")
+def test_push_changes_only_snapshots_successful_rows(mock_pub):
+    def answers(rid):
+        return (None, Exception("quota")) if rid == "1" else ({"id": "GOK"}, None)
+    service = make_batch_service(answers)
+    pending = [
+        ({"event_id": "E0", "title": "A"}, "create", "h0"),
+        ({"event_id": "E1", "title": "B"}, "create", "h1"),
+    ]
+    stats = sync.new_stats()
+    writes = sync.SyncWriteBuffer(MagicMock())
+    sync.push_changes(service, writes, "events", pending, lambda row: {}, mock_pub, stats)
+
+    assert stats == {"changed": 1, "deleted": 0, "failed": 1, "quota_errors": 0, "held": 0}
+    assert writes._snapshots[("event_snapshots", "event_id")] == [("E0", "h0", "GOK", None)]
+    assert writes._synced[("events", "event_id")] == [("E0", "GOK")]
+    assert [f[1] for f in writes._failures] == ["E1"]
+
+# ---------------------------
+# Persistent DB connection
+# ---------------------------
+
+@patch("planning.synchronizer.sync.pooling.MySQLConnectionPool")
+def test_get_db_connection_reuses_healthy_connection(mock_pool):
+    sync._db_pool, sync._db_conn = None, None
+    conn = sync.get_db_connection()
+    assert sync.get_db_connection() is conn
+    mock_pool.return_value.get_connection.assert_called_once()
+    conn.ping.assert_called_once()
+    sync._db_pool, sync._db_conn = None, None
+
+@patch("planning.synchronizer.sync.pooling.MySQLConnectionPool")
+def test_get_db_connection_replaces_dead_connection(mock_pool):
+    sync._db_pool, sync._db_conn = None, None
+    dead, fresh = MagicMock(), MagicMock()
+    dead.ping.side_effect = Exception("gone away")
+    mock_pool.return_value.get_connection.side_effect = [dead, fresh]
+
+    sync.get_db_connection()
+    assert sync.get_db_connection() is fresh
+    dead.close.assert_called_once()
+    sync._db_pool, sync._db_conn = None, None
+
+# ---------------------------
+# Bulk write stage
+# ---------------------------
+
+def test_write_buffer_flushes_in_one_transaction():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    writes = sync.SyncWriteBuffer(conn)
+    writes.mark_synced("events", "event_id", "E1", "G1")
+    writes.mark_synced("events", "event_id", "E2", "G2")
+    writes.update_snapshot("event_snapshots", "event_id", "E1", "h1", "G1")
+    writes.update_snapshot("event_snapshots", "event_id", "E2", "h2", "G2")
+    writes.flush()
+
+    cursor.executemany.assert_called_once()
+    assert cursor.executemany.call_args[0][1] == [("E1", "h1", "G1", None), ("E2", "h2", "G2", None)]
+    cursor.execute.assert_called_once()
+    assert cursor.execute.call_args[0][1] == ["E1", "G1", "E2", "G2", "E1", "E2"]
+    conn.commit.assert_called_once()
+    assert len(writes) == 0
+
+def test_write_buffer_rolls_back_on_error():
+    conn = MagicMock()
+    conn.cursor.return_value.executemany.side_effect = Exception("deadlock")
+    writes = sync.SyncWriteBuffer(conn)
+    writes.update_snapshot("event_snapshots", "event_id", "E1", "h1", "G1")
+    with pytest.raises(Exception):
+        writes.flush()
+    conn.rollback.assert_called_once()
+    conn.commit.assert_not_called()
+
+@patch("planning.synchronizer.sync.publish_event")
+def test_push_changes_flushes_when_buffer_is_full(mock_pub):
+    service = make_batch_service(lambda rid: ({"id": "G"}, None))
+    conn = MagicMock()
+    pending = [({"event_id": f"E{i}", "gcal_id": "G"}, "update", "h") for i in range(5)]
+    stats = sync.new_stats()
+    writes = sync.SyncWriteBuffer(conn, flush_rows=2)
+    with patch.object(sync, "GCAL_BATCH_SIZE", 2):
+        sync.push_changes(service, writes, "events", pending, lambda row: {}, mock_pub, stats)
+    assert stats["changed"] == 5
+    assert conn.commit.call_count == 2
+    assert len(writes) == 1
+
+# ---------------------------
+# Batched delete detection
+# ---------------------------
+
+def test_fetch_snapshot_map_returns_hash_and_gcal_id():
+    conn = MagicMock()
+    conn.cursor.return_value.fetchall.return_value = [("E1", "h1", "G1", "r1")]
+    assert sync.fetch_snapshot_map(conn, "event_snapshots", "event_id") == {"E1": ("h1", "G1", "r1")}
+
+@patch("planning.synchronizer.sync.get_gcal_id")
+@patch("planning.synchronizer.sync.publish_session")
+@patch("planning.synchronizer.sync.fetch_snapshot_map")
+@patch("planning.synchronizer.sync.fetch_all", return_value=[])
+def test_deletes_use_snapshot_index_and_one_delete_statement(mock_all, mock_snap, mock_pub, mock_get_gcal_id):
+    mock_snap.return_value = {"S1": ("h1", "G1"), "S2": ("h2", "G2")}
+    service = make_batch_service(lambda rid: (None, None))
+    conn = MagicMock()
+
+    stats = sync.sync_sessions(service, conn)
+
+    mock_get_gcal_id.assert_not_called()
+    assert stats["deleted"] == 2
+    assert len(service.batches) == 1
+    assert [c.args[0] for c in mock_pub.call_args_list] == [{"session_id": "S1"}, {"session_id": "S2"}]
+    delete_sql = [c.args for c in conn.cursor.return_value.execute.call_args_list
+                  if "DELETE FROM session_snapshots" in c.args[0]]
+    assert len(delete_sql) == 1
+    assert delete_sql[0][1] == ["S1", "S2"]
+
+@patch("planning.synchronizer.sync.publish_event")
+def test_failed_gcal_delete_keeps_snapshot(mock_pub):
+    service = make_batch_service(lambda rid: (None, Exception("backend error")))
+    writes = sync.SyncWriteBuffer(MagicMock())
+    stats = sync.new_stats()
+    sync.push_deletes(service, writes, "events", [("E1", "G1")], mock_pub, stats)
+    assert stats == {"changed": 0, "deleted": 0, "failed": 1, "quota_errors": 0, "held": 0}
+    mock_pub.assert_not_called()
+    assert not writes._snapshot_deletes
+    assert [f[1] for f in writes._failures] == ["E1"]
+
+# ---------------------------
+# Database-side content hashing
+# ---------------------------
+
+def test_hash_row_ignores_row_hash():
+    assert sync.hash_row({"event_id": "1", "row_hash": "abc"}) == sync.hash_row({"event_id": "1"})
+
+SNAPSHOT_COLUMNS = ("snapshot_id", "snapshot_content_hash", "snapshot_gcal_id", "snapshot_row_hash")
+
+def test_fetch_hash_diff_splits_row_and_snapshot():
+    conn = MagicMock()
+    cur = conn.cursor.return_value
+    cur.column_names = ("event_id", "title", "row_hash") + SNAPSHOT_COLUMNS
+    cur.fetchall.return_value = [
+        ("E1", "T", "r1", "E1", "h1", "G1", None),
+        ("E2", "N", "r2", None, None, None, None),
+    ]
+    rows, snapshot_map = sync.fetch_hash_diff(conn, "events", "event_snapshots", "event_id")
+    assert [dict(row) for row in rows] == [{"event_id": "E1", "title": "T", "row_hash": "r1"},
+                                           {"event_id": "E2", "title": "N", "row_hash": "r2"}]
+    assert snapshot_map == {"E1": ("h1", "G1", None)}
+    assert "s.row_hash <> t.row_hash" in cur.execute.call_args[0][0]
+
+@patch("planning.synchronizer.sync.publish_event")
+@patch("planning.synchronizer.sync.fetch_deleted", return_value=[])
+@patch("planning.synchronizer.sync.fetch_hash_diff")
+def test_db_hash_mode_backfills_row_hash_without_push(mock_diff, mock_deleted, mock_pub):
+    row = {"event_id": "E1", "title": "T", "row_hash": "r1"}
+    mock_diff.return_value = ([row], {"E1": (sync.hash_row(row), "G1", None)})
+    service = MagicMock()
+    writes = sync.SyncWriteBuffer(MagicMock())
+
+    with patch.object(sync, "SYNC_DB_HASH", True):
+        stats = sync.sync_events(service, MagicMock(), writes=writes)
+
+    assert stats["changed"] == 0
+    service.new_batch_http_request.assert_not_called()
+    mock_pub.assert_not_called()
+    # legacy hash in de snapshot -> gemigreerd naar de nieuwe fingerprint
+    assert writes._snapshots[("event_snapshots", "event_id")] == [("E1", sync.fingerprint(row), "G1", "r1")]
+
+def test_fetch_outbox_deleted_limits_anti_join_to_outbox_and_retries():
+    conn = MagicMock()
+    conn.cursor.return_value.fetchall.return_value = [("E3", "G3")]
+    assert sync.fetch_outbox_deleted(conn, "events", "event_snapshots", "event_id", ["E7"]) == [("E3", "G3")]
+    sql, params = conn.cursor.return_value.execute.call_args[0]
+    assert "FROM sync_outbox WHERE table_name = %s AND operation = 'delete'" in sql
+    assert sql.endswith("OR s.event_id IN (%s))")
+    assert params == ["events", "E7"]
+
+# ---------------------------
+# Outbox
+# ---------------------------
+
+@patch("planning.synchronizer.sync.time.sleep")
+@patch("planning.synchronizer.sync.outbox_head", return_value=42)
+def test_wait_for_outbox_returns_immediately_when_entries_exist(mock_head, mock_sleep):
+    assert sync.wait_for_outbox(MagicMock(), timeout=10) == 42
+    mock_sleep.assert_not_called()
+
+@patch("planning.synchronizer.sync.time.sleep")
+@patch("planning.synchronizer.sync.outbox_head", side_effect=[None, None, None, 7])
+def test_wait_for_outbox_backs_off_while_idle(mock_head, mock_sleep):
+    with patch.object(sync, "OUTBOX_POLL_MIN", 0.1), patch.object(sync, "OUTBOX_POLL_MAX", 0.3):
+        assert sync.wait_for_outbox(MagicMock(), timeout=60) == 7
+    delays = [c.args[0] for c in mock_sleep.call_args_list]
+    assert delays == [0.1, 0.2, 0.3]
+
+@patch("planning.synchronizer.sync.time.sleep")
+@patch("planning.synchronizer.sync.outbox_head", return_value=None)
+def test_wait_for_outbox_times_out(mock_head, mock_sleep):
+    assert sync.wait_for_outbox(MagicMock(), timeout=0) is None
+
+def test_drain_outbox_deletes_processed_entries():
+    conn = MagicMock()
+    sync.drain_outbox(conn, 42)
+    conn.cursor.return_value.execute.assert_called_once_with("DELETE FROM sync_outbox WHERE id <= %s", (42,))
+    conn.commit.assert_called_once()
+
+# ---------------------------
+# Adaptive scheduler
+# ---------------------------
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+def test_scheduler_runs_at_fixed_rate():
+    clock = FakeClock()
+    scheduler = sync.AdaptiveScheduler(base=5, min_interval=1, max_interval=60, clock=clock)
+    scheduler.start_cycle()
+    clock.now = 2.0
+    scheduler.end_cycle({"failed": 1})
+    # volgende start = geplande start (0) + interval, niet einde (2) + interval
+    assert scheduler.next_run == 5
+    assert scheduler.time_until_next() == 3
+
+def test_scheduler_shortens_interval_when_changes_flow_and_backs_off_when_idle():
+    clock = FakeClock()
+    scheduler = sync.AdaptiveScheduler(base=4, min_interval=1, max_interval=16, clock=clock)
+    for expected in (2, 1, 1):
+        scheduler.start_cycle()
+        scheduler.end_cycle({"changed": 3})
+        assert scheduler.interval == expected
+    for expected in (2, 4, 8, 16, 16):
+        scheduler.start_cycle()
+        scheduler.end_cycle({})
+        assert scheduler.interval == expected
+
+def test_scheduler_backs_off_on_quota_errors():
+    scheduler = sync.AdaptiveScheduler(base=4, min_interval=1, max_interval=60, clock=FakeClock())
+    scheduler.start_cycle()
+    scheduler.end_cycle({"changed": 10, "quota_errors": 2})
+    assert scheduler.interval == 8
+
+def test_scheduler_reports_overrun_and_lag():
+    clock = FakeClock()
+    scheduler = sync.AdaptiveScheduler(base=5, min_interval=1, max_interval=60, clock=clock)
+    clock.now = 1.5
+    scheduler.start_cycle()
+    clock.now = 9.0
+    assert scheduler.end_cycle({"failed": 1}) is True
+    assert scheduler.next_run == 9.0
+    assert scheduler.metrics() == {"interval": 5, "last_duration": 7.5, "lag": 1.5, "overruns": 1}
+
+def test_is_quota_error():
+    from googleapiclient.errors import HttpError
+    resp = MagicMock(status=403)
+    assert sync.is_quota_error(HttpError(resp, b'{"error": {"errors": [{"reason": "rateLimitExceeded"}]}}'))
+    assert not sync.is_quota_error(HttpError(MagicMock(status=403), b'{"error": {"errors": [{"reason": "forbidden"}]}}'))
+    assert sync.is_quota_error(HttpError(MagicMock(status=429), b''))
+    assert not sync.is_quota_error(Exception("boom"))
+
+# ---------------------------
+# Worker pool
+# ---------------------------
+
+def test_run_gcal_batches_uses_worker_services_and_keeps_order():
+    import threading
+    seen = []
+    def fn(svc, chunk):
+        seen.append((svc, threading.current_thread().name))
+        return [x * 2 for x in chunk]
+    with patch.object(sync, "SYNC_WORKERS", 3), patch.object(sync, "_executor", None), \
+         patch.object(sync, "get_gcal_service", side_effect=lambda: MagicMock()):
+        results = list(sync.run_gcal_batches("main-service", [[1], [2], [3], [4]], fn))
+    assert results == [[2], [4], [6], [8]]
+    assert all(svc != "main-service" for svc, _ in seen)
+    assert all(name.startswith("gcal") for _, name in seen)
+
+@patch("planning.synchronizer.sync.fetch_snapshot_map", return_value={"EVT1": ("h", "G", None)})
+def test_hold_orphans_defers_sessions_without_synced_event(mock_snap):
+    writes = sync.SyncWriteBuffer(MagicMock())
+    writes.update_snapshot("event_snapshots", "event_id", "EVT2", "h", "G")
+    pending = [
+        ({"session_id": "S1", "event_id": "EVT1"}, "create", "h1"),
+        ({"session_id": "S2", "event_id": "EVT2"}, "create", "h2"),
+        ({"session_id": "S3", "event_id": "EVT3"}, "create", "h3"),
+        ({"session_id": "S4", "event_id": "EVT3"}, "update", "h4"),
+    ]
+    ready = sync.hold_orphans(MagicMock(), writes, "sessions", pending)
+    assert [row["session_id"] for row, _, _ in ready] == ["S1", "S2", "S4"]
+    assert sync._carry_over["sessions"] == {"S3"}
+    sync._carry_over["sessions"].clear()
+
+# ---------------------------
+# Retry queue
+# ---------------------------
+
+def test_retry_delay_grows_exponentially_and_is_capped():
+    with patch.object(sync, "SYNC_RETRY_BASE", 30), patch.object(sync, "SYNC_RETRY_MAX", 3600), \
+         patch.object(sync.random, "uniform", return_value=1.0):
+        assert [sync.retry_delay(n) for n in (1, 2, 3)] == [30, 60, 120]
+        assert sync.retry_delay(20) == 3600
+    with patch.object(sync.random, "uniform", return_value=0.5):
+        assert sync.retry_delay(1) == sync.SYNC_RETRY_BASE / 2
+
+@patch("planning.synchronizer.sync.publish_event")
+@patch("planning.synchronizer.sync.fetch_outbox_deleted", return_value=[("E3", "G3")])
+@patch("planning.synchronizer.sync.fetch_snapshot_map", return_value={})
+@patch("planning.synchronizer.sync.fetch_changed")
+def test_failed_rows_wait_until_due(mock_changed, mock_snap, mock_deleted, mock_pub):
+    mock_changed.return_value = [{"event_id": "E1", "title": "A"}, {"event_id": "E2", "title": "B"}]
+    failures = {"E1": (2, False), "E2": (3, True), "E3": (1, False)}
+    service = make_batch_service(lambda rid: ({"id": "GNEW"}, None))
+    writes = sync.SyncWriteBuffer(MagicMock())
+
+    with patch.object(sync, "fetch_failures", return_value=failures), \
+         patch.object(sync, "build_gcal_payload", return_value={}):
+        stats = sync.sync_events(service, MagicMock(), since="2025-01-01 10:00:00", writes=writes)
+
+    # E2 is due en wordt expliciet meegelezen; E1 (update) en E3 (delete) wachten
+    assert mock_changed.call_args[0][4] == {"E2"}
+    assert mock_deleted.call_args[0][4] == {"E2"}
+    assert stats["changed"] == 1 and stats["deleted"] == 0
+    assert writes.snapshotted["event_snapshots"] == {"E2"}
+    assert writes._cleared == [("events", "E2")]
+
+def test_record_failure_increments_attempts():
+    writes = sync.SyncWriteBuffer(MagicMock())
+    writes.failures["events"] = {"E1": (3, True)}
+    assert writes.record_failure("events", "E1", Exception("x")) == 4
+    assert writes.record_failure("events", "E9", Exception("x")) == 1
+
+def test_write_buffer_flushes_failures_with_other_writes():
+    conn = MagicMock()
+    writes = sync.SyncWriteBuffer(conn)
+    writes.failures["events"] = {"E2": (1, True)}
+    writes.record_failure("events", "E1", Exception("boom"))
+    writes.clear_failure("events", "E2")
+    writes.clear_failure("events", "E3")  # stond niet in de wachtrij
+    writes.flush()
+
+    cur = conn.cursor.return_value
+    upsert = cur.executemany.call_args[0]
+    assert "INSERT INTO sync_failures" in upsert[0]
+    assert upsert[1][0][:3] == ("events", "E1", 1)
+    assert cur.execute.call_args[0][1] == ["events", "E2"]
+    conn.commit.assert_called_once()
+
+def test_retry_failures_cli_forces_single_row():
+    conn = MagicMock()
+    conn.cursor.return_value.rowcount = 1
+    with patch.object(sync, "get_db_connection", return_value=conn):
+        sync.main(["failures", "retry", "events", "E1"])
+    sql, params = conn.cursor.return_value.execute.call_args[0]
+    assert "SET next_attempt_at = NOW()" in sql
+    assert params == ["events", "E1"]
+    conn.commit.assert_called_once()
+
+def test_retry_failures_cli_requires_target():
+    with patch.object(sync, "get_db_connection", return_value=MagicMock()), pytest.raises(SystemExit):
+        sync.main(["failures", "retry"])
+
+# ---------------------------
+# Pull from Google Calendar (syncToken)
+# ---------------------------
+
+def make_list_service(pages):
+    service = MagicMock()
+    service.events.return_value.list.return_value.execute.side_effect = pages
+    return service
+
+def test_list_gcal_changes_follows_pages_and_returns_next_token():
+    service = make_list_service([
+        {"items": [{"id": "G1"}], "nextPageToken": "p2"},
+        {"items": [{"id": "G2"}], "nextSyncToken": "tok2"},
+    ])
+    items, token = sync.list_gcal_changes(service, "tok1")
+    assert [i["id"] for i in items] == ["G1", "G2"]
+    assert token == "tok2"
+    calls = service.events.return_value.list.call_args_list
+    assert calls[0].kwargs["syncToken"] == "tok1" and "pageToken" not in calls[0].kwargs
+    assert calls[1].kwargs["pageToken"] == "p2"
+
+@patch("planning.synchronizer.sync.set_sync_state")
+@patch("planning.synchronizer.sync.get_sync_state", return_value="expired")
+@patch("planning.synchronizer.sync.apply_gcal_changes", return_value={"updated": 0, "deleted": 0, "skipped": 0, "kept": 0})
+def test_pull_resyncs_fully_when_token_is_invalid(mock_apply, mock_get, mock_set):
+    gone = sync.HttpError(MagicMock(status=410), b"gone")
+    service = make_list_service([gone, {"items": [{"id": "G1"}], "nextSyncToken": "fresh"}])
+    sync.pull_gcal_changes(service, MagicMock())
+    calls = service.events.return_value.list.call_args_list
+    assert calls[0].kwargs["syncToken"] == "expired"
+    assert "syncToken" not in calls[1].kwargs
+    assert mock_apply.call_args[0][1] == [{"id": "G1"}]
+    mock_set.assert_called_once_with(mock_apply.call_args[0][0], sync.SYNC_TOKEN_STATE, "fresh")
+
+def test_gcal_to_row_maps_event_back_to_columns():
+    item = {"summary": "Keynote", "start": {"dateTime": "2025-05-01T09:00:00+02:00"},
+            "end": {"dateTime": "2025-05-01T10:30:00+02:00"}}
+    assert sync.gcal_to_row("sessions", item) == {
+        "title": "Keynote", "location": None, "description": None,
+        "date": "2025-05-01", "start_time": "09:00:00", "end_time": "10:30:00"}
+
+def _event_row(**overrides):
+    row = {"event_id": "E1", "title": "Keynote", "location": "Zaal 1", "description": "",
+           "start_date": datetime(2025, 5, 1).date(), "end_date": datetime(2025, 5, 1).date(),
+           "start_time": sync.timedelta(hours=9), "end_time": sync.timedelta(hours=10)}
+    row.update(overrides)
+    return row
+
+def _gcal_item(**overrides):
+    item = {"id": "G1", "summary": "Keynote", "location": "Zaal 1",
+            "start": {"dateTime": "2025-05-01T09:00:00+02:00"}, "end": {"dateTime": "2025-05-01T10:00:00+02:00"}}
+    item.update(overrides)
+    return item
+
+def _apply(item, row, snapshot_hash=None, with_sessions=()):
+    conn = MagicMock()
+    index = {"events": {"G1": ("E1", snapshot_hash or sync.hash_row(row))}, "sessions": {}}
+    with patch.object(sync, "fetch_gcal_index", side_effect=lambda c, snap, field, ids: index["events" if field == "event_id" else "sessions"]), \
+         patch.object(sync, "fetch_rows", side_effect=lambda c, table, field, ids: {"E1": row} if ids else {}), \
+         patch.object(sync, "fetch_ids_with_children", side_effect=lambda c, table, ids: set(with_sessions) & set(ids)):
+        stats = sync.apply_gcal_changes(conn, [item])
+    return stats, conn.cursor.return_value.execute.call_args_list
+
+def test_apply_gcal_changes_skips_echo_of_own_push():
+    stats, executed = _apply(_gcal_item(), _event_row())
+    assert stats == {"updated": 0, "deleted": 0, "skipped": 1, "kept": 0}
+    assert executed == []
+
+def test_apply_gcal_changes_updates_only_changed_columns():
+    stats, executed = _apply(_gcal_item(summary="Opening", end={"dateTime": "2025-05-01T11:00:00+02:00"}), _event_row())
+    assert stats["updated"] == 1
+    sql, params = executed[0].args
+    assert sql == "UPDATE events SET title = %s, end_time = %s WHERE event_id = %s"
+    assert params == ["Opening", "11:00:00", "E1"]
+
+def test_apply_gcal_changes_keeps_unpushed_local_changes():
+    stats, executed = _apply(_gcal_item(summary="Opening"), _event_row(), snapshot_hash="stale")
+    assert stats["skipped"] == 1
+    assert executed == []
+
+def test_apply_gcal_changes_deletes_cancelled_events():
+    stats, executed = _apply(_gcal_item(status="cancelled"), _event_row())
+    assert stats["deleted"] == 1
+    assert executed[0].args == ("DELETE FROM events WHERE event_id = %s", ("E1",))
+
+def test_apply_gcal_changes_keeps_cancelled_event_with_sessions():
+    stats, executed = _apply(_gcal_item(status="cancelled"), _event_row(), with_sessions={"E1"})
+    assert stats == {"updated": 0, "deleted": 0, "skipped": 0, "kept": 1}
+    assert executed == []
+
+def test_fetch_ids_with_children_checks_sessions_of_events():
+    conn = MagicMock()
+    conn.cursor.return_value.fetchall.return_value = [("E1",)]
+    assert sync.fetch_ids_with_children(conn, "events", ["E1", "E2"]) == {"E1"}
+    sql, params = conn.cursor.return_value.execute.call_args[0]
+    assert sql == "SELECT DISTINCT event_id FROM sessions WHERE event_id IN (%s, %s)"
+    assert params == ["E1", "E2"]
+    assert sync.fetch_ids_with_children(MagicMock(), "sessions", ["S1"]) == set()
+
+# ---------------------------
+# Sharded workers
+# ---------------------------
+
+class FakeLockServer:
+    """Simuleert GET_LOCK/IS_USED_LOCK/RELEASE_LOCK over meerdere connecties."""
+    def __init__(self):
+        self.locks = {}
+        self.live = 1
+        self.cleared = []
+
+    def connect(self, name):
+        server = self
+        conn = MagicMock()
+        def cursor(*args, **kwargs):
+            cur = MagicMock()
+            def execute(sql, params=()):
+                lock = params[0] if params else None
+                if "IS_USED_LOCK" in sql:
+                    cur.result = int(server.locks.get(lock) == name)
+                elif "GET_LOCK" in sql:
+                    free = server.locks.get(lock) in (None, name)
+                    if free:
+                        server.locks[lock] = name
+                    cur.result = int(free)
+                elif "RELEASE_LOCK" in sql:
+                    server.locks.pop(lock, None)
+                    cur.result = 1
+                elif "COUNT(*)" in sql:
+                    cur.result = server.live
+                elif "DELETE FROM sync_state" in sql:
+                    server.cleared.append((name, sorted(params)))
+            cur.execute.side_effect = execute
+            cur.fetchone.side_effect = lambda: (cur.result,)
+            return cur
+        conn.cursor.side_effect = cursor
+        return conn
+
+def test_shard_set_clause_limits_rows_to_owned_shards():
+    clause, params = sync.ShardSet(4, {3, 1}).clause("t.event_id")
+    assert clause == "CRC32(t.event_id) MOD %s IN (%s, %s)"
+    assert params == [4, 1, 3]
+    assert sync.ShardSet(4, set()).clause("event_id") == ("1 = 0", [])
+
+def test_coordinators_split_shards_and_take_over_from_dead_worker():
+    server = FakeLockServer()
+    conn_a, conn_b = server.connect("a"), server.connect("b")
+    a = sync.ShardCoordinator(count=4, worker_id="a")
+    b = sync.ShardCoordinator(count=4, worker_id="b")
+
+    assert a.rebalance(conn_a).owned == [0, 1, 2, 3]
+    assert a.leader
+
+    # b komt erbij: a geeft de helft af, b claimt de vrijgekomen shards
+    server.live = 2
+    assert a.rebalance(conn_a).owned == [0, 1]
+    shard_b = b.rebalance(conn_b)
+    assert shard_b.owned == [2, 3] and not shard_b.leader
+
+    # a sterft: zijn locks vallen weg met de connectie
+    server.locks = {k: v for k, v in server.locks.items() if v != "a"}
+    server.live = 1
+    shard_b = b.rebalance(conn_b)
+    assert shard_b.owned == [0, 1, 2, 3] and shard_b.leader
+
+def test_shards_changing_owner_lose_their_watermark():
+    server = FakeLockServer()
+    conn_a, conn_b = server.connect("a"), server.connect("b")
+    a = sync.ShardCoordinator(count=2, worker_id="a")
+    b = sync.ShardCoordinator(count=2, worker_id="b")
+    a.rebalance(conn_a)
+    server.cleared.clear()
+
+    # a geeft shard 1 af en wist zijn watermark vóór het vrijgeven; b wist hem opnieuw bij het claimen
+    server.live = 2
+    a.rebalance(conn_a)
+    b.rebalance(conn_b)
+    keys = ["watermark:events:1", "watermark:sessions:1"]
+    assert server.cleared == [("a", keys), ("b", keys)]
+
+    # a sterft zonder iets te wissen: b wist bij de overname
+    server.cleared.clear()
+    server.locks = {k: v for k, v in server.locks.items() if v != "a"}
+    server.live = 1
+    b.rebalance(conn_b)
+    assert server.cleared == [("b", ["watermark:events:0", "watermark:sessions:0"])]
+
+def test_fetch_changed_adds_shard_filter_after_watermark_clause():
+    conn = MagicMock()
+    sync.fetch_changed(conn, "sessions", "session_id", "2025-01-01", ["S1"], sync.ShardSet(2, {1}))
+    sql, params = conn.cursor.return_value.execute.call_args[0]
+    assert sql.endswith("OR session_id IN (%s)) AND CRC32(event_id) MOD %s IN (%s)")
+    assert params == ["2025-01-01", sync.WATERMARK_OVERLAP_SECONDS, "S1", 2, 1]
+
+@patch("planning.synchronizer.sync.publish_event")
+@patch("planning.synchronizer.sync.fetch_failures", return_value={})
+@patch("planning.synchronizer.sync.fetch_deleted", return_value=[("E9", "G9")])
+@patch("planning.synchronizer.sync.fetch_snapshot_map", return_value={})
+@patch("planning.synchronizer.sync.fetch_all", return_value=[])
+def test_only_the_leader_handles_deletes(mock_all, mock_snap, mock_deleted, mock_failures, mock_pub):
+    service = make_batch_service(lambda rid: (None, None))
+    stats = sync.sync_events(service, MagicMock(), shard=sync.ShardSet(2, {0}, leader=False))
+    assert stats["deleted"] == 0
+    assert mock_all.call_args[0][2].owned == [0]
+    stats = sync.sync_events(service, MagicMock(), shard=sync.ShardSet(2, {1}, leader=True))
+    assert stats["deleted"] == 1
+
+def test_read_watermark_takes_oldest_owned_shard():
+    state = {"watermark:events:0": "2025-01-01 10:05:00", "watermark:events:1": "2025-01-01 10:00:00"}
+    with patch.object(sync, "get_sync_state", side_effect=lambda conn, key: state.get(key)):
+        assert sync.read_watermark(None, "events", sync.ShardSet(4, {0, 1})) == "2025-01-01 10:00:00"
+        # net overgenomen shard zonder watermark -> volledige pass
+        assert sync.read_watermark(None, "events", sync.ShardSet(4, {0, 2})) is None
+
+@patch("planning.synchronizer.sync.time.sleep")
+@patch("planning.synchronizer.sync.outbox_head", return_value=7)
+def test_wait_for_outbox_ignores_entries_already_processed(mock_head, mock_sleep):
+    assert sync.wait_for_outbox(MagicMock(), 0, after=7) is None
+    assert sync.wait_for_outbox(MagicMock(), 0, after=6) == 7
+
+# ---------------------------
+# Streaming diff
+# ---------------------------
+
+def _joined(event_id, snapshot=None):
+    content_hash, gcal_id, row_hash = snapshot or (None, None, None)
+    return (event_id, event_id, event_id if snapshot else None, content_hash, gcal_id, row_hash)
+
+def test_stream_rows_pages_by_primary_key():
+    conn = MagicMock()
+    cur = conn.cursor.return_value
+    cur.column_names = ("event_id", "title") + SNAPSHOT_COLUMNS
+    cur.fetchall.side_effect = [
+        [_joined("E1"), _joined("E2", ("h", "G2", None))],
+        [_joined("E3")],
+    ]
+    rows = list(sync.stream_rows(conn, "events", "event_snapshots", "event_id", page_size=2))
+    assert [row["event_id"] for row, _ in rows] == ["E1", "E2", "E3"]
+    assert rows[1][1] == ("h", "G2", None) and rows[0][1] is None
+    assert "snapshot_id" not in rows[0][0]
+    first, second = [c.args for c in cur.execute.call_args_list]
+    assert "WHERE" not in first[0] and first[1] == [2]
+    assert "WHERE t.event_id > %s" in second[0] and second[1] == ["E2", 2]
+
+def test_stream_diff_emits_operations():
+    unchanged = {"event_id": "E2", "title": "E2"}
+    rows = [
+        ({"event_id": "E1", "title": "E1"}, None),
+        (unchanged, (sync.fingerprint(unchanged), "G2", None)),
+        ({"event_id": "E3", "title": "E3"}, ("b2:old", "G3", None)),
+        ({"event_id": "E4", "title": "E4", "row_hash": "r4"}, (sync.fingerprint({"event_id": "E4", "title": "E4"}), "G4", None)),
+    ]
+    with patch.object(sync, "stream_rows", return_value=iter(rows)), \
+         patch.object(sync, "stream_deleted", return_value=iter([("E9", "G9")])):
+        ops = [(op, item if op == "delete" else item["event_id"], gcal_id)
+               for op, item, _, gcal_id in sync.stream_diff(MagicMock(), "events")]
+    assert ops == [("create", "E1", None), ("update", "E3", "G3"), ("backfill", "E4", "G4"), ("delete", "E9", "G9")]
+
+@patch("planning.synchronizer.sync.publish_event")
+@patch("planning.synchronizer.sync.fetch_failures", return_value={})
+def test_streaming_full_pass_pushes_in_blocks(mock_failures, mock_pub):
+    ops = [("create", {"event_id": f"E{i}", "title": "T"}, f"h{i}", None) for i in range(5)]
+    ops.append(("delete", "E9", None, "G9"))
+    service = make_batch_service(lambda rid: ({"id": "GNEW"}, None))
+    with patch.object(sync, "SYNC_STREAM", True), patch.object(sync, "GCAL_BATCH_SIZE", 2), \
+         patch.object(sync, "stream_diff", return_value=iter(ops)), \
+         patch.object(sync, "build_gcal_payload", return_value={}), \
+         patch.object(sync, "get_pipeline_connection", return_value=MagicMock()), \
+         patch.object(sync, "fetch_all") as mock_all:
+        stats = sync.sync_events(service, MagicMock())
+    mock_all.assert_not_called()
+    assert stats["changed"] == 5 and stats["deleted"] == 1
+    assert [len(batch.added) for batch in service.batches] == [2, 2, 1, 1]
+
+# ---------------------------
+# Compact rows and fingerprint
+# ---------------------------
+
+def _records(columns, *rows):
+    cur = MagicMock()
+    cur.column_names = columns
+    cur.fetchall.return_value = list(rows)
+    return sync.fetch_records(cur)
+
+def test_sync_row_behaves_like_a_read_only_mapping():
+    (row, extra), = _records(("event_id", "title", "location"), ("E1", "T", None))
+    assert extra == ()
+    assert row["title"] == "T" and row.get("missing", "x") == "x"
+    assert "location" in row and dict(row) == {"event_id": "E1", "title": "T", "location": None}
+    assert not hasattr(row, "__dict__")
+
+def test_fingerprint_is_the_same_for_records_and_dicts():
+    (row, _), = _records(("title", "event_id", "synced"), ("T", "E1", 1))
+    assert sync.fingerprint(row) == sync.fingerprint({"event_id": "E1", "title": "T", "synced": 0})
+    assert sync.fingerprint(row).startswith(sync.FINGERPRINT_PREFIX)
+
+def test_fingerprint_is_unambiguous():
+    assert sync.fingerprint({"a": "bc", "b": ""}) != sync.fingerprint({"a": "b", "b": "c"})
+    assert sync.fingerprint({"a": None}) != sync.fingerprint({"a": ""})
+    assert sync.fingerprint({"a": 1}) != sync.fingerprint({"b": 1})
+
+def test_compare_content_accepts_legacy_hashes():
+    row = {"event_id": "E1", "title": "T"}
+    current, unchanged = sync.compare_content(row, sync.hash_row(row))
+    assert unchanged and current == sync.fingerprint(row)
+    assert sync.compare_content(row, current) == (current, True)
+    assert sync.compare_content(row, sync.hash_row({"event_id": "E1", "title": "X"}))[1] is False
+    assert sync.compare_content(row, None)[1] is False
+
+@patch("planning.synchronizer.sync.publish_event")
+@patch("planning.synchronizer.sync.fetch_failures", return_value={})
+@patch("planning.synchronizer.sync.fetch_snapshot_map")
+@patch("planning.synchronizer.sync.fetch_all")
+def test_legacy_snapshots_are_migrated_without_resync(mock_all, mock_snap, mock_failures, mock_pub):
+    row = {"event_id": "E1", "title": "T", "row_hash": "r1"}
+    mock_all.return_value = [row]
+    mock_snap.return_value = {"E1": (sync.hash_row(row), "G1", "r1")}
+    service = MagicMock()
+    writes = sync.SyncWriteBuffer(MagicMock())
+    stats = sync.sync_events(service, MagicMock(), writes=writes)
+    assert stats["changed"] == 0
+    service.new_batch_http_request.assert_not_called()
+    assert writes._snapshots[("event_snapshots", "event_id")] == [("E1", sync.fingerprint(row), "G1", "r1")]
+
+# ---------------------------
+# Sync horizon
+# ---------------------------
+
+def test_fetch_all_applies_horizon_on_end_date():
+    conn = MagicMock()
+    sync.fetch_all(conn, "events", horizon=30)
+    sql, params = conn.cursor.return_value.execute.call_args[0]
+    assert sql == "SELECT * FROM events WHERE (end_date >= CURDATE() - INTERVAL %s DAY OR end_date IS NULL)"
+    assert params == [30]
+
+def test_fetch_changed_combines_shard_and_horizon():
+    conn = MagicMock()
+    sync.fetch_changed(conn, "sessions", "session_id", "2025-01-01", (), sync.ShardSet(2, {0}), 7)
+    sql, params = conn.cursor.return_value.execute.call_args[0]
+    assert sql.endswith("AND CRC32(event_id) MOD %s IN (%s) AND (date >= CURDATE() - INTERVAL %s DAY OR date IS NULL)")
+    assert params == ["2025-01-01", sync.WATERMARK_OVERLAP_SECONDS, 2, 0, 7]
+
+def test_fetch_failures_keeps_deleted_rows_in_scope():
+    conn = MagicMock()
+    conn.cursor.return_value.fetchall.return_value = []
+    sync.fetch_failures(conn, "events", horizon=30)
+    sql, params = conn.cursor.return_value.execute.call_args[0]
+    assert "LEFT JOIN events t ON t.event_id = f.row_id" in sql
+    assert sql.endswith("OR t.event_id IS NULL)")
+    assert params == ["events", 30]
+
+@patch("planning.synchronizer.sync.publish_event")
+@patch("planning.synchronizer.sync.fetch_failures", return_value={})
+@patch("planning.synchronizer.sync.fetch_deleted", return_value=[])
+@patch("planning.synchronizer.sync.fetch_snapshot_map", return_value={})
+@patch("planning.synchronizer.sync.fetch_all", return_value=[])
+def test_full_pass_within_horizon_does_not_treat_past_rows_as_deleted(mock_all, mock_snap, mock_deleted, mock_failures, mock_pub):
+    sync.sync_events(MagicMock(), MagicMock(), horizon=30)
+    assert mock_all.call_args[0][3] == 30
+    # snapshot enkel voor de gelezen rijen; deletes via de anti-join
+    assert mock_snap.call_args[0][3] == []
+    mock_deleted.assert_called_once()
+
+@patch("planning.synchronizer.sync.set_sync_state")
+@patch("planning.synchronizer.sync.get_sync_state", return_value="2025-01-01 10:00:00")
+@patch("planning.synchronizer.sync.db_now", return_value=datetime(2025, 1, 1, 10, 5))
+def test_run_sync_cycle_sweep_ignores_horizon(mock_now, mock_get, mock_set):
+    with patch.object(sync, "sync_events") as ev, patch.object(sync, "sync_sessions"), \
+         patch.object(sync, "SYNC_PULL", False), patch.object(sync, "SYNC_HORIZON_DAYS", 30):
+        sync.run_sync_cycle(MagicMock(), MagicMock())
+        assert ev.call_args.kwargs["horizon"] == 30
+        assert ev.call_args.kwargs["since"] == "2025-01-01 10:00:00"
+        sync.run_sync_cycle(MagicMock(), MagicMock(), sweep=True)
+        assert ev.call_args.kwargs["horizon"] is None
+        assert ev.call_args.kwargs["since"] is None
+
+# ---------------------------
+# Debounce
+# ---------------------------
+
+def test_debounce_holds_recent_edits_until_quiet():
+    now = datetime(2025, 1, 1, 10, 0, 10)
+    pending = [
+        ({"session_id": "S1", "updated_at": datetime(2025, 1, 1, 10, 0, 9)}, "update", "h1"),
+        ({"session_id": "S2", "updated_at": datetime(2025, 1, 1, 10, 0, 0)}, "update", "h2"),
+        ({"session_id": "S3"}, "create", "h3"),
+    ]
+    stats = sync.new_stats()
+    with patch.object(sync, "SYNC_QUIET_SECONDS", 3), patch.object(sync, "SYNC_MAX_DELAY", 30):
+        ready = sync.debounce("sessions", pending, now, stats, clock=lambda: 100.0)
+    assert [row["session_id"] for row, _, _ in ready] == ["S2", "S3"]
+    assert stats["held"] == 1
+    assert sync._carry_over["sessions"] == {"S1"}
+    assert sync._held_since["sessions"] == {"S1": 100.0}
+    sync._carry_over["sessions"].clear()
+    sync._held_since["sessions"].clear()
+
+def test_debounce_releases_rows_after_max_delay():
+    now = datetime(2025, 1, 1, 10, 0, 10)
+    pending = [({"session_id": "S1", "updated_at": datetime(2025, 1, 1, 10, 0, 9)}, "update", "h1")]
+    sync._held_since["sessions"]["S1"] = 60.0
+    with patch.object(sync, "SYNC_QUIET_SECONDS", 3), patch.object(sync, "SYNC_MAX_DELAY", 30):
+        ready = sync.debounce("sessions", pending, now, sync.new_stats(), clock=lambda: 95.0)
+    assert len(ready) == 1
+    assert "S1" not in sync._held_since["sessions"]
+    assert not sync._carry_over["sessions"]
+
+def test_scheduler_keeps_polling_while_rows_are_held():
+    clock = FakeClock()
+    scheduler = sync.AdaptiveScheduler(base=4, min_interval=1, max_interval=60, clock=clock)
+    scheduler.start_cycle()
+    scheduler.end_cycle({"held": 1})
+    assert scheduler.interval == 2
+
+def test_scheduler_backs_off_exponentially_after_crashed_cycles():
+    clock = FakeClock()
+    scheduler = sync.AdaptiveScheduler(base=4, min_interval=1, max_interval=20, clock=clock)
+    for expected in (4, 8, 16, 20):
+        scheduler.end_cycle({"failed": 1}, crashed=True)
+        assert scheduler.time_until_next() == expected
+    scheduler.start_cycle()
+    scheduler.end_cycle({})
+    assert scheduler.failures == 0
+
+class _StopLoop(Exception):
+    pass
+
+@patch("planning.synchronizer.sync.get_gcal_service")
+@patch("planning.synchronizer.sync.get_db_connection", side_effect=Exception("MySQL down"))
+def test_main_loop_waits_between_failed_cycles(mock_conn, mock_service):
+    delays = []
+    def sleep(seconds):
+        delays.append(seconds)
+        if len(delays) == 3:
+            raise _StopLoop()
+    with patch("planning.synchronizer.sync.time.sleep", side_effect=sleep), \
+         patch.object(sync, "SYNC_INTERVAL", 5), patch.object(sync, "SYNC_MAX_INTERVAL", 60), \
+         pytest.raises(_StopLoop):
+        sync.main_loop()
+    assert mock_conn.call_count == 3
+    assert [round(d) for d in delays] == [5, 10, 20]
+
+# ---------------------------
+# Reconcile
+# ---------------------------
+
+def test_reconcile_windows_cover_the_whole_calendar():
+    conn = MagicMock()
+    conn.cursor.return_value.fetchone.return_value = (datetime(2025, 1, 1).date(), datetime(2025, 1, 8).date())
+    windows = sync.reconcile_windows(conn, 2)
+    assert windows == [
+        (None, "2025-01-01T00:00:00Z"),
+        ("2025-01-01T00:00:00Z", "2025-01-05T00:00:00Z"),
+        ("2025-01-05T00:00:00Z", "2025-01-09T00:00:00Z"),
+        ("2025-01-09T00:00:00Z", None),
+    ]
+
+def test_fetch_gcal_calendar_dedupes_windows_and_skips_cancelled():
+    pages = {
+        (None, "b"): [{"id": "G1"}, {"id": "G2"}],
+        ("b", None): [{"id": "G2"}, {"id": "G3", "status": "cancelled"}],
+    }
+    with patch.object(sync, "_list_window", side_effect=lambda svc, window: pages[window]):
+        index = sync.fetch_gcal_calendar(MagicMock(), [(None, "b"), ("b", None)])
+    assert sorted(index) == ["G1", "G2"]
+
+def test_plan_reconcile_classifies_differences():
+    in_sync  = _event_row(event_id="E1", gcal_id="G1")
+    drifted  = _event_row(event_id="E2", gcal_id="G2", title="Nieuw")
+    missing  = _event_row(event_id="E3", gcal_id="GONE")
+    unlinked = _event_row(event_id="E4", gcal_id=None)
+    index = {gid: _gcal_item(id=gid) for gid in ("G1", "G2", "G4", "G8", "G9")}
+    snapshots = {
+        "E1": (sync.fingerprint(in_sync), "G1", None),
+        "E4": ("b2:old", "G4", None),
+        "E8": ("h", "G8", None),
+    }
+    tables = {"events": ([in_sync, drifted, missing, unlinked], snapshots), "sessions": ([], {})}
+    with patch.object(sync, "fetch_all", side_effect=lambda conn, table: tables[table][0]), \
+         patch.object(sync, "fetch_snapshot_map", side_effect=lambda conn, snap, field: tables["events" if field == "event_id" else "sessions"][1]):
+        plan = sync.plan_reconcile(MagicMock(), index)
+
+    events = plan["events"]
+    assert [(row["event_id"], row["gcal_id"]) for row, _, _ in events["create"]] == [("E3", None)]
+    assert [(row["event_id"], row["gcal_id"]) for row, _, _ in events["update"]] == [("E2", "G2")]
+    assert [(rid, gcal_id) for rid, _, gcal_id, _ in events["snapshot"]] == [("E4", "G4")]
+    assert events["link"] == [("E4", "G4")]
+    assert events["delete"] == [("E8", "G8")]
+    assert plan["orphans"] == ["G9"]
+
+def test_reconcile_dry_run_does_not_write(capsys):
+    conn = MagicMock()
+    plan = {"orphans": ["G9"], "events": {"create": [({"event_id": "E3"}, "create", "h")], "update": [],
+                                          "snapshot": [], "link": [], "delete": []},
+            "sessions": {"create": [], "update": [], "snapshot": [], "link": [], "delete": []}}
+    with patch.object(sync, "reconcile_windows", return_value=[(None, None)]), \
+         patch.object(sync, "fetch_gcal_calendar", return_value={}), \
+         patch.object(sync, "plan_reconcile", return_value=plan), \
+         patch.object(sync, "apply_reconcile") as mock_apply:
+        assert sync.reconcile(MagicMock(), conn, dry_run=True) is None
+    mock_apply.assert_not_called()
+    conn.commit.assert_not_called()
+    out = capsys.readouterr().out
+    assert "events     create         1  E3" in out
+    assert "orphans" in out and "G9" in out
+
+def test_apply_reconcile_pushes_without_publishing():
+    service = make_batch_service(lambda rid: ({"id": "GNEW"}, None))
+    plan = {"orphans": [], "events": {"create": [({"event_id": "E3", "title": "T"}, "create", "h3")], "update": [],
+                                      "snapshot": [("E4", "h4", "G4", None)], "link": [("E4", "G4")], "delete": []},
+            "sessions": {"create": [], "update": [], "snapshot": [], "link": [], "delete": []}}
+    conn = MagicMock()
+    with patch.object(sync, "build_gcal_payload", return_value={}), \
+         patch.object(sync, "publish_event") as mock_pub:
+        stats = sync.apply_reconcile(service, conn, plan)
+    mock_pub.assert_not_called()
+    assert stats["changed"] == 1
+    rows = conn.cursor.return_value.executemany.call_args_list[0].args[1]
+    assert sorted(row[:3] for row in rows) == [("E3", "h3", "GNEW"), ("E4", "h4", "G4")]
+    conn.commit.assert_called_once()
+
+def test_reconcile_recreates_event_whose_gcal_id_is_gone():
+    missing = _event_row(event_id="E3", gcal_id="GONE")
+    tables = {"events": ([missing], {"E3": (sync.fingerprint(missing), "GONE", None)}), "sessions": ([], {})}
+    with patch.object(sync, "fetch_all", side_effect=lambda conn, table: tables[table][0]), \
+         patch.object(sync, "fetch_snapshot_map", side_effect=lambda conn, snap, field: tables["events" if field == "event_id" else "sessions"][1]):
+        plan = sync.plan_reconcile(MagicMock(), {})
+    service = make_batch_service(lambda rid: ({"id": "GNEW"}, None))
+    conn = MagicMock()
+    with patch.object(sync, "build_gcal_payload", return_value={}):
+        stats = sync.apply_reconcile(service, conn, plan)
+    events = service.events.return_value
+    events.insert.assert_called_once()
+    events.update.assert_not_called()
+    assert stats["changed"] == 1 and stats["failed"] == 0
+    rows = conn.cursor.return_value.executemany.call_args_list[0].args[1]
+    assert [row[:3] for row in rows] == [("E3", sync.fingerprint(missing), "GNEW")]
+
+# ---------------------------
+# Pipelined sync stages
+# ---------------------------
+
+@patch("planning.synchronizer.sync.publish_event")
+def test_pipeline_preserves_order_and_merges_snapshots(mock_pub):
+    service = make_batch_service(lambda rid: ({"id": f"G{rid}"}, None))
+    pending = [({"event_id": f"E{i}", "title": "T"}, "create", f"h{i}") for i in range(5)]
+    writes = sync.SyncWriteBuffer(MagicMock())
+    stage_conn = MagicMock()
+    stats = sync.new_stats()
+    with patch.object(sync, "GCAL_BATCH_SIZE", 2):
+        pipeline = sync.SyncPipeline(writes, stage_conn, depth=1)
+        sync.push_changes(service, pipeline, "events", pending, lambda row: {}, mock_pub, stats)
+        pipeline.close()
+
+    assert stats["changed"] == 5
+    assert [c.args[0]["event_id"] for c in mock_pub.call_args_list] == [f"E{i}" for i in range(5)]
+    rows = [args[1] for c in stage_conn.cursor.return_value.executemany.call_args_list
+            for args in [c.args] if "event_snapshots" in args[0]]
+    assert [row[0] for row in rows[0]] == [f"E{i}" for i in range(5)]
+    stage_conn.commit.assert_called_once()
+    stage_conn.close.assert_called_once()
+    assert writes.snapshotted["event_snapshots"] == {f"E{i}" for i in range(5)}
+
+def test_pipeline_applies_backpressure():
+    writes = sync.SyncWriteBuffer(MagicMock())
+    pipeline = sync.SyncPipeline(writes, MagicMock(), depth=1)
+    release, started = sync.threading.Event(), []
+
+    def slow_apply(results):
+        started.append(results)
+        release.wait(2)
+
+    for i in range(2):
+        pipeline.submit(None, lambda svc, chunk: chunk, i, slow_apply)
+    blocked = sync.threading.Thread(target=pipeline.submit, args=(None, lambda svc, chunk: chunk, 2, slow_apply))
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()
+    release.set()
+    blocked.join(2)
+    pipeline.close()
+    assert started == [0, 1, 2]
+
+def test_pipeline_propagates_stage_errors():
+    writes = sync.SyncWriteBuffer(MagicMock())
+    pipeline = sync.SyncPipeline(writes, MagicMock(), depth=2)
+    applied = []
+
+    def apply(results):
+        if results == 0:
+            raise RuntimeError("broker weg")
+        applied.append(results)
+
+    pipeline.submit(None, lambda svc, chunk: chunk, 0, apply)
+    pipeline._threads[0].join(0.1)
+    with pytest.raises(RuntimeError):
+        pipeline.submit(None, lambda svc, chunk: chunk, 1, apply)
+    with pytest.raises(RuntimeError):
+        pipeline.close()
+    assert applied == []
+
+# ---------------------------
+# Batch publishing
+# ---------------------------
+
+def test_only_broker_confirmed_rows_are_snapshotted():
+    service = make_batch_service(lambda rid: ({"id": f"G{rid}"}, None))
+    pending = [({"event_id": f"E{i}", "title": "T"}, "create", f"h{i}") for i in range(3)]
+    publish, batch = MagicMock(), MagicMock(return_value=[None, RuntimeError("nack"), None])
+    writes = sync.SyncWriteBuffer(MagicMock())
+    stats = sync.new_stats()
+    with patch.dict(sync.BATCH_PUBLISHERS, {publish: batch}):
+        sync.push_changes(service, writes, "events", pending, lambda row: {}, publish, stats)
+    publish.assert_not_called()
+    assert [op for _, op in batch.call_args.args[0]] == ["create"] * 3
+    assert stats["changed"] == 2 and stats["failed"] == 1
+    assert [s[0] for s in writes._snapshots[("event_snapshots", "event_id")]] == ["E0", "E2"]
+    assert [f[1] for f in writes._failures] == ["E1"]
+
+def test_failed_publish_keeps_gcal_id_and_retry_updates_the_event():
+    service = make_batch_service(lambda rid: ({"id": "G0"}, None))
+    publish, batch = MagicMock(), MagicMock(return_value=[RuntimeError("verbinding weg")])
+    writes = sync.SyncWriteBuffer(MagicMock())
+    with patch.dict(sync.BATCH_PUBLISHERS, {publish: batch}):
+        sync.push_changes(service, writes, "events", [({"event_id": "E0", "title": "T"}, "create", "h0")],
+                          lambda row: {}, publish, sync.new_stats())
+    assert writes._synced[("events", "event_id")] == [("E0", "G0")]
+    assert not writes._snapshots
+    assert [f[1] for f in writes._failures] == ["E0"]
+
+    # retry: nog steeds geen snapshot, maar de rij kent nu haar gcal_id
+    service = make_batch_service(lambda rid: ({"id": "G0"}, None))
+    batch.return_value = [None]
+    with patch.dict(sync.BATCH_PUBLISHERS, {publish: batch}):
+        sync.push_changes(service, writes, "events", [({"event_id": "E0", "title": "T", "gcal_id": "G0"}, "create", "h0")],
+                          lambda row: {}, publish, sync.new_stats())
+    service.events.return_value.insert.assert_not_called()
+    assert service.events.return_value.update.call_args.kwargs["eventId"] == "G0"
+    assert writes._snapshots[("event_snapshots", "event_id")] == [("E0", "h0", "G0", None)]
+
+def test_publish_rows_falls_back_to_single_publish():
+    publish = MagicMock(side_effect=[None, RuntimeError("weg")])
+    errors = sync.publish_rows(publish, [({"event_id": "E1"}, "update"), ({"event_id": "E2"}, "delete")])
+    assert errors[0] is None and isinstance(errors[1], RuntimeError)
+    assert sync.publish_rows(publish, []) == []
@@ -1,9 +1,11 @@
 import requests
 import uuid
 import os
-from googleapiclient.discovery import build
-from oauth2client.service_account import ServiceAccountCredentials
 from dotenv import load_dotenv
+try:
+    from gcal import get_service, get_quota
+except ModuleNotFoundError:
+    from planning.gcal import get_service, get_quota
 
 load_dotenv()
 
@@ -19,9 +21,7 @@ if not NGROK_URL:
 channel_id = str(uuid.uuid4())  # Unieke ID
 watch_url = f"{NGROK_URL}/calendar/notify"
 
-credentials = ServiceAccountCredentials.from_json_keyfile_name(
-    SERVICE_ACCOUNT_FILE, SCOPES)
-service = build('calendar', 'v3', credentials=credentials)
+service = get_service(SERVICE_ACCOUNT_FILE, SCOPES)
 
 body = {
     'id': channel_id,
@@ -30,7 +30,7 @@ body = {
 }
 
 try:
-    response = service.events().watch(calendarId=CALENDAR_ID, body=body).execute()
+    response = get_quota().execute(service.events().watch(calendarId=CALENDAR_ID, body=body))
     print("Webhook registered:")
     print(response)
 except Exception as e: